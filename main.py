@@ -1,9 +1,16 @@
 from src.utils.sanitization import *
-from src.utils.dataframe_match_comparison import *
 from src.utils.file_io import  *
+from src.utils.pipeline import clean_csv_file_in_chunks
 import pandas as pd
 
-def main():
+def main(chunk_size: int = None):
+    """
+    Clean sample_patients.csv into cleaned_sample_patients.csv.
+    With `chunk_size` set, the file is streamed in row chunks so memory stays
+    bounded for inputs larger than RAM; QC checks still cover the whole file.
+    """
+    if chunk_size is not None:
+        return clean_csv_file_in_chunks(None, "cleaned_sample_patients.csv", chunk_size=chunk_size)
 
     data = import_dataframe_from_csv()
     data_present = check_data_contents(data)
@@ -18,6 +25,8 @@ def file_comparison():
     Checks for exact matches in columns, dtypes, and values.
     Returns a traceable analysis or raises AssertionError if not equal.
     """
+    # Imported here so cleaning runs do not pay for the comparison and report modules.
+    from src.utils.dataframe_match_comparison import compare_cleaned_dataframes
     results = compare_cleaned_dataframes("cleaned_sample_patients.csv", "cleaned_sample_patients.csv")
     #print(results)
     pass
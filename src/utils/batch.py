@@ -0,0 +1,152 @@
+from src.utils.logging import configure_worker_logging, get_logger, queue_logging
+from src.utils.cache import CleanedFileCache
+from src.utils.csv_configs import DEFAULT_CSV_CONFIG
+from src.utils.pipeline import clean_csv_file
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import argparse
+import glob
+import json
+import os
+import time
+logger = get_logger(__name__)
+
+CLEANED_PREFIX = "cleaned_"
+MANIFEST_NAME = "batch_manifest.json"
+
+
+def find_input_files(source: str, output_dir: str = None) -> list:
+    """_Resolve a directory or glob pattern into a sorted list of CSV files._
+
+    Args:
+        source (str): _Directory (all `*.csv` inside it) or a glob pattern._
+        output_dir (str): _Output directory of the batch; its `cleaned_*` files are
+            earlier outputs, not inputs, and are left out._
+
+    Returns:
+        list: _Matching file paths, sorted._
+    """
+    if os.path.isdir(source):
+        pattern = os.path.join(source, "*.csv")
+    else:
+        pattern = source
+    output_dir = os.path.abspath(output_dir) if output_dir is not None else None
+    return sorted(
+        path for path in glob.glob(pattern)
+        if os.path.isfile(path) and not (
+            output_dir is not None
+            and os.path.basename(path).startswith(CLEANED_PREFIX)
+            and os.path.dirname(os.path.abspath(path)) == output_dir
+        )
+    )
+
+def cleaned_output_path(input_path: str, output_dir: str) -> str:
+    """_Output path for a cleaned file, e.g. 'run_01.csv' -> 'cleaned_run_01.csv'._"""
+    return os.path.join(output_dir, CLEANED_PREFIX + os.path.basename(input_path))
+
+def clean_file_task(input_path: str, output_path: str, cache_dir: str = None,
+                    config_name: str = DEFAULT_CSV_CONFIG) -> dict:
+    """_Clean one file and return its manifest entry; failures are recorded, not raised._
+
+    Runs in a worker process, so it must stay a module level function.
+    """
+    start = time.perf_counter()
+    entry = {
+        "input_path": input_path,
+        "output_path": output_path,
+        "rows": None,
+        "seconds": None,
+        "cached": False,
+        "error": None,
+    }
+    try:
+        cache = CleanedFileCache(cache_dir) if cache_dir else None
+        result = clean_csv_file(input_path, output_path, cache=cache, config_name=config_name)
+        entry["rows"] = result["rows"]
+        entry["cached"] = result["cached"]
+    except Exception as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+    entry["seconds"] = round(time.perf_counter() - start, 6)
+    return entry
+
+def clean_csv_batch(source: str, output_dir: str, max_workers: int = None, manifest_path: str = None,
+                    cache_dir: str = None, config_name: str = DEFAULT_CSV_CONFIG) -> dict:
+    """_Clean every CSV in a directory or glob on a process pool and write a manifest._
+
+    Each file goes through `import_dataframe_from_csv` -> `reformat_sample_names`
+    -> `reformat_data_body` -> `export_dataframe_to_csv`. A file that fails is
+    logged and recorded in the manifest without stopping the rest of the batch.
+
+    Args:
+        source (str): _Directory or glob pattern of raw CSV files._
+        output_dir (str): _Directory for the cleaned files, created if missing._
+        max_workers (int): _Worker processes, defaults to the number of CPUs. 1 runs in-process._
+        manifest_path (str): _Where to write the JSON manifest, defaults to `output_dir/batch_manifest.json`._
+        cache_dir (str): _Optional result cache directory; unchanged inputs are copied from it instead of re-cleaned._
+        config_name (str): _CSV profile from `config/csv_configs.json` used to parse every file._
+
+    Returns:
+        dict: _The manifest: totals plus one entry per file with rows, seconds and error._
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if manifest_path is None:
+        manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    input_files = find_input_files(source, output_dir)
+    logger.info(f"Batch cleaning {len(input_files)} files from {source} with {max_workers} workers.")
+    start = time.perf_counter()
+
+    entries = []
+    if max_workers == 1:
+        for input_path in input_files:
+            entries.append(clean_file_task(input_path, cleaned_output_path(input_path, output_dir), cache_dir, config_name))
+    else:
+        # Workers hand their records to one listener thread here instead of writing the log file themselves.
+        with queue_logging(json_lines=False) as log_queue, ProcessPoolExecutor(
+            max_workers=max_workers, initializer=configure_worker_logging, initargs=(log_queue,)
+        ) as executor:
+            futures = [
+                executor.submit(clean_file_task, input_path, cleaned_output_path(input_path, output_dir), cache_dir,
+                                config_name)
+                for input_path in input_files
+            ]
+            for future in as_completed(futures):
+                entries.append(future.result())
+        entries.sort(key=lambda entry: entry["input_path"])
+
+    for entry in entries:
+        if entry["error"]:
+            logger.error(f"Skipped {entry['input_path']}: {entry['error']}")
+
+    manifest = {
+        "source": source,
+        "output_dir": output_dir,
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "workers": max_workers,
+        "files": len(entries),
+        "failed": sum(1 for entry in entries if entry["error"]),
+        "cached": sum(1 for entry in entries if entry["cached"]),
+        "rows": sum(entry["rows"] or 0 for entry in entries),
+        "seconds": round(time.perf_counter() - start, 6),
+        "entries": entries,
+    }
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+    logger.info(f"Batch finished: {manifest['files']} files, {manifest['failed']} failed, manifest at {manifest_path}.")
+
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean a directory or glob of instrument CSV exports.")
+    parser.add_argument("source", help="Directory of CSV files or a glob pattern.")
+    parser.add_argument("output_dir", help="Directory for the cleaned CSV files and the manifest.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count).")
+    parser.add_argument("--manifest", default=None, help="Path of the JSON manifest.")
+    parser.add_argument("--cache-dir", default=None, help="Reuse cleaned outputs of unchanged inputs from this cache.")
+    parser.add_argument("--config", default=DEFAULT_CSV_CONFIG, help="CSV profile from config/csv_configs.json.")
+    args = parser.parse_args()
+    manifest = clean_csv_batch(args.source, args.output_dir, args.workers, args.manifest, args.cache_dir, args.config)
+    print(f"Cleaned {manifest['files'] - manifest['failed']} of {manifest['files']} files in {manifest['seconds']}s.")
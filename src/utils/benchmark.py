@@ -0,0 +1,204 @@
+from src.utils.logging import get_logger
+from src.utils.sanitization import (
+    convert_to_numeric_data_body,
+    reformat_data_body,
+    reformat_sample_names,
+    remove_empty_strings_data_body,
+    remove_extra_space_data_body,
+    remove_special_characters_data_body,
+    remove_string_na_data_body,
+    replace_no_root_data_body,
+)
+from src.utils.dataframe_match_comparison import compare_cleaned_dataframes, compare_values
+from src.utils.synthetic import generate_plate
+from datetime import datetime
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+logger = get_logger(__name__)
+
+DEFAULT_SIZES = [(1_000, 10), (10_000, 20)]
+DEFAULT_THRESHOLD = 0.25
+
+# Each data body helper gets the input it sees inside the chain, so it is timed on realistic values.
+DATA_BODY_STEPS = [
+    ("remove_extra_space_data_body", remove_extra_space_data_body),
+    ("remove_string_na_data_body", remove_string_na_data_body),
+    ("remove_special_characters_data_body", remove_special_characters_data_body),
+    ("remove_empty_strings_data_body", remove_empty_strings_data_body),
+    ("replace_no_root_data_body", replace_no_root_data_body),
+    ("convert_to_numeric_data_body", convert_to_numeric_data_body),
+]
+
+
+def _measure(func, make_input, repeat: int) -> dict:
+    """_Best wall time of `repeat` runs, plus the peak memory of one traced run; inputs are built untimed._"""
+    best = None
+    for _ in range(repeat):
+        args = make_input()
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    args = make_input()
+    tracemalloc.start()
+    try:
+        func(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": round(best, 6), "peak_memory_bytes": peak}
+
+def _in_directory(func, directory: str):
+    """_Run `func` inside `directory` with stdout silenced, so its printed report and
+    'comparison_reports/' Excel export stay out of the way (they are still timed)._"""
+    def run(*args):
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                return func(*args)
+        finally:
+            os.chdir(cwd)
+    return run
+
+def benchmark_size(rows: int, analytes: int, seed: int = 0, repeat: int = 3) -> list:
+    """_Time the cleaning and comparison functions on one synthetic plate size._
+
+    Returns:
+        list: _One result per function with seconds, cells/second and peak memory._
+    """
+    raw = generate_plate(rows, analytes, seed)
+    cols = raw.columns[1:]
+    cells = rows * analytes
+    cases = [("reformat_sample_names", reformat_sample_names, lambda: (raw.copy(),), rows)]
+
+    step_input = raw.copy()
+    for name, step in DATA_BODY_STEPS:
+        frozen = step_input.copy()
+        cases.append((name, step, lambda frozen=frozen: (frozen.copy(), cols), cells))
+        step_input = step(step_input, cols)
+    cases.append(("reformat_data_body", reformat_data_body, lambda: (raw.copy(),), cells))
+
+    cleaned = reformat_data_body(reformat_sample_names(raw.copy()))
+    changed = cleaned.copy()
+    changed.iloc[::7, 1:] = 1.0
+    cases.append(("compare_values", compare_values,
+                  lambda: (cleaned["analyte_1"], changed["analyte_1"]), rows))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_1 = os.path.join(tmp_dir, "cleaned_1.csv")
+        file_2 = os.path.join(tmp_dir, "cleaned_2.csv")
+        cleaned.to_csv(file_1, index=False)
+        changed.to_csv(file_2, index=False)
+        cases.append(("compare_cleaned_dataframes", _in_directory(compare_cleaned_dataframes, tmp_dir),
+                      lambda: (file_1, file_2), cells))
+
+        results = []
+        for name, func, make_input, work in cases:
+            measured = _measure(func, make_input, repeat)
+            results.append({
+                "name": name,
+                "rows": rows,
+                "analytes": analytes,
+                "cells": work,
+                **measured,
+                "cells_per_second": round(work / measured["seconds"], 1) if measured["seconds"] else None,
+            })
+            logger.info(f"Benchmark {name} {rows}x{analytes}: {measured['seconds']}s.")
+    return results
+
+def run_benchmarks(sizes: list = None, seed: int = 0, repeat: int = 3) -> dict:
+    """_Run `benchmark_size` for every (rows, analytes) size and return a JSON-ready report._"""
+    if sizes is None:
+        sizes = DEFAULT_SIZES
+    results = []
+    for rows, analytes in sizes:
+        results.extend(benchmark_size(rows, analytes, seed, repeat))
+    return {
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "seed": seed,
+        "repeat": repeat,
+        "results": results,
+    }
+
+def compare_to_baseline(report: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """_List the benchmarks that got slower than the baseline by more than `threshold` (0.25 = 25%)._
+
+    Results are matched on (name, rows, analytes); ones missing from either side are ignored.
+
+    Returns:
+        list: _{"name", "rows", "analytes", "baseline_seconds", "seconds", "slowdown"} per regression._
+    """
+    baseline_seconds = {
+        (result["name"], result["rows"], result["analytes"]): result["seconds"] for result in baseline["results"]
+    }
+    regressions = []
+    for result in report["results"]:
+        before = baseline_seconds.get((result["name"], result["rows"], result["analytes"]))
+        if not before:
+            continue
+        slowdown = result["seconds"] / before - 1
+        if slowdown > threshold:
+            regressions.append({
+                "name": result["name"],
+                "rows": result["rows"],
+                "analytes": result["analytes"],
+                "baseline_seconds": before,
+                "seconds": result["seconds"],
+                "slowdown": round(slowdown, 4),
+            })
+    return regressions
+
+def parse_size(text: str) -> tuple:
+    """_'10000x20' -> (10000, 20)._"""
+    try:
+        rows, analytes = text.lower().split("x")
+        return int(rows), int(analytes)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Size must look like ROWSxANALYTES, got '{text}'.")
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the cleaning and comparison functions on synthetic plates.")
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=DEFAULT_SIZES,
+                        help="Plate sizes as ROWSxANALYTES (default: 1000x10 10000x20).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic data generator.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark; the best one is kept.")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results.")
+    parser.add_argument("--baseline", default=None, help="Earlier results to compare against.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown against the baseline before failing (0.25 = 25%%).")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.sizes, args.seed, args.repeat)
+    for result in report["results"]:
+        print(f"{result['name']:<38} {result['rows']:>8}x{result['analytes']:<4} {result['seconds']:>10.4f}s "
+              f"{result['cells_per_second'] or 0:>14,.0f} cells/s {result['peak_memory_bytes'] / 1e6:>9.1f} MB")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["regressions"] = compare_to_baseline(report, json.load(f), args.threshold)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    print(f"Results written to {args.output}")
+
+    for regression in report.get("regressions", []):
+        print(f"REGRESSION {regression['name']} {regression['rows']}x{regression['analytes']}: "
+              f"{regression['baseline_seconds']}s -> {regression['seconds']}s (+{regression['slowdown']:.0%})")
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+from src.utils.logging import get_logger
+from src.utils.patterns import PATTERNS
+from src.utils.sanitization import SANITIZATION_VERSION
+from functools import lru_cache
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+logger = get_logger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.getcwd(), ".clean_cache")
+DEFAULT_MAX_BYTES = 1024 ** 3
+HASH_BLOCK_SIZE = 1024 * 1024
+# Modules of src/utils whose code decides what a cleaned file contains; editing any of them changes `rules_version()`.
+CLEANING_MODULES = ("sanitization", "patterns", "stages", "sharding", "file_io", "csv_configs", "pipeline")
+
+
+def file_content_hash(file_path: str) -> str:
+    """_SHA-256 of the file contents, read in 1 MB blocks._"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def files_identical(file_1: str, file_2: str) -> bool:
+    """_True when both paths hold the same bytes; files of different sizes are never hashed._"""
+    if os.path.samefile(file_1, file_2):
+        return True
+    if os.path.getsize(file_1) != os.path.getsize(file_2):
+        return False
+    return file_content_hash(file_1) == file_content_hash(file_2)
+
+def file_block_hashes(file_path: str, length: int, block_size: int = HASH_BLOCK_SIZE,
+                      previous: list = (), start_block: int = 0) -> list:
+    """_SHA-256 of every `block_size` block of the first `length` bytes; the last block may be shorter._
+
+    The first `start_block` hashes are taken from `previous` (hashes of an earlier,
+    shorter prefix), so extending the list for a grown file only reads the new bytes
+    and the last, partial block they complete.
+    """
+    hashes = list(previous[:start_block])
+    with open(file_path, "rb") as f:
+        f.seek(start_block * block_size)
+        position = start_block * block_size
+        while position < length:
+            block = f.read(min(block_size, length - position))
+            if not block:
+                break
+            hashes.append(hashlib.sha256(block).hexdigest())
+            position += len(block)
+    return hashes
+
+def verify_block_hashes(file_path: str, hashes: list, length: int, block_size: int = HASH_BLOCK_SIZE) -> bool:
+    """_True when the first `length` bytes still have these block hashes; stops reading at the first changed block._"""
+    if len(hashes) != -(-length // block_size):
+        return False
+    with open(file_path, "rb") as f:
+        for position, expected in zip(range(0, length, block_size), hashes):
+            block = f.read(min(block_size, length - position))
+            if hashlib.sha256(block).hexdigest() != expected:
+                return False
+    return True
+
+@lru_cache(maxsize=None)
+def cleaning_source_hash() -> str:
+    """_SHA-256 over the source of `CLEANING_MODULES`, computed once per process._"""
+    digest = hashlib.sha256()
+    for name in CLEANING_MODULES:
+        digest.update(file_content_hash(os.path.join(os.path.dirname(__file__), name + ".py")).encode("utf-8"))
+    return digest.hexdigest()
+
+def rules_version() -> str:
+    """_Version stamp of the cleaning rules: `SANITIZATION_VERSION` plus a hash of the registered
+    patterns and of the cleaning code, so an edited rule invalidates cached outputs even without a version bump._"""
+    digest = hashlib.sha256(json.dumps(PATTERNS.describe(), sort_keys=True).encode("utf-8"))
+    digest.update(cleaning_source_hash().encode("utf-8"))
+    return f"{SANITIZATION_VERSION}-{digest.hexdigest()[:12]}"
+
+def _write_atomic(file_path: str, write):
+    # Write to a temporary file in the same directory, then rename over the target.
+    directory = os.path.dirname(file_path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class CleanedFileCache:
+    """_On-disk cache of cleaned outputs keyed by input content, CSV config and rules version._
+
+    Each entry is `<key>.csv` (the cleaned file) plus `<key>.json` (the run summary).
+    Hits refresh the entry's modification time, and once the cache grows past
+    `max_bytes` (entries and content hash memos together) the least recently used
+    entries and memos are removed. Content hashes are
+    memoised per input path on (size, mtime) so unchanged files are not re-read.
+    Safe to share between worker processes: every write is an atomic rename.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._stats_dir = os.path.join(cache_dir, "stats")
+        os.makedirs(self._stats_dir, exist_ok=True)
+
+    def key(self, input_path: str, csv_config: dict = None) -> str:
+        """_Cache key for an input file cleaned with `csv_config` under the current rules._"""
+        parts = {
+            "content": self._content_hash(input_path),
+            "csv_config": csv_config,
+            "rules": rules_version(),
+        }
+        return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _content_hash(self, input_path: str) -> str:
+        stat = os.stat(input_path)
+        path_id = hashlib.sha1(os.path.abspath(input_path).encode("utf-8")).hexdigest()
+        stats_path = os.path.join(self._stats_dir, path_id + ".json")
+        fingerprint = [stat.st_size, stat.st_mtime_ns]
+        try:
+            with open(stats_path, encoding="utf-8") as f:
+                memo = json.load(f)
+            if memo["fingerprint"] == fingerprint:
+                return memo["sha256"]
+        except (OSError, ValueError, KeyError):
+            pass
+        content_hash = file_content_hash(input_path)
+        memo = json.dumps({"fingerprint": fingerprint, "sha256": content_hash}).encode("utf-8")
+        _write_atomic(stats_path, lambda f: f.write(memo))
+        return content_hash
+
+    def _paths(self, key: str) -> tuple:
+        return os.path.join(self.cache_dir, key + ".csv"), os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key: str, output_path: str):
+        """_Copy a cached cleaned file to `output_path` and return its summary, or None on a miss._"""
+        data_path, summary_path = self._paths(key)
+        try:
+            with open(summary_path, encoding="utf-8") as f:
+                summary = json.load(f)
+            shutil.copyfile(data_path, output_path)
+        except (OSError, ValueError):
+            return None
+        for path in (data_path, summary_path):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return summary
+
+    def put(self, key: str, cleaned_path: str, summary: dict):
+        """_Store a cleaned file and its summary, then evict down to `max_bytes`._"""
+        data_path, summary_path = self._paths(key)
+        with open(cleaned_path, "rb") as source:
+            _write_atomic(data_path, lambda f: shutil.copyfileobj(source, f))
+        summary_bytes = json.dumps(summary).encode("utf-8")
+        _write_atomic(summary_path, lambda f: f.write(summary_bytes))
+        self.evict()
+
+    def evict(self):
+        """_Remove least recently used entries and hash memos until the cache fits in `max_bytes`._"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".csv"):
+                continue
+            paths = self._paths(name[:-len(".csv")])
+            try:
+                stats = [os.stat(path) for path in paths]
+            except OSError:
+                continue
+            entries.append((stats[0].st_mtime, sum(stat.st_size for stat in stats), paths))
+        for name in os.listdir(self._stats_dir):
+            path = os.path.join(self._stats_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, (path,)))
+        total = sum(size for _, size, _ in entries)
+        for _, size, paths in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for path in reversed(paths):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            logger.info(f"Evicted cached {os.path.basename(paths[0])}.")
@@ -0,0 +1,148 @@
+"""Headless comparison of cleaned files: `python -m src.utils.compare_cli old/ new/ --workers 4`.
+
+Only the standard library is imported at start-up; pandas and the comparison module load
+when the first pair is compared, and tkinter/openpyxl only if a picker or Excel report is used.
+"""
+from src.utils.logging import configure_worker_logging, get_logger, queue_logging
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import argparse
+import json
+import os
+import sys
+import time
+logger = get_logger(__name__)
+
+# Cleaned outputs the comparison can read (see `read_cleaned_file`).
+COMPARABLE_EXTENSIONS = (".csv", ".parquet", ".arrow", ".feather", ".ipc")
+
+
+def pair_inputs(path_1: str, path_2: str) -> dict:
+    """_Pair two files, or the files of two directories by file name._
+
+    Args:
+        path_1 (str): _File or directory of the first (e.g. reference) outputs._
+        path_2 (str): _File or directory of the second (e.g. new) outputs._
+
+    Returns:
+        dict: _'pairs' [(file_1, file_2)], plus 'only_in_1' and 'only_in_2' file names for directories._
+    """
+    if os.path.isdir(path_1) != os.path.isdir(path_2):
+        raise ValueError("Compare two files or two directories, not a file with a directory.")
+    if not os.path.isdir(path_1):
+        return {"pairs": [(path_1, path_2)], "only_in_1": [], "only_in_2": []}
+
+    def comparable(directory):
+        return {
+            name for name in os.listdir(directory)
+            if name.lower().endswith(COMPARABLE_EXTENSIONS) and os.path.isfile(os.path.join(directory, name))
+        }
+
+    names_1, names_2 = comparable(path_1), comparable(path_2)
+    return {
+        "pairs": [(os.path.join(path_1, name), os.path.join(path_2, name)) for name in sorted(names_1 & names_2)],
+        "only_in_1": sorted(names_1 - names_2),
+        "only_in_2": sorted(names_2 - names_1),
+    }
+
+def compare_pair_task(file_1: str, file_2: str, key: str = None, report_dir: str = None) -> dict:
+    """_Compare one pair without printing and return its summary entry; failures are recorded, not raised._
+
+    Runs in a worker process, so it must stay a module level function. Byte-identical
+    pairs are matched on their size and hash without being parsed.
+    """
+    from src.utils.cache import files_identical
+
+    start = time.perf_counter()
+    entry = {"file_1": file_1, "file_2": file_2, "match": None, "mismatches": {}, "seconds": None, "error": None}
+    try:
+        entry["identical"] = files_identical(file_1, file_2)
+        if entry["identical"] and report_dir is None:
+            entry["match"] = entry["column_match"] = entry["dtype_match"] = True
+            entry["seconds"] = round(time.perf_counter() - start, 6)
+            return entry
+        from src.utils.dataframe_match_comparison import compare_cleaned_dataframes
+
+        report_path = None
+        if report_dir is not None:
+            report_path = os.path.join(report_dir, os.path.splitext(os.path.basename(file_1))[0] + "_comparison.xlsx")
+        analysis = compare_cleaned_dataframes(file_1, file_2, key=key, display=False, report_path=report_path)
+        entry["match"] = bool(analysis["dataframe_match"])
+        entry["column_match"] = bool(analysis["column_match"])
+        entry["dtype_match"] = bool(analysis["dtype_match"])
+        entry["mismatches"] = {
+            str(col): comp["num_mismatches"]
+            for col, comp in analysis["series_comparison"].items() if comp["num_mismatches"]
+        }
+        if "aligned_comparison" in analysis:
+            aligned = analysis["aligned_comparison"]
+            entry["aligned"] = {
+                "removed_rows": len(aligned["removed_rows"]),
+                "added_rows": len(aligned["added_rows"]),
+                "changed_rows": len(aligned["changed_rows"]),
+            }
+    except Exception as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+    entry["seconds"] = round(time.perf_counter() - start, 6)
+    return entry
+
+def compare_many(pairs: list, max_workers: int = None, key: str = None, report_dir: str = None) -> list:
+    """_Compare file pairs on a process pool (1 worker runs in-process); entries come back in pair order._"""
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if report_dir is not None:
+        os.makedirs(report_dir, exist_ok=True)
+    if max_workers == 1 or len(pairs) <= 1:
+        return [compare_pair_task(file_1, file_2, key, report_dir) for file_1, file_2 in pairs]
+    with queue_logging(json_lines=False) as log_queue, ProcessPoolExecutor(
+        max_workers=min(max_workers, len(pairs)), initializer=configure_worker_logging, initargs=(log_queue,)
+    ) as executor:
+        futures = [executor.submit(compare_pair_task, file_1, file_2, key, report_dir) for file_1, file_2 in pairs]
+        return [future.result() for future in futures]
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare cleaned files, or two directories of them paired by name.")
+    parser.add_argument("path_1", help="First cleaned file or directory.")
+    parser.add_argument("path_2", help="Second cleaned file or directory.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--key", default=None, help="Also align rows on this column, e.g. sample_name.")
+    parser.add_argument("--report-dir", default=None, help="Write an Excel report per pair into this directory.")
+    parser.add_argument("--output", default=None, help="Write the JSON summary to this file.")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    paired = pair_inputs(args.path_1, args.path_2)
+    logger.info(f"Comparing {len(paired['pairs'])} file pairs from {args.path_1} and {args.path_2}.")
+    entries = compare_many(paired["pairs"], args.workers, args.key, args.report_dir)
+
+    summary = {
+        "path_1": args.path_1,
+        "path_2": args.path_2,
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "pairs": len(entries),
+        "matched": sum(1 for entry in entries if entry["match"]),
+        "failed": sum(1 for entry in entries if entry["error"]),
+        "only_in_1": paired["only_in_1"],
+        "only_in_2": paired["only_in_2"],
+        "seconds": round(time.perf_counter() - start, 6),
+        "entries": entries,
+    }
+    for entry in entries:
+        status = "ERROR" if entry["error"] else "MATCH" if entry["match"] else "DIFF"
+        detail = entry["error"] or ", ".join(f"{col}: {count}" for col, count in entry["mismatches"].items())
+        print(f"{status:<6} {entry['file_1']} <> {entry['file_2']} {detail}".rstrip())
+    for name in paired["only_in_1"]:
+        print(f"ONLY1  {name}")
+    for name in paired["only_in_2"]:
+        print(f"ONLY2  {name}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=4)
+
+    differences = summary["pairs"] - summary["matched"] + len(paired["only_in_1"]) + len(paired["only_in_2"])
+    print(f"{summary['matched']} of {summary['pairs']} pairs match ({summary['seconds']}s).")
+    return 1 if differences else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,109 @@
 # csv_configs.py
+from functools import lru_cache
+import copy
+import importlib.util
+import json
+import os
+
 CSV_CONFIGS = {
     "config1": {"delimiter": ",", "header": 0},
     "config2": {"delimiter": ";", "header": 2},
     # Add more configs as needed
 }
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "config", "csv_configs.json")
+DEFAULT_CSV_CONFIG = "config1"
+
+# Profile keys and their defaults:
+#   delimiter  field separator
+#   header     row number of the column names
+#   skip_rows  rows skipped before parsing
+#   dtype      "str" to read every column as text, or {column: dtype}
+#   usecols    list of columns to keep, None for all
+#   engine     "auto" (pyarrow when installed and compatible), "pyarrow", "c" or "python"
+#   encoding   file encoding
+PROFILE_DEFAULTS = {
+    "delimiter": ",",
+    "header": 0,
+    "skip_rows": 0,
+    "dtype": "str",
+    "usecols": None,
+    "engine": "auto",
+    "encoding": "utf-8",
+}
+
+
+def _config_stamp(config_path: str) -> tuple:
+    """_(mtime, size) of the config file, None if it is missing; part of every cache key below._"""
+    try:
+        stat = os.stat(config_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+@lru_cache(maxsize=None)
+def _load_csv_configs(config_path: str, stamp: tuple) -> dict:
+    configs = {name: dict(profile) for name, profile in CSV_CONFIGS.items()}
+    if stamp is not None:
+        with open(config_path, encoding="utf-8") as f:
+            for name, profile in json.load(f).items():
+                configs.setdefault(name, {}).update(profile)
+    return {name: {**PROFILE_DEFAULTS, **profile} for name, profile in configs.items()}
+
+def load_csv_configs(config_path: str = CONFIG_PATH) -> dict:
+    """_Merge `config/csv_configs.json` over `CSV_CONFIGS`, filling missing keys from `PROFILE_DEFAULTS`.
+
+    The file is read again only when its modification time or size changes, so a
+    long-running process picks up an edited config for both the profiles and the
+    `pd.read_csv` options derived from them._
+    """
+    return copy.deepcopy(_load_csv_configs(config_path, _config_stamp(config_path)))
+
+def get_csv_config(config_name: str = DEFAULT_CSV_CONFIG, config_path: str = CONFIG_PATH) -> dict:
+    """_The merged profile for `config_name`, e.g. to key caches on the parsing options._"""
+    configs = _load_csv_configs(config_path, _config_stamp(config_path))
+    if config_name not in configs:
+        raise KeyError(f"Unknown CSV config '{config_name}', expected one of {sorted(configs)}.")
+    return copy.deepcopy(configs[config_name])
+
+def pyarrow_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+@lru_cache(maxsize=None)
+def _resolve_read_csv_options(config_name: str, config_path: str, stamp: tuple) -> tuple:
+    profile = get_csv_config(config_name, config_path)
+
+    dtype = str if profile["dtype"] == "str" else profile["dtype"]
+    engine = profile["engine"]
+    if engine == "auto":
+        # pyarrow mis-reads files with a preamble (header or skip_rows > 0), so only use it for plain files.
+        plain_file = profile["header"] == 0 and not profile["skip_rows"]
+        engine = "pyarrow" if plain_file and pyarrow_available() else "c"
+
+    options = {
+        "sep": profile["delimiter"],
+        "header": profile["header"],
+        "skiprows": profile["skip_rows"] or None,
+        "dtype": dtype,
+        "usecols": profile["usecols"],
+        "engine": engine,
+        "encoding": profile["encoding"],
+        "keep_default_na": False,
+    }
+    return tuple(options.items())
+
+def get_read_csv_options(config_name: str = DEFAULT_CSV_CONFIG, config_path: str = CONFIG_PATH) -> dict:
+    """_`pd.read_csv` keyword arguments for a named profile._
+
+    Profiles are resolved once per version of the config file (see `load_csv_configs`);
+    each call returns a fresh dict so callers may adjust it (e.g. the chunked reader
+    switches to the C engine).
+
+    Args:
+        config_name (str): _Profile name from `config/csv_configs.json` / `CSV_CONFIGS`._
+        config_path (str): _JSON file with the profiles._
+
+    Returns:
+        dict: _Options such as sep, header, skiprows, dtype, usecols, engine and keep_default_na._
+    """
+    return copy.deepcopy(dict(_resolve_read_csv_options(config_name, config_path, _config_stamp(config_path))))
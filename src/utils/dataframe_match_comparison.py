@@ -1,5 +1,11 @@
 
 import numpy as np
+import pandas as pd
+import os
+import re
+from src.utils.cache import files_identical
+from src.utils.file_io import COLUMNAR_FORMATS, import_dataframe_from_columnar, is_typed_dataframe, status_codes
+from src.utils.sanitization import STATUS_INVALID, STATUS_SUFFIX, status_columns
 
 def compare_dtype(s1, s2):
     return s1.dtype == s2.dtype
@@ -7,54 +13,309 @@ def compare_dtype(s1, s2):
 def compare_row_count(s1, s2):
     return (len(s1), len(s2))
 
-def compare_values(s1, s2, tolerance=0.0):
-    mismatches = []
-    dtype = s1.dtype
-    for idx in range(min(len(s1), len(s2))):
-        v1 = s1.iloc[idx]
-        v2 = s2.iloc[idx]
-        if pd.isna(v1) and pd.isna(v2):
-            match = True
-        elif pd.api.types.is_numeric_dtype(dtype) and not pd.isna(v1) and not pd.isna(v2):
-            if tolerance > 0:
-                match = np.isclose(v1, v2, rtol=tolerance)
-            else:
-                match = v1 == v2
+def compare_dataframe_values(df1, df2, columns=None, tolerance=0.0) -> dict:
+    """
+    Compare the values of several columns at once, row by row position.
+    Builds one 2-D boolean match mask for all columns instead of looping over cells:
+    missing values match each other, numeric columns (by df1's dtype) use a relative
+    tolerance when `tolerance` > 0, and everything else must match exactly.
+    Rows beyond the shorter frame are not compared.
+    Two frames in the typed layout are compared on their arrays with `compare_typed_values`.
+    Returns {column: {"num_mismatches": int, "mismatched_indices": [positions]}}.
+    """
+    if is_typed_dataframe(df1) and is_typed_dataframe(df2):
+        return compare_typed_values(df1, df2, columns, tolerance)
+    if columns is None:
+        columns = [col for col in df1.columns if col in df2.columns]
+    columns = list(columns)
+    rows = min(len(df1), len(df2))
+    left = df1[columns].iloc[:rows].reset_index(drop=True)
+    right = df2[columns].iloc[:rows].reset_index(drop=True)
+
+    left_na = left.isna().to_numpy(dtype=bool)
+    right_na = right.isna().to_numpy(dtype=bool)
+    matches = left_na & right_na
+
+    tolerant = [tolerance > 0 and pd.api.types.is_numeric_dtype(left[col].dtype) for col in columns]
+    exact_positions = [pos for pos, is_tolerant in enumerate(tolerant) if not is_tolerant]
+    tolerant_positions = [pos for pos, is_tolerant in enumerate(tolerant) if is_tolerant]
+
+    if exact_positions and rows:
+        exact_left = left.iloc[:, exact_positions]
+        exact_right = right.iloc[:, exact_positions]
+        equal = exact_left.eq(exact_right).to_numpy(dtype=bool, na_value=False)
+        matches[:, exact_positions] |= equal
+
+    if tolerant_positions and rows:
+        tolerant_left = left.iloc[:, tolerant_positions].to_numpy(dtype=np.float64, na_value=np.nan)
+        tolerant_right = right.iloc[:, tolerant_positions]
+        # Values in df2 that are not numbers (e.g. 'Invalid') become NaN and never match.
+        tolerant_right = tolerant_right.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        both_present = ~left_na[:, tolerant_positions] & ~right_na[:, tolerant_positions]
+        close = np.isclose(tolerant_left, tolerant_right, rtol=tolerance)
+        matches[:, tolerant_positions] |= both_present & close
+
+    results = {}
+    for pos, col in enumerate(columns):
+        mismatches = np.flatnonzero(~matches[:, pos]).tolist()
+        results[col] = {
+            "num_mismatches": len(mismatches),
+            "mismatched_indices": mismatches
+        }
+    return results
+
+def compare_typed_values(df1, df2, columns=None, tolerance=0.0, strict_status=False) -> dict:
+    """
+    Compare two typed frames (see `file_io.to_typed_dataframe`) on their float64 and status code arrays.
+    An analyte cell matches when both are missing, both are 'Invalid', or both hold numbers that are
+    equal (close within the relative `tolerance` when > 0), i.e. when the cleaned CSV cells would match.
+    With `strict_status`, the status codes must also be equal, so an NA cleaned to 0.0 no longer
+    matches a measured 0.0. Columns without a status column (sample_name) are compared exactly.
+    Status columns are not reported themselves. Returns the same structure as `compare_dataframe_values`.
+    """
+    status_1 = status_columns(df1)
+    status_2 = status_columns(df2)
+    if columns is None:
+        columns = [col for col in df1.columns if col in df2.columns and col not in status_1]
+    columns = list(columns)
+    analytes = [col for col in columns if col + STATUS_SUFFIX in status_1 and col + STATUS_SUFFIX in status_2]
+    others = [col for col in columns if col not in set(analytes)]
+    results = compare_dataframe_values(df1[others], df2[others], others) if others else {}
+
+    rows = min(len(df1), len(df2))
+    for col in analytes:
+        left = df1[col].to_numpy(dtype=np.float64)[:rows]
+        right = df2[col].to_numpy(dtype=np.float64)[:rows]
+        left_status = status_codes(df1[col + STATUS_SUFFIX])[:rows]
+        right_status = status_codes(df2[col + STATUS_SUFFIX])[:rows]
+        if tolerance > 0:
+            same_value = np.isclose(left, right, rtol=tolerance, equal_nan=True)
+        else:
+            same_value = (left == right) | (np.isnan(left) & np.isnan(right))
+        if strict_status:
+            matches = same_value & (left_status == right_status)
         else:
-            match = v1 == v2
-        if not match:
-            mismatches.append(idx)
+            matches = same_value & ((left_status == STATUS_INVALID) == (right_status == STATUS_INVALID))
+        mismatches = np.flatnonzero(~matches).tolist()
+        results[col] = {
+            "num_mismatches": len(mismatches),
+            "mismatched_indices": mismatches
+        }
+    return {col: results[col] for col in columns}
+
+def _only_strings(s) -> bool:
+    return pd.api.types.infer_dtype(s, skipna=True) in ("string", "empty")
+
+def changed_columns(df1, df2, columns=None) -> list:
+    """
+    Columns whose values may differ, found by comparing per-row hashes (`pd.util.hash_pandas_object`).
+    A column with the same dtype, length and row hashes in both frames holds the same values and
+    needs no cell comparison; every other column is returned for `compare_dataframe_values`.
+    Object columns are hashed as text, so their hashes are only trusted when both hold just strings.
+    """
+    if columns is None:
+        columns = [col for col in df1.columns if col in df2.columns]
+    if len(df1) != len(df2):
+        return list(columns)
+    changed = []
+    for col in columns:
+        s1 = df1[col]
+        s2 = df2[col]
+        if s1.dtype == object and not _only_strings(s1) or s2.dtype == object and not _only_strings(s2):
+            changed.append(col)
+        elif s1.dtype != s2.dtype or not np.array_equal(
+            pd.util.hash_pandas_object(s1, index=False).to_numpy(),
+            pd.util.hash_pandas_object(s2, index=False).to_numpy(),
+        ):
+            changed.append(col)
+    return changed
+
+def compare_values(s1, s2, tolerance=0.0):
+    """
+    Compare two series value by value on row position, see `compare_dataframe_values`.
+    """
+    result = compare_dataframe_values(s1.to_frame(name=0), s2.to_frame(name=0), columns=[0], tolerance=tolerance)
+    return result[0]
+
+OCCURRENCE_LEVEL = "occurrence"
+
+def _occurrence_keys(df1, df2, key):
+    """
+    Give every row of both frames an integer join key for (key value, occurrence number),
+    so repeated keys such as 'blank control' are paired in the order they appear.
+    Keys are hash-factorized together (no sorting) to keep the join near-linear.
+    """
+    codes, _ = pd.factorize(pd.concat([df1[key], df2[key]], ignore_index=True), sort=False, use_na_sentinel=False)
+    left_codes = codes[:len(df1)]
+    right_codes = codes[len(df1):]
+    left_occurrence = pd.Series(left_codes).groupby(left_codes, sort=False).cumcount().to_numpy()
+    right_occurrence = pd.Series(right_codes).groupby(right_codes, sort=False).cumcount().to_numpy()
+    width = max(left_occurrence.max(initial=0), right_occurrence.max(initial=0)) + 1
+    left_keys = left_codes.astype(np.int64) * width + left_occurrence
+    right_keys = right_codes.astype(np.int64) * width + right_occurrence
+    return left_keys, left_occurrence, right_keys, right_occurrence
+
+def compare_aligned_dataframes(df1, df2, key="sample_name", tolerance=0.0) -> dict:
+    """
+    Compare two frames by joining rows on a key column instead of row position.
+    Rows are hash-joined on (key, occurrence number), so reordered files still line up
+    and row-count differences are reported rather than truncated.
+    Returns added rows (only in df2), removed rows (only in df1), changed rows,
+    per-column mismatch counts and a long table of per-cell differences.
+    Rows are identified as (key value, occurrence) tuples.
+    """
+    left_keys, left_occurrence, right_keys, right_occurrence = _occurrence_keys(df1, df2, key)
+    right_positions = pd.Index(right_keys).get_indexer(left_keys)
+    left_positions = pd.Index(left_keys).get_indexer(right_keys)
+
+    matched_left_positions = np.flatnonzero(right_positions >= 0)
+    matched_right_positions = right_positions[matched_left_positions]
+    removed_positions = np.flatnonzero(right_positions < 0)
+    added_positions = np.flatnonzero(left_positions < 0)
+
+    value_cols = [col for col in df1.columns if col != key and col in set(df2.columns)]
+    matched_left = df1[value_cols].iloc[matched_left_positions].reset_index(drop=True)
+    matched_right = df2[value_cols].iloc[matched_right_positions].reset_index(drop=True)
+    value_results = compare_dataframe_values(matched_left, matched_right, value_cols, tolerance=tolerance)
+
+    left_key_values = df1[key].to_numpy()
+    right_key_values = df2[key].to_numpy()
+    matched_key_values = left_key_values[matched_left_positions]
+    matched_occurrence = left_occurrence[matched_left_positions]
+
+    diff_frames = []
+    changed = np.zeros(len(matched_left_positions), dtype=bool)
+    for col in value_cols:
+        positions = value_results[col]["mismatched_indices"]
+        if not positions:
+            continue
+        changed[positions] = True
+        diff_frames.append(pd.DataFrame({
+            key: matched_key_values[positions],
+            OCCURRENCE_LEVEL: matched_occurrence[positions],
+            "column": col,
+            "value_file1": matched_left[col].to_numpy()[positions],
+            "value_file2": matched_right[col].to_numpy()[positions],
+        }))
+    if diff_frames:
+        cell_diffs = pd.concat(diff_frames, ignore_index=True)
+    else:
+        cell_diffs = pd.DataFrame(columns=[key, OCCURRENCE_LEVEL, "column", "value_file1", "value_file2"])
+
     return {
-        "num_mismatches": len(mismatches),
-        "mismatched_indices": mismatches
+        "key": key,
+        "rows_file1": len(df1),
+        "rows_file2": len(df2),
+        "matched_rows": len(matched_left_positions),
+        "removed_rows": list(zip(left_key_values[removed_positions], left_occurrence[removed_positions].tolist())),
+        "added_rows": list(zip(right_key_values[added_positions], right_occurrence[added_positions].tolist())),
+        "changed_rows": list(zip(matched_key_values[changed], matched_occurrence[changed].tolist())),
+        "series_comparison": {col: value_results[col]["num_mismatches"] for col in value_cols},
+        "cell_diffs": cell_diffs,
     }
+
+REPORT_COLUMNS = ["Index", "File_1", "File_2", "Match"]
+REPORT_EXTENSIONS = {"excel": ".xlsx", "parquet": ".parquet", "csv": ".csv"}
+EXCEL_SHEET_NAME_LENGTH = 31
+EXCEL_SHEET_NAME_FORBIDDEN = re.compile(r"[\[\]:*?/\\]")
+
+def excel_sheet_title(name, used: set) -> str:
+    """
+    Excel-safe sheet name for a column, unique among the names in `used` (which it is added to).
+    Characters Excel forbids ([]:*?/\\) become '_', leading and trailing apostrophes are dropped,
+    and names are cut to 31 characters; a name already taken (Excel ignores case) gets '_2', '_3', ...
+    """
+    base = EXCEL_SHEET_NAME_FORBIDDEN.sub("_", str(name))[:EXCEL_SHEET_NAME_LENGTH].strip("'") or "Sheet"
+    title = base
+    number = 1
+    while title.lower() in used or title.lower() == "history":
+        number += 1
+        suffix = f"_{number}"
+        title = base[:EXCEL_SHEET_NAME_LENGTH - len(suffix)] + suffix
+    used.add(title.lower())
+    return title
+
 class ComparisonAnalysis:
-    def export_comparisons_excel(self, output_path="comparison_reports/column_comparisons.xlsx"):
-        import os
-        import pandas as pd
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        a = self.analysis
-        df1 = pd.read_csv(a['file_1'])
-        df2 = pd.read_csv(a['file_2'])
-        common_cols = set(df1.columns) & set(df2.columns)
-        with pd.ExcelWriter(output_path) as writer:
-            for col in common_cols:
-                rows = []
-                for idx in range(min(len(df1), len(df2))):
-                    val1 = df1.iloc[idx][col]
-                    val2 = df2.iloc[idx][col]
-                    match = val1 == val2
-                    rows.append({
-                        "Index": idx,
-                        "File_1": val1,
-                        "File_2": val2,
-                        "Match": match
-                    })
-                pd.DataFrame(rows).to_excel(writer, sheet_name=col, index=False)
+    def export_comparisons_excel(self, output_path="comparison_reports/column_comparisons.xlsx", mismatches_only=False):
+        self.export_comparisons(output_path, file_format="excel", mismatches_only=mismatches_only)
+
+    def export_comparisons(self, output_path=None, file_format="excel", mismatches_only=False):
+        """
+        Write the per-column value comparison report.
+        "excel" writes one sheet per column through openpyxl's write-only (streaming) mode;
+        "parquet" and "csv" write one long table with a "Column" field and the values as text.
+        Match is True when both values are equal or both are missing.
+        With `mismatches_only`, matching rows are left out of the report.
+        """
+        if file_format not in REPORT_EXTENSIONS:
+            raise ValueError(f"Unknown report format '{file_format}', expected one of {list(REPORT_EXTENSIONS)}.")
+        if output_path is None:
+            output_path = "comparison_reports/column_comparisons" + REPORT_EXTENSIONS[file_format]
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+        if file_format == "excel":
+            from openpyxl import Workbook
+            workbook = Workbook(write_only=True)
+            titles = set()
+            for col, frame in self.comparison_frames(mismatches_only):
+                sheet = workbook.create_sheet(title=excel_sheet_title(col, titles))
+                sheet.append(REPORT_COLUMNS)
+                # openpyxl wants plain Python values, with None for empty cells
+                values = frame.astype(object).where(frame.notna(), None)
+                for row in values.itertuples(index=False, name=None):
+                    sheet.append(row)
+            workbook.save(output_path)
+        else:
+            frames = []
+            for col, frame in self.comparison_frames(mismatches_only):
+                frame = frame.astype({"File_1": "string", "File_2": "string"})
+                frame.insert(0, "Column", str(col))
+                frames.append(frame)
+            if frames:
+                report = pd.concat(frames, ignore_index=True)
+            else:
+                report = pd.DataFrame(columns=["Column"] + REPORT_COLUMNS)
+            if file_format == "parquet":
+                report.to_parquet(output_path, index=False)
+            else:
+                report.to_csv(output_path, index=False, encoding="utf-8")
         print(f"Saved all column comparisons to {output_path}")
 
-    def __init__(self, analysis: dict):
+    def comparison_frames(self, mismatches_only=False):
+        """
+        Yield (column, frame) for every common column, with frame columns Index, File_1, File_2, Match.
+        Reuses the frames held by the analysis and builds each frame with array operations.
+        """
+        df1, df2 = self._frames()
+        common_cols = [col for col in df1.columns if col in set(df2.columns)]
+        rows = min(len(df1), len(df2))
+        value_results = compare_dataframe_values(df1, df2, common_cols, tolerance=0.0)
+        positions = np.arange(rows)
+        for col in common_cols:
+            match = np.ones(rows, dtype=bool)
+            match[value_results[col]["mismatched_indices"]] = False
+            frame = pd.DataFrame({
+                "Index": positions,
+                "File_1": df1[col].to_numpy()[:rows],
+                "File_2": df2[col].to_numpy()[:rows],
+                "Match": match,
+            })
+            if mismatches_only:
+                frame = frame[~match].reset_index(drop=True)
+            yield col, frame
+
+    def _frames(self):
+        # Fall back to reading the files when the analysis was built without the frames.
+        if self.df1 is None or self.df2 is None:
+            a = self.analysis
+            self.df1 = read_cleaned_file(a['file_1'])
+            self.df2 = read_cleaned_file(a['file_2'])
+        return self.df1, self.df2
+
+    def __init__(self, analysis: dict, df1: pd.DataFrame = None, df2: pd.DataFrame = None):
         self.analysis = analysis
+        self.df1 = df1
+        self.df2 = df2
 
     def display(self):
         a = self.analysis
@@ -80,42 +341,79 @@ class ComparisonAnalysis:
             if comp['num_mismatches'] > 0:
                 print(f"  Mismatched Indices: {comp['mismatched_indices']}")
 
+        if 'aligned_comparison' in a:
+            aligned = a['aligned_comparison']
+            print(f"\nAligned on '{aligned['key']}':")
+            print(f"  Matched Rows: {aligned['matched_rows']}")
+            print(f"  Removed Rows (only in File 1): {len(aligned['removed_rows'])}")
+            print(f"  Added Rows (only in File 2): {len(aligned['added_rows'])}")
+            print(f"  Changed Rows: {len(aligned['changed_rows'])}")
+            print(f"  Changed Cells: {len(aligned['cell_diffs'])}")
+
         print("\nDataFrame Match:", a['dataframe_match'])
         print("Result:", a['result'])
         if not a['dataframe_match'] and 'error' in a:
             print("Error:", a['error'])
 
 
-import pandas as pd
 from pandas.testing import assert_frame_equal
-import tkinter as tk
-from tkinter import filedialog
 
-def compare_cleaned_dataframes(file_1: str = None, file_2: str = None) -> dict:
+def select_files_dialog() -> tuple:
+    """
+    Ask for the two cleaned files with the tkinter file picker.
+    tkinter is imported here, so headless runs that pass paths never load it.
+    """
+    import tkinter as tk
+    from tkinter import filedialog
+
+    root = tk.Tk()
+    root.withdraw()
+    print("Select the first cleaned CSV file...")
+    file_1 = filedialog.askopenfilename(title="Select first cleaned CSV file", filetypes=[("CSV files", "*.csv")])
+    print("Select the second cleaned CSV file...")
+    file_2 = filedialog.askopenfilename(title="Select second cleaned CSV file", filetypes=[("CSV files", "*.csv")])
+    return file_1, file_2
+
+def read_cleaned_file(file_path: str) -> pd.DataFrame:
+    """
+    Load a cleaned file: Parquet/Arrow outputs of `export_dataframe_to_columnar` by extension, CSV otherwise.
+    """
+    if os.path.splitext(file_path)[1].lower() in COLUMNAR_FORMATS:
+        return import_dataframe_from_columnar(file_path)
+    return pd.read_csv(file_path)
+
+def compare_cleaned_dataframes(file_1: str = None, file_2: str = None, key: str = None, display: bool = True,
+                               report_path: str = "comparison_reports/column_comparisons.xlsx",
+                               tolerance: float = 0.20) -> dict:
     """
     Compare two cleaned CSV files for column names, dtypes, and values.
     If file paths are not provided, prompt user to select files via file explorer.
+    With `key` (e.g. "sample_name"), rows are also joined on that column and the
+    added/removed/changed rows are reported under "aligned_comparison".
+    `display` prints the report and `report_path` is where the Excel report is written
+    (None skips it), so batch runs can keep just the returned analysis.
+    Numeric cells match within the relative `tolerance`; pass 0.0 for exact regression checks.
     Returns a detailed analysis for each column/series, even if DataFrames match.
     """
     # File selection via file explorer if paths not provided
     if not file_1 or not file_2:
-        root = tk.Tk()
-        root.withdraw()
-        print("Select the first cleaned CSV file...")
-        file_1 = filedialog.askopenfilename(title="Select first cleaned CSV file", filetypes=[("CSV files", "*.csv")])
-        print("Select the second cleaned CSV file...")
-        file_2 = filedialog.askopenfilename(title="Select second cleaned CSV file", filetypes=[("CSV files", "*.csv")])
-
+        file_1, file_2 = select_files_dialog()
 
-    df1 = pd.read_csv(file_1)
-    df2 = pd.read_csv(file_2)
+    # Byte-identical files (e.g. a file compared to itself) are read once and not compared cell by cell.
+    identical = files_identical(file_1, file_2)
+    df1 = read_cleaned_file(file_1)
     # Treat all empty strings and NaN as NaN for comparison
     df1 = df1.replace("", pd.NA)
-    df2 = df2.replace("", pd.NA)
+    if identical:
+        df2 = df1
+    else:
+        df2 = read_cleaned_file(file_2)
+        df2 = df2.replace("", pd.NA)
 
     analysis = {
         "file_1": file_1,
         "file_2": file_2,
+        "files_identical": identical,
         "columns_file1": list(df1.columns),
         "columns_file2": list(df2.columns),
         "dtypes_file1": df1.dtypes.astype(str).to_dict(),
@@ -126,24 +424,32 @@ def compare_cleaned_dataframes(file_1: str = None, file_2: str = None) -> dict:
     }
 
 
-    # Per-series modular comparison
-    common_cols = set(df1.columns) & set(df2.columns)
+    # Per-series modular comparison; only columns whose hashes differ are compared cell by cell, in one pass
+    common_cols = [col for col in df1.columns if col in set(df2.columns)]
+    changed = [] if identical else changed_columns(df1, df2, common_cols)
+    value_results = compare_dataframe_values(df1, df2, changed, tolerance=tolerance) if changed else {}
     for col in common_cols:
         s1 = df1[col]
         s2 = df2[col]
         dtype_match = compare_dtype(s1, s2)
         row_counts = compare_row_count(s1, s2)
-        value_result = compare_values(s1, s2, tolerance=0.20)
+        value_result = value_results.get(col, {"num_mismatches": 0, "mismatched_indices": []})
         analysis["series_comparison"][col] = {
             "dtype_match": dtype_match,
             "row_counts": row_counts,
             "num_mismatches": value_result["num_mismatches"],
             "mismatched_indices": value_result["mismatched_indices"]
         }
+    analysis["changed_columns"] = changed
+
+    if key is not None:
+        analysis["aligned_comparison"] = compare_aligned_dataframes(df1, df2, key=key, tolerance=tolerance)
 
     # DataFrame-level comparison
     try:
-        assert_frame_equal(df1, df2, check_dtype=True, check_like=False)
+        # Same columns in the same order with no changed column means assert_frame_equal would pass.
+        if not (list(df1.columns) == list(df2.columns) and df1.index.equals(df2.index) and not changed):
+            assert_frame_equal(df1, df2, check_dtype=True, check_like=False)
         analysis["dataframe_match"] = True
         analysis["result"] = "DataFrames are exactly equal."
     except AssertionError as e:
@@ -152,7 +458,9 @@ def compare_cleaned_dataframes(file_1: str = None, file_2: str = None) -> dict:
         analysis["error"] = str(e)
 
     # Display formatted report using ComparisonAnalysis
-    report = ComparisonAnalysis(analysis)
-    report.display()
-    report.export_comparisons_excel()
+    report = ComparisonAnalysis(analysis, df1, df2)
+    if display:
+        report.display()
+    if report_path is not None:
+        report.export_comparisons_excel(report_path)
     return analysis
\ No newline at end of file
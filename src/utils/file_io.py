@@ -1,29 +1,319 @@
+from src.utils.sanitization import (
+    INVALID_VALUE,
+    STATUS_INVALID,
+    STATUS_LABELS,
+    STATUS_MISSING,
+    STATUS_SUFFIX,
+    STATUS_VALID,
+    TYPED_ATTR,
+    mark_invalid,
+    status_columns,
+)
+from src.utils.csv_configs import DEFAULT_CSV_CONFIG, get_read_csv_options
 import pandas as pd
+import numpy as np
+import csv
+import io
+import mmap
 import os
 
+# Typed (columnar) layout: each analyte becomes a float64 column plus a uint8 status code column.
+STATUS_CATEGORIES = STATUS_LABELS
+COLUMNAR_FORMATS = {".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow"}
+DEFAULT_RANGE_BYTES = 64 * 1024 * 1024
+
 
 # input
-def import_dataframe_from_csv(file_path:str = None) -> pd.DataFrame:
+def import_dataframe_from_csv(file_path:str = None, config_name: str = DEFAULT_CSV_CONFIG) -> pd.DataFrame:
     """
+    Read a raw CSV file with a named profile from `config/csv_configs.json`.
+
+    The profile sets the delimiter, header row, skipped rows, column dtypes (text by default,
+    so nothing is type-inferred before cleaning), usecols and the parser engine (pyarrow when available).
+
+    Args:
+        file_path (str): Path to the input CSV file. If None, reads 'sample_patients.csv' in current directory.
+        config_name (str): CSV profile name.
     """
     if file_path is None:
-        df = pd.read_csv(os.path.join(os.getcwd(), "sample_patients.csv"), keep_default_na=False)
-    else:
-        df = pd.read_csv(file_path, keep_default_na=False)
+        file_path = os.path.join(os.getcwd(), "sample_patients.csv")
+    df = pd.read_csv(file_path, **get_read_csv_options(config_name))
 
     return df
 
+def iter_dataframe_chunks_from_csv(file_path: str = None, chunk_size: int = 100_000, config_name: str = DEFAULT_CSV_CONFIG):
+    """
+    Read a CSV file lazily in row chunks, parsed the same way as `import_dataframe_from_csv`.
+
+    Args:
+        file_path (str): Path to the input CSV file. If None, reads 'sample_patients.csv' in current directory.
+        chunk_size (int): Number of rows per chunk.
+        config_name (str): CSV profile name.
+
+    Yields:
+        pd.DataFrame: The next chunk of rows; a header-only file yields one empty chunk.
+    """
+    if file_path is None:
+        file_path = os.path.join(os.getcwd(), "sample_patients.csv")
+    options = get_read_csv_options(config_name)
+    if options["engine"] == "pyarrow":
+        # The pyarrow engine cannot read in chunks.
+        options["engine"] = "c"
+    with pd.read_csv(file_path, chunksize=chunk_size, **options) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+def _range_read_options(config_name: str, columns: list) -> dict:
+    # Ranges have no header line of their own, so parse them with the header's column names.
+    options = get_read_csv_options(config_name)
+    options.pop("skiprows")
+    options["header"] = None
+    options["names"] = columns
+    return options
+
+def csv_byte_ranges(file_path: str, range_bytes: int = DEFAULT_RANGE_BYTES, config_name: str = DEFAULT_CSV_CONFIG) -> dict:
+    """
+    Memory-map a CSV file and split its data rows into byte ranges that end on row boundaries.
+
+    Only the header line is decoded here; the ranges are (start, end) offsets into the file that
+    `read_csv_byte_range` can parse independently, e.g. in separate worker processes.
+    Rows must not contain quoted line breaks, as ranges are cut at newline characters.
+
+    Args:
+        file_path (str): Path to the input CSV file.
+        range_bytes (int): Approximate size of each range; a range always ends after a full row.
+        config_name (str): CSV profile name, for the delimiter, encoding and header position.
+
+    Returns:
+        dict: {"columns": header names, "ranges": [(start, end), ...]}.
+    """
+    if range_bytes < 1:
+        raise ValueError("range_bytes must be a positive number of bytes.")
+    options = get_read_csv_options(config_name)
+    if options["header"] is None:
+        raise ValueError("Byte range reading needs a profile with a header row.")
+    header_line_number = (options["skiprows"] or 0) + options["header"]
+
+    size = os.path.getsize(file_path)
+    if size == 0:
+        raise pd.errors.EmptyDataError("No columns to parse from file")
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        header_start = 0
+        for _ in range(header_line_number):
+            header_start = mm.find(b"\n", header_start) + 1
+            if header_start == 0:
+                raise pd.errors.EmptyDataError("No columns to parse from file")
+        header_end = mm.find(b"\n", header_start)
+        data_start = size if header_end == -1 else header_end + 1
+        header_line = mm[header_start:data_start].decode(options["encoding"]).rstrip("\r\n")
+        columns = next(csv.reader([header_line], delimiter=options["sep"]))
+
+        ranges = []
+        start = data_start
+        while start < size:
+            newline = mm.find(b"\n", min(start + range_bytes, size) - 1)
+            end = size if newline == -1 else newline + 1
+            ranges.append((start, end))
+            start = end
+
+    return {"columns": columns, "ranges": ranges}
+
+def complete_rows_end(file_path: str) -> int:
+    """
+    Byte offset just after the last line break, i.e. the end of the last complete row.
+
+    Rows still being written by an instrument (no line ending yet) lie beyond this offset.
+    """
+    if os.path.getsize(file_path) == 0:
+        return 0
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return mm.rfind(b"\n") + 1
+
+def read_csv_byte_range(file_path: str, start: int, end: int, columns: list,
+                        config_name: str = DEFAULT_CSV_CONFIG) -> pd.DataFrame:
+    """
+    Parse one byte range from `csv_byte_ranges` into a DataFrame.
+
+    The file is memory-mapped, so only the pages of this range are read from disk.
+
+    Args:
+        file_path (str): Path to the input CSV file.
+        start (int): First byte of the range.
+        end (int): Byte after the last row of the range.
+        columns (list): Column names from the header.
+        config_name (str): CSV profile name.
+    """
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # BytesIO shares the bytes of the slice, so the range is copied once and the rest of the file not at all.
+        data = mm[start:end]
+    if not data.endswith(b"\n"):
+        # The pyarrow parser rejects a single row without a line ending at the end of the file.
+        data += b"\n"
+    return pd.read_csv(io.BytesIO(data), **_range_read_options(config_name, columns))
+
+def iter_dataframe_ranges_from_csv(file_path: str = None, range_bytes: int = DEFAULT_RANGE_BYTES,
+                                   config_name: str = DEFAULT_CSV_CONFIG):
+    """
+    Read a CSV file as a sequence of DataFrames, one per memory-mapped byte range.
+
+    Yields:
+        pd.DataFrame: The rows of the next range; a header-only file yields one empty frame.
+    """
+    if file_path is None:
+        file_path = os.path.join(os.getcwd(), "sample_patients.csv")
+    layout = csv_byte_ranges(file_path, range_bytes, config_name)
+    if not layout["ranges"]:
+        yield pd.DataFrame(columns=layout["columns"], dtype=object)
+        return
+    for start, end in layout["ranges"]:
+        yield read_csv_byte_range(file_path, start, end, layout["columns"], config_name)
+
 
 # output
-def export_dataframe_to_csv(df: pd.DataFrame, file_path: str = None, index: bool = False):
+def export_dataframe_to_csv(df: pd.DataFrame, file_path: str = None, index: bool = False, append: bool = False):
     """
     Export a pandas DataFrame to a CSV file.
 
+    A frame in the typed layout (see `is_typed_dataframe`) is written in the usual cleaned CSV format.
+
     Args:
         df (pd.DataFrame): DataFrame to export.
         file_path (str): Path to the output CSV file. If None, saves as 'output.csv' in current directory.
         index (bool): Whether to write row names (index).
+        append (bool): Append rows without a header instead of overwriting the file.
     """
     if file_path is None:
         file_path = os.path.join(os.getcwd(), 'output.csv')
-    df.to_csv(file_path, index=index, encoding='utf-8')
+    if is_typed_dataframe(df):
+        df = from_typed_dataframe(df)
+    if append:
+        df.to_csv(file_path, index=index, encoding='utf-8', mode='a', header=False)
+    else:
+        df.to_csv(file_path, index=index, encoding='utf-8')
+
+
+# typed columnar layout
+def is_typed_dataframe(df: pd.DataFrame) -> bool:
+    """
+    True for frames built in the typed layout (`df.attrs['typed']`, set by `reformat_data_body_typed`,
+    `to_typed_dataframe` and `import_dataframe_from_columnar(typed=True)`) that have status columns.
+    A plain frame with a raw column such as 'lot__status' is never treated as typed.
+    """
+    return bool(df.attrs.get(TYPED_ATTR)) and bool(status_columns(df))
+
+def status_codes(status: pd.Series) -> np.ndarray:
+    """
+    uint8 status codes of a status column; also accepts the label categories of older typed files.
+    """
+    if status.dtype == np.uint8:
+        return status.to_numpy()
+    codes = pd.Categorical(status.astype(str), categories=STATUS_LABELS).codes
+    return codes.astype(np.uint8)
+
+def to_typed_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Split each cleaned analyte column into float64 values and a uint8 status code.
+
+    'Invalid' cells become NaN with status 'invalid'; other NaN cells have status 'missing'.
+    The first column (sample_name) is kept as is. A frame that is already typed is returned unchanged.
+    Cleaned values no longer show which zeros were NA or which values were below a limit;
+    `sanitization.reformat_data_body_typed` keeps those statuses by building the layout while cleaning.
+
+    Args:
+        df (pd.DataFrame): Cleaned DataFrame, analytes from the second column on.
+
+    Returns:
+        pd.DataFrame: Typed DataFrame with `<analyte>` and `<analyte>__status` columns.
+    """
+    if is_typed_dataframe(df):
+        return df
+    columns = {df.columns[0]: df[df.columns[0]]}
+    for col in df.columns[1:]:
+        series = df[col]
+        invalid = (series == INVALID_VALUE).to_numpy(dtype=bool) if series.dtype == object else np.zeros(len(series), dtype=bool)
+        values = series.where(~invalid).astype(np.float64)
+        codes = np.where(invalid, STATUS_INVALID, np.where(values.isna(), STATUS_MISSING, STATUS_VALID)).astype(np.uint8)
+        columns[col] = values
+        columns[col + STATUS_SUFFIX] = codes
+    typed = pd.DataFrame(columns, index=df.index)
+    typed.attrs[TYPED_ATTR] = True
+    return typed
+
+def from_typed_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rebuild the cleaned layout from `to_typed_dataframe` output.
+
+    Columns holding an invalid status become object dtype with 'Invalid' again, the rest stay float64,
+    so the result exports to exactly the same CSV as the original cleaned DataFrame.
+    """
+    status = status_columns(df)
+    analytes = {analyte: status_col for status_col, analyte in status.items()}
+    columns = {}
+    for col in df.columns:
+        if col in status:
+            continue
+        if col not in analytes:
+            columns[col] = df[col]
+            continue
+        columns[col] = mark_invalid(df[col].to_numpy(dtype=np.float64), status_codes(df[analytes[col]]) == STATUS_INVALID)
+    return pd.DataFrame(columns, index=df.index)
+
+def _columnar_format(file_path: str, file_format: str = None) -> str:
+    if file_format is not None:
+        return file_format
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in COLUMNAR_FORMATS:
+        raise ValueError(f"Cannot infer columnar format from '{file_path}', use one of {list(COLUMNAR_FORMATS)}.")
+    return COLUMNAR_FORMATS[extension]
+
+def export_dataframe_to_columnar(df: pd.DataFrame, file_path: str, file_format: str = None,
+                                 compression: str = "zstd", row_group_size: int = None):
+    """
+    Export a cleaned DataFrame as Parquet or Arrow IPC with typed analyte columns.
+
+    Requires the optional `pyarrow` package.
+
+    Args:
+        df (pd.DataFrame): Cleaned DataFrame to export.
+        file_path (str): Output path; the format is taken from the extension (.parquet, .arrow, .feather, .ipc).
+        file_format (str): "parquet" or "arrow" to override the extension.
+        compression (str): Codec, e.g. "zstd", "lz4", "snappy" (Parquet only) or "uncompressed".
+        row_group_size (int): Rows per Parquet row group or Arrow record batch, default lets pyarrow decide.
+    """
+    import pyarrow as pa
+
+    file_format = _columnar_format(file_path, file_format)
+    table = pa.Table.from_pandas(to_typed_dataframe(df), preserve_index=False)
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, file_path, compression=compression, row_group_size=row_group_size)
+    elif file_format == "arrow":
+        import pyarrow.feather as feather
+        feather.write_feather(table, file_path, compression=compression, chunksize=row_group_size)
+    else:
+        raise ValueError(f"Unknown columnar format '{file_format}', expected 'parquet' or 'arrow'.")
+
+def import_dataframe_from_columnar(file_path: str, file_format: str = None, typed: bool = False) -> pd.DataFrame:
+    """
+    Load a file written by `export_dataframe_to_columnar`.
+
+    Args:
+        file_path (str): Parquet or Arrow IPC file.
+        file_format (str): "parquet" or "arrow" to override the extension.
+        typed (bool): Return the typed layout (float64 + status columns) instead of the cleaned layout.
+
+    Returns:
+        pd.DataFrame: The cleaned DataFrame, or its typed layout.
+    """
+    file_format = _columnar_format(file_path, file_format)
+    if file_format == "parquet":
+        df = pd.read_parquet(file_path)
+    elif file_format == "arrow":
+        df = pd.read_feather(file_path)
+    else:
+        raise ValueError(f"Unknown columnar format '{file_format}', expected 'parquet' or 'arrow'.")
+    if typed:
+        df.attrs[TYPED_ATTR] = True
+        return df
+    return from_typed_dataframe(df)
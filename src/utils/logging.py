@@ -1,31 +1,186 @@
 # logging.py
 import logging
+import logging.handlers
 import getpass
+import json
+import multiprocessing
 import os
+import socket
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from functools import lru_cache
+
+@lru_cache(maxsize=None)
+def current_user() -> str:
+	"""Login name, looked up once per process."""
+	return getpass.getuser()
+
+@lru_cache(maxsize=None)
+def current_host() -> str:
+	"""Host name, looked up once per process."""
+	return socket.gethostname()
 
 class CustomFormatter(logging.Formatter):
 	def format(self, record):
-		user = getpass.getuser()
-		record.user = user
+		record.user = current_user()
 		record.module_name = record.module
 		record.func_name = record.funcName
 		return super().format(record)
 
+# Attributes every LogRecord has; anything else was passed with `extra=` and goes into the JSON line.
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "user", "host", "module_name", "func_name"}
+
+class JsonLinesFormatter(logging.Formatter):
+	"""One JSON object per record, including fields passed with `extra=` (e.g. `stage_metrics`)."""
+	def format(self, record):
+		entry = {
+			"time": datetime.fromtimestamp(record.created).strftime(DATE_FORMAT),
+			"user": current_user(),
+			"host": current_host(),
+			"process": record.process,
+			"module": record.module,
+			"function": record.funcName,
+			"level": record.levelname,
+			"message": record.getMessage(),
+		}
+		for key, value in vars(record).items():
+			if key not in _RECORD_ATTRIBUTES:
+				entry[key] = value
+		if record.exc_info:
+			entry["exception"] = self.formatException(record.exc_info)
+		return json.dumps(entry, default=str)
+
+class BatchingHandler(logging.handlers.MemoryHandler):
+	"""Buffer records and write them to `target` in batches: when `capacity` records are
+	buffered, when an ERROR arrives, and every `flush_interval` seconds from a daemon
+	thread, so records logged before a quiet spell are written without waiting for the next one.
+	A stream target (e.g. the log `FileHandler`) is flushed once per batch, not once per record."""
+	def __init__(self, target, capacity=100, flush_interval=1.0):
+		super().__init__(capacity, flushLevel=logging.ERROR, target=target, flushOnClose=True)
+		self.flush_interval = flush_interval
+		self._stop_timer = threading.Event()
+		self._timer = threading.Thread(target=self._flush_periodically, name="log-batch-flush", daemon=True)
+		self._timer.start()
+
+	def flush(self):
+		"""Write every buffered record and flush the target's stream once, instead of once per record."""
+		target = self.target
+		if not isinstance(target, logging.StreamHandler) or getattr(target, "stream", None) is None:
+			super().flush()
+			return
+		with self.lock:
+			if not self.buffer:
+				return
+			with target.lock:
+				for record in self.buffer:
+					if record.levelno < target.level or not target.filter(record):
+						continue
+					try:
+						target.stream.write(target.format(record) + target.terminator)
+					except Exception:
+						target.handleError(record)
+				target.stream.flush()
+			self.buffer.clear()
+
+	def _flush_periodically(self):
+		while not self._stop_timer.wait(self.flush_interval):
+			self.flush()
+
+	def close(self):
+		self._stop_timer.set()
+		if self._timer is not threading.current_thread():
+			self._timer.join()
+		super().close()
+
 LOG_FORMAT = "%(asctime)s - %(user)s - [%(module_name)s] - [%(func_name)s] - %(levelname)s - %(message)s"
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "log")
+
+# Names of the loggers set up by `get_logger`, and the queue logging state of this process.
+_loggers = set()
+_queue_handler = None
+_listener = None
+_log_queue = None
+
+def _file_handler(log_path=None, json_lines=False):
+	if log_path is None:
+		# Create log directory if it doesn't exist
+		if not os.path.exists(LOG_DIR):
+			os.makedirs(LOG_DIR)
+		log_filename = datetime.now().strftime("%Y-%m-%d_Log") + (".jsonl" if json_lines else "")
+		log_path = os.path.join(LOG_DIR, log_filename)
+	file_handler = logging.FileHandler(log_path, encoding="utf-8")
+	file_handler.setFormatter(JsonLinesFormatter() if json_lines else CustomFormatter(LOG_FORMAT, DATE_FORMAT))
+	return file_handler
+
+def _use_handler(logger, handler):
+	for old_handler in list(logger.handlers):
+		logger.removeHandler(old_handler)
+		if old_handler is not _queue_handler:
+			old_handler.close()
+	logger.addHandler(handler)
 
 def get_logger(name=None):
 	logger = logging.getLogger(name)
 	if not logger.hasHandlers():
-		# Create log directory if it doesn't exist
-		log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "log")
-		if not os.path.exists(log_dir):
-			os.makedirs(log_dir)
-		log_filename = datetime.now().strftime("%Y-%m-%d_Log")
-		log_path = os.path.join(log_dir, log_filename)
-		file_handler = logging.FileHandler(log_path, encoding="utf-8")
-		file_handler.setFormatter(CustomFormatter(LOG_FORMAT, DATE_FORMAT))
-		logger.addHandler(file_handler)
+		logger.addHandler(_queue_handler if _queue_handler is not None else _file_handler())
 		logger.setLevel(logging.INFO)
+		_loggers.add(name)
 	return logger
+
+def configure_worker_logging(log_queue):
+	"""Send every `get_logger` logger of this process to `log_queue`.
+
+	Pass it as the initializer of a process pool, with the queue from `start_queue_logging`,
+	so worker records reach the single listener in the parent process.
+	"""
+	global _queue_handler
+	_queue_handler = logging.handlers.QueueHandler(log_queue)
+	for name in _loggers:
+		_use_handler(logging.getLogger(name), _queue_handler)
+
+def start_queue_logging(log_path=None, json_lines=True, capacity=100, flush_interval=1.0):
+	"""Move file writes off the calling threads and processes.
+
+	Loggers only put records on a multiprocessing queue; a `QueueListener` thread
+	formats them (JSON lines by default) and writes them to one file in batches.
+	Returns the queue, for `configure_worker_logging` in worker processes.
+	If queue logging is already running, its queue is returned unchanged.
+	"""
+	global _listener, _log_queue
+	if _listener is not None:
+		return _log_queue
+	_log_queue = multiprocessing.Queue(-1)
+	target = BatchingHandler(_file_handler(log_path, json_lines), capacity, flush_interval)
+	_listener = logging.handlers.QueueListener(_log_queue, target, respect_handler_level=True)
+	_listener.start()
+	configure_worker_logging(_log_queue)
+	return _log_queue
+
+def stop_queue_logging():
+	"""Flush and stop the listener started by `start_queue_logging` and go back to direct file writes."""
+	global _listener, _log_queue, _queue_handler
+	if _listener is None:
+		return
+	_listener.stop()
+	for handler in _listener.handlers:
+		target = handler.target
+		handler.close()
+		target.close()
+	_listener = None
+	_log_queue = None
+	_queue_handler = None
+	for name in _loggers:
+		_use_handler(logging.getLogger(name), _file_handler())
+
+@contextmanager
+def queue_logging(log_path=None, json_lines=True):
+	"""Run a block with queue logging, reusing it if the caller already started it. Yields the queue."""
+	started = _listener is None
+	log_queue = start_queue_logging(log_path, json_lines)
+	try:
+		yield log_queue
+	finally:
+		if started:
+			stop_queue_logging()
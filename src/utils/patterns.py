@@ -0,0 +1,157 @@
+# patterns.py
+import json
+import re
+
+# Control level names searched for in 'sample_name', in priority order: when two names
+# match at the same position the earlier one wins (e.g. "UTAK" before "UTAK control").
+CONTROL_LEVELS = [
+    "C1", "C2", "C3",
+    "Low Control", "Medium Control", "High Control", "Med Control",
+    "VISCON", "Dil con", "DIL CON", "Dilution control",
+    "NC1", "NC2", "NC3",
+    "PG1", "PG2", "PG3",
+    "CUTOFF G1", "CUTOFF G2", "CUTOFF G3",
+    "Negative Control", "Blank control",
+    "UTAK", "UTAK control",
+]
+
+# Label reported by the sample classifier for each control level name; names not
+# listed here are labelled with their upper-cased text.
+CONTROL_LEVEL_LABELS = {
+    "Med Control": "MEDIUM CONTROL",
+    "Dil con": "DILUTION",
+    "DIL CON": "DILUTION",
+    "Dilution control": "DILUTION",
+    "Blank control": "BLANK",
+    "UTAK control": "UTAK",
+}
+
+DEFAULT_PATTERNS = {
+    # data body
+    "na": r'(?i)^\s*(N/A|NA|na|Na|nA)\s*$',
+    "special_characters": r'[^\da-zA-Z\s.-]',
+    "no_root": r'(?i)^noroot$',
+    # sample names
+    "sample_name_special_characters": r'[^\w\s]',
+    "multiple_spaces": r'\s+',
+    "standard": r'(?i)^\s*(?:standard|std)\b',
+}
+
+
+def build_alternation(terms: list) -> str:
+    """_Merge literal terms into one case-insensitive trie-shaped regex with one capture group._
+
+    Gives the same matches as `(?i)(term1|term2|...)`: a term is dropped when an
+    earlier term is a prefix of it (it could never win), and the remaining
+    prefix chains prefer the longer term, which is then always the earlier one.
+
+    Args:
+        terms (list): _Literal strings in priority order._
+
+    Returns:
+        str: _Regex source, e.g. `(?i)((?:c(?:utoff\\ g[123]|[123])|...))`._
+    """
+    kept = []
+    for term in (term.lower() for term in terms):
+        if term and not any(term.startswith(earlier) for earlier in kept):
+            kept.append(term)
+
+    trie = {}
+    for term in kept:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def to_regex(node: dict) -> str:
+        ends_here = "" in node
+        branches = [char for char in node if char != ""]
+        if not branches:
+            return ""
+        single_chars = [char for char in branches if list(node[char]) == [""]]
+        parts = [re.escape(char) + to_regex(node[char]) for char in branches if char not in single_chars]
+        if len(single_chars) == 1:
+            parts.append(re.escape(single_chars[0]))
+        elif single_chars:
+            parts.append("[" + "".join(re.escape(char) for char in single_chars) + "]")
+        if ends_here:
+            return "(?:" + "|".join(parts) + ")?"
+        return parts[0] if len(parts) == 1 else "(?:" + "|".join(parts) + ")"
+
+    return "(?i)(" + to_regex(trie) + ")" if kept else "(?!)()"
+
+
+class PatternRegistry:
+    """_Named regular expressions shared by every sanitization and QC function._
+
+    Each rule is compiled once when registered. `describe()` lists the sources for
+    inspection, and `load_config` adds or overrides rules from a JSON file.
+    """
+
+    def __init__(self):
+        self._sources = {}
+        self._compiled = {}
+        self.control_levels = []
+        self.control_level_labels = {}
+
+    def register(self, name: str, pattern: str):
+        """_Compile and store a pattern under `name`, replacing any earlier one._"""
+        self._compiled[name] = re.compile(pattern)
+        self._sources[name] = pattern
+
+    def register_control_levels(self, terms, replace: bool = False):
+        """_Add control level names (lowest priority) and rebuild the merged 'control_level' pattern._
+
+        Args:
+            terms (list | dict): _Names, or {name: label} to set the classifier label._
+            replace (bool): _Drop the existing control levels first._
+        """
+        labels = dict(terms) if isinstance(terms, dict) else {}
+        if replace:
+            self.control_levels = []
+            self.control_level_labels = {}
+        for term in terms:
+            self.control_levels.append(term)
+            self.control_level_labels.setdefault(term.lower(), labels.get(term, term.upper()))
+        self.register("control_level", build_alternation(self.control_levels))
+
+    def control_level_categories(self) -> list:
+        """_Distinct control level labels in priority order._"""
+        return list(dict.fromkeys(self.control_level_labels.values()))
+
+    def load_config(self, path: str):
+        """_Load rules from JSON: `{"patterns": {name: regex}, "control_levels": [names] or {name: label}}`._"""
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        for name, pattern in config.get("patterns", {}).items():
+            self.register(name, pattern)
+        if config.get("control_levels"):
+            self.register_control_levels(config["control_levels"])
+
+    def get(self, name: str) -> re.Pattern:
+        return self._compiled[name]
+
+    def __getitem__(self, name: str) -> re.Pattern:
+        return self._compiled[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._compiled
+
+    def names(self) -> list:
+        return list(self._compiled)
+
+    def describe(self) -> dict:
+        """_Return {name: regex source} for every registered rule._"""
+        return dict(self._sources)
+
+
+def default_registry() -> PatternRegistry:
+    """_Build a registry holding the built-in rules and control levels._"""
+    registry = PatternRegistry()
+    for name, pattern in DEFAULT_PATTERNS.items():
+        registry.register(name, pattern)
+    registry.register_control_levels({term: CONTROL_LEVEL_LABELS.get(term, term.upper()) for term in CONTROL_LEVELS})
+    return registry
+
+
+PATTERNS = default_registry()
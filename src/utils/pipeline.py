@@ -0,0 +1,393 @@
+from src.utils.logging import configure_worker_logging, get_logger, queue_logging
+from src.utils.sanitization import (
+    check_data_contents,
+    check_levels_present,
+    check_number_of_specimen,
+    classify_samples,
+    status_counts,
+)
+from src.utils.stages import default_pipeline
+from src.utils.provenance import ProvenanceLog
+from src.utils.sharding import column_pool
+from src.utils.cache import HASH_BLOCK_SIZE, file_block_hashes, rules_version, verify_block_hashes
+from src.utils.csv_configs import DEFAULT_CSV_CONFIG, get_csv_config
+from src.utils.file_io import (
+    is_typed_dataframe,
+    from_typed_dataframe,
+    export_dataframe_to_csv,
+    import_dataframe_from_csv,
+    iter_dataframe_chunks_from_csv,
+    complete_rows_end,
+    csv_byte_ranges,
+    read_csv_byte_range,
+    DEFAULT_RANGE_BYTES,
+)
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import json
+import os
+logger = get_logger(__name__)
+
+DEFAULT_CHUNK_SIZE = 100_000
+STATE_SUFFIX = ".state.json"
+# Summary entries with one item per row; the incremental state keeps only the counts.
+SUMMARY_LISTS = ("levels_present", "specimens")
+
+
+def clean_dataframe(data: pd.DataFrame, stages=None, copy: bool = False) -> pd.DataFrame:
+    """_Run the sample name and data body cleaning on one DataFrame._
+
+    Args:
+        data (pd.DataFrame): _Raw DataFrame with 'sample_name' as the first column._
+        stages (StagePipeline): _Cleaning stages to run, defaults to `default_pipeline()`;
+            pass one in to read its `last_report` afterwards._
+        copy (bool): _Leave `data` untouched; by default its columns are replaced in place,
+            which is what the file pipelines want for the frames they just parsed._
+
+    Returns:
+        pd.DataFrame: _Cleaned DataFrame._
+    """
+    if stages is None:
+        stages = default_pipeline()
+    data = stages.run(data, copy=copy)
+
+    return data
+
+def _empty_summary() -> dict:
+    return {"rows": 0, "data_present": False, "levels_present": [], "specimens": [], "sample_counts": {}}
+
+def _part_summary(cleaned_data: pd.DataFrame, data_present: bool) -> dict:
+    """_QC summary of one cleaned chunk or range, to be merged with `_merge_summary`.
+
+    Typed frames also report 'status_counts', counted straight from the status code arrays._
+    """
+    summary = {
+        "rows": len(cleaned_data),
+        "data_present": data_present,
+        "levels_present": check_levels_present(cleaned_data),
+        "specimens": check_number_of_specimen(cleaned_data),
+        "sample_counts": classify_samples(cleaned_data)["counts"],
+    }
+    if is_typed_dataframe(cleaned_data):
+        summary["status_counts"] = status_counts(cleaned_data)
+    return summary
+
+def _merge_summary(summary: dict, part: dict):
+    """_Accumulate a part summary into the whole-file summary, in file order._"""
+    summary["rows"] += part["rows"]
+    summary["data_present"] = summary["data_present"] or part["data_present"]
+    for key in SUMMARY_LISTS:
+        if key in summary:
+            summary[key].extend(part[key])
+    for label, count in part["sample_counts"].items():
+        summary["sample_counts"][label] = summary["sample_counts"].get(label, 0) + count
+    for label, count in part.get("status_counts", {}).items():
+        summary.setdefault("status_counts", {})
+        summary["status_counts"][label] = summary["status_counts"].get(label, 0) + count
+
+def clean_csv_file(input_path: str = None, output_path: str = "cleaned_sample_patients.csv", cache=None,
+                   config_name: str = DEFAULT_CSV_CONFIG, report_path: str = None, profile: bool = False,
+                   column_workers: int = 1, typed: bool = False, provenance_path: str = None) -> dict:
+    """_Load a whole CSV file, clean it and write the cleaned CSV._
+
+    Args:
+        input_path (str): _Raw CSV file, defaults to 'sample_patients.csv'._
+        output_path (str): _Cleaned CSV file, overwritten if it exists._
+        cache (CleanedFileCache): _Optional result cache; on a hit the cached output
+            is copied to `output_path` without parsing or cleaning._
+        config_name (str): _CSV profile used to parse the input._
+        report_path (str): _Optional JSON run report with per-stage time, rows and
+            cells (not written on a cache hit)._
+        profile (bool): _Also record cells changed and peak memory per stage._
+        column_workers (int): _Clean the analyte columns in this many groups on
+            worker processes (see `clean_data_body_sharded`); 1 cleans in-process._
+        typed (bool): _Clean into the compact typed layout (float64 values plus uint8
+            status codes, see `reformat_data_body_typed`); the CSV written is the same._
+        provenance_path (str): _Optional Parquet file recording (row, column, rule) for
+            every cell a cleaning rule changed (see `ProvenanceLog`); the cache is not
+            used, as a cached output has no provenance._
+
+    Returns:
+        dict: _Summary with 'rows', 'data_present', 'levels_present', 'specimens',
+        'sample_counts' and whether it came from the cache ('cached'); with `typed`
+        also 'status_counts' (valid / na_zero / below_loq / invalid / missing cells),
+        with `provenance_path` also 'provenance_counts' (changed cells per rule)._
+    """
+    if provenance_path is not None:
+        cache = None
+    if cache is not None:
+        if input_path is None:
+            input_path = os.path.join(os.getcwd(), "sample_patients.csv")
+        # Typed runs also cache their status counts, so they get their own entries.
+        key = cache.key(input_path, {"name": config_name, **get_csv_config(config_name), **({"typed": True} if typed else {})})
+        summary = cache.get(key, output_path)
+        if summary is not None:
+            logger.info(f"Cache hit for {input_path}, skipped cleaning.")
+            return {"input_path": input_path, "output_path": output_path, **summary, "cached": True}
+
+    data = import_dataframe_from_csv(input_path, config_name)
+    data_present = check_data_contents(data)
+    provenance = ProvenanceLog() if provenance_path is not None else None
+    stages = default_pipeline(profile=profile, column_workers=column_workers, typed=typed, provenance=provenance)
+    cleaned_data = clean_dataframe(data, stages)
+    export_dataframe_to_csv(cleaned_data, output_path, index=False)
+    if report_path is not None:
+        stages.write_report(report_path, input_path=input_path, output_path=output_path)
+
+    summary = _part_summary(cleaned_data, data_present)
+    if provenance is not None:
+        provenance.export_parquet(provenance_path)
+        summary["provenance_counts"] = provenance.counts()
+    if cache is not None:
+        cache.put(key, output_path, summary)
+
+    return {"input_path": input_path, "output_path": output_path, **summary, "cached": False}
+
+def clean_csv_file_in_chunks(input_path: str = None, output_path: str = "cleaned_sample_patients.csv",
+                             chunk_size: int = DEFAULT_CHUNK_SIZE, config_name: str = DEFAULT_CSV_CONFIG,
+                             column_workers: int = 1, provenance_path: str = None, typed: bool = False) -> dict:
+    """_Stream a CSV file through the cleaning steps in row chunks._
+
+    Each chunk is cleaned and appended to `output_path` before the next one is
+    read, so peak memory follows `chunk_size` rather than the file size. The
+    QC checks are accumulated over all chunks and describe the whole file.
+
+    Args:
+        input_path (str): _Raw CSV file, defaults to 'sample_patients.csv'._
+        output_path (str): _Cleaned CSV file, overwritten if it exists._
+        chunk_size (int): _Number of rows cleaned at a time._
+        config_name (str): _CSV profile used to parse the input._
+        column_workers (int): _Clean each chunk's analyte columns in groups on one
+            pool of this many worker processes; 1 cleans in-process._
+        provenance_path (str): _Optional Parquet file of (row, column, rule) for every
+            changed cell, rows numbered over the whole file (see `clean_csv_file`)._
+        typed (bool): _Clean each chunk into the typed layout, as in `clean_csv_file`;
+            the CSV written is the same and the summary gains 'status_counts'._
+
+    Returns:
+        dict: _Same summary as `clean_csv_file`, plus the number of chunks._
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive number of rows.")
+    logger.info(f"Cleaning {input_path} in chunks of {chunk_size} rows.")
+
+    summary = _empty_summary()
+    chunks = 0
+    provenance = ProvenanceLog() if provenance_path is not None else None
+    with column_pool(column_workers if provenance is None else 1) as executor:
+        stages = default_pipeline(column_workers=column_workers, executor=executor, typed=typed, provenance=provenance)
+        for chunk in iter_dataframe_chunks_from_csv(input_path, chunk_size, config_name):
+            # Only the first non-empty chunk needs to report that data is present.
+            data_present = summary["data_present"] or check_data_contents(chunk)
+            if provenance is not None:
+                provenance.row_offset = summary["rows"]
+            cleaned_chunk = clean_dataframe(chunk, stages)
+            export_dataframe_to_csv(cleaned_chunk, output_path, index=False, append=chunks > 0)
+            _merge_summary(summary, _part_summary(cleaned_chunk, data_present))
+            chunks += 1
+    if provenance is not None:
+        provenance.export_parquet(provenance_path)
+        summary["provenance_counts"] = provenance.counts()
+
+    return {"input_path": input_path, "output_path": output_path, "chunks": chunks, **summary}
+
+def clean_csv_range_task(input_path: str, start: int, end: int, columns: list, config_name: str,
+                         header: bool, typed: bool = False) -> tuple:
+    """_Parse, clean and serialise one byte range; returns (cleaned CSV text, part summary)._
+
+    Runs in a worker process, so it must stay a module level function.
+    """
+    data = read_csv_byte_range(input_path, start, end, columns, config_name)
+    data_present = check_data_contents(data)
+    cleaned_data = clean_dataframe(data, default_pipeline(typed=typed))
+    text = (from_typed_dataframe(cleaned_data) if typed else cleaned_data).to_csv(index=False, header=header)
+    return text, _part_summary(cleaned_data, data_present)
+
+def clean_csv_file_in_ranges(input_path: str = None, output_path: str = "cleaned_sample_patients.csv",
+                             range_bytes: int = DEFAULT_RANGE_BYTES, max_workers: int = 1,
+                             config_name: str = DEFAULT_CSV_CONFIG, typed: bool = False) -> dict:
+    """_Clean a large CSV by memory-mapped byte ranges, optionally on a process pool._
+
+    The file is split on row boundaries with `csv_byte_ranges`; every range is
+    parsed straight from the memory map (each worker maps the file itself, so no
+    input bytes are pickled), cleaned, and written to `output_path` in file order.
+    At most two ranges per worker are in flight, which bounds memory.
+
+    Args:
+        input_path (str): _Raw CSV file, defaults to 'sample_patients.csv'._
+        output_path (str): _Cleaned CSV file, overwritten if it exists._
+        range_bytes (int): _Approximate input bytes per range._
+        max_workers (int): _Worker processes; 1 cleans the ranges in-process._
+        config_name (str): _CSV profile used to parse the input._
+        typed (bool): _Clean each range into the typed layout, as in `clean_csv_file`;
+            the CSV written is the same and the summary gains 'status_counts'._
+
+    Returns:
+        dict: _Same summary as `clean_csv_file_in_chunks`, with 'ranges' instead of 'chunks'._
+    """
+    if input_path is None:
+        input_path = os.path.join(os.getcwd(), "sample_patients.csv")
+    layout = csv_byte_ranges(input_path, range_bytes, config_name)
+    ranges = layout["ranges"]
+    logger.info(f"Cleaning {input_path} as {len(ranges)} byte ranges with {max_workers} workers.")
+
+    summary = _empty_summary()
+    with open(output_path, "w", encoding="utf-8", newline="") as output:
+        if not ranges:
+            empty = clean_dataframe(pd.DataFrame(columns=layout["columns"], dtype=object))
+            output.write(empty.to_csv(index=False))
+            summary["data_present"] = check_data_contents(empty)
+        elif max_workers == 1:
+            for position, (start, end) in enumerate(ranges):
+                text, part = clean_csv_range_task(input_path, start, end, layout["columns"], config_name, position == 0,
+                                                  typed)
+                output.write(text)
+                _merge_summary(summary, part)
+        else:
+            with queue_logging(json_lines=False) as log_queue, ProcessPoolExecutor(
+                max_workers=max_workers, initializer=configure_worker_logging, initargs=(log_queue,)
+            ) as executor:
+                pending = deque()
+                for position, (start, end) in enumerate(ranges):
+                    pending.append(executor.submit(
+                        clean_csv_range_task, input_path, start, end, layout["columns"], config_name, position == 0, typed
+                    ))
+                    if len(pending) >= 2 * max_workers:
+                        text, part = pending.popleft().result()
+                        output.write(text)
+                        _merge_summary(summary, part)
+                while pending:
+                    text, part = pending.popleft().result()
+                    output.write(text)
+                    _merge_summary(summary, part)
+
+    return {"input_path": input_path, "output_path": output_path, "ranges": len(ranges), **summary}
+
+def _count_summary(summary: dict) -> dict:
+    """_The summary without its per-row lists, so it stays the same size however many rows are merged in._"""
+    return {key: value for key, value in summary.items() if key not in SUMMARY_LISTS}
+
+def _summary_lists(output_path: str) -> dict:
+    """_'levels_present' and 'specimens' of a cleaned CSV, read back from its 'sample_name' column._"""
+    data = pd.read_csv(output_path, usecols=["sample_name"], dtype=str, keep_default_na=False, na_values=[""])
+    return {"levels_present": check_levels_present(data), "specimens": check_number_of_specimen(data)}
+
+def _load_state(state_path: str) -> dict:
+    try:
+        with open(state_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save_state(state_path: str, state: dict):
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=4)
+    os.replace(tmp_path, state_path)
+
+def clean_csv_file_incremental(input_path: str, output_path: str, config_name: str = DEFAULT_CSV_CONFIG,
+                               state_path: str = None, range_bytes: int = DEFAULT_RANGE_BYTES,
+                               full_summary: bool = False) -> dict:
+    """_Clean only the rows appended to `input_path` since the last run._
+
+    A sidecar state file (default `<output_path>.state.json`) records the byte
+    offset and row count already cleaned, SHA-256 hashes of the input up to that
+    offset in 1 MB blocks, the CSV profile, the rules version and the output size.
+    When all of them still hold, only the complete rows after the offset are
+    parsed, cleaned and appended to `output_path`. Otherwise (any byte before the
+    offset changed, rules, profile or output changed) the output is rebuilt from
+    scratch. A last row without a line ending is treated as still being written
+    and left for the next run.
+
+    The prefix check reads the already-cleaned bytes once and stops at the first
+    changed block, which is far cheaper than parsing and cleaning them again; the
+    hashes for the next run only read the new bytes.
+
+    Args:
+        input_path (str): _Raw CSV file that instruments append to._
+        output_path (str): _Cleaned CSV file._
+        config_name (str): _CSV profile used to parse the input._
+        state_path (str): _Sidecar state file._
+        range_bytes (int): _Input bytes cleaned at a time during a full rebuild._
+        full_summary (bool): _Also return 'levels_present' and 'specimens', read back
+            from the whole output; the state only keeps counts, so it does not grow with the file._
+
+    Returns:
+        dict: _Whole-file counts as in `clean_csv_file_in_chunks` ('rows', 'data_present',
+        'sample_counts'), plus 'mode' ('incremental' or 'rebuild') and 'new_rows'._
+    """
+    if state_path is None:
+        state_path = output_path + STATE_SUFFIX
+    state = _load_state(state_path)
+    end = complete_rows_end(input_path)
+    identity = {
+        "input_path": os.path.abspath(input_path),
+        "config": {"name": config_name, **get_csv_config(config_name)},
+        "rules_version": rules_version(),
+    }
+
+    reusable = (
+        state is not None
+        and all(state.get(key) == value for key, value in identity.items())
+        and state.get("offset") is not None
+        and state["offset"] <= end
+        and os.path.exists(output_path)
+        and os.path.getsize(output_path) == state["output_size"]
+    )
+    if reusable:
+        reusable = state.get("block_size") == HASH_BLOCK_SIZE and verify_block_hashes(
+            input_path, state.get("block_hashes", []), state["offset"], HASH_BLOCK_SIZE)
+
+    if reusable:
+        summary = _count_summary(state["summary"])
+        columns = state["columns"]
+        new_rows = 0
+        if end > state["offset"]:
+            text, part = clean_csv_range_task(input_path, state["offset"], end, columns, config_name, False)
+            with open(output_path, "a", encoding="utf-8", newline="") as output:
+                output.write(text)
+            _merge_summary(summary, _count_summary(part))
+            new_rows = part["rows"]
+        block_hashes = file_block_hashes(input_path, end, HASH_BLOCK_SIZE, state["block_hashes"],
+                                         state["offset"] // HASH_BLOCK_SIZE)
+        mode = "incremental"
+    else:
+        logger.info(f"Rebuilding {output_path} from {input_path}.")
+        layout = csv_byte_ranges(input_path, range_bytes, config_name)
+        columns = layout["columns"]
+        summary = _count_summary(_empty_summary())
+        with open(output_path, "w", encoding="utf-8", newline="") as output:
+            header_written = False
+            for start, range_end in layout["ranges"]:
+                if start >= end:
+                    break
+                text, part = clean_csv_range_task(input_path, start, min(range_end, end), columns, config_name, not header_written)
+                output.write(text)
+                header_written = True
+                _merge_summary(summary, _count_summary(part))
+            if not header_written:
+                output.write(clean_dataframe(pd.DataFrame(columns=columns, dtype=object)).to_csv(index=False))
+        data_start = layout["ranges"][0][0] if layout["ranges"] else os.path.getsize(input_path)
+        if end < data_start:
+            # The header line itself is not terminated yet, so there is no row boundary to resume from.
+            end = None
+        block_hashes = file_block_hashes(input_path, end or 0, HASH_BLOCK_SIZE)
+        new_rows = summary["rows"]
+        mode = "rebuild"
+
+    _save_state(state_path, {
+        **identity,
+        "columns": columns,
+        "offset": end,
+        "rows": summary["rows"],
+        "block_size": HASH_BLOCK_SIZE,
+        "block_hashes": block_hashes,
+        "output_size": os.path.getsize(output_path),
+        "summary": summary,
+    })
+    logger.info(f"{mode.capitalize()} cleaning of {input_path}: {new_rows} new rows, {summary['rows']} in total.")
+
+    if full_summary:
+        summary = {**summary, **_summary_lists(output_path)}
+    return {"input_path": input_path, "output_path": output_path, "mode": mode, "new_rows": new_rows, **summary}
@@ -0,0 +1,86 @@
+from src.utils.logging import get_logger
+from src.utils.sanitization import RULE_LABELS
+import numpy as np
+import pandas as pd
+logger = get_logger(__name__)
+
+PROVENANCE_COLUMNS = ["row", "column", "rule"]
+
+
+class ProvenanceLog:
+    """_Sparse record of which cleaning rule changed which cell, kept as int arrays._
+
+    Every record is a block of row positions (int64) for one column id (int32) and
+    rule id (uint8, the index into `RULE_LABELS`), so a million changed cells take
+    about 13 MB and no per-cell Python objects. A cell changed by several rules
+    (e.g. ' < 5' by space trimming and special characters) has one record per rule.
+    Rows are positions in the cleaned frame; `row_offset` shifts them, e.g. for
+    the next chunk of a file.
+    """
+
+    def __init__(self, row_offset: int = 0):
+        self.row_offset = row_offset
+        self.columns = []
+        self._column_ids = {}
+        self._rows = []
+        self._cols = []
+        self._rules = []
+
+    def _column_id(self, col) -> int:
+        if col not in self._column_ids:
+            self._column_ids[col] = len(self.columns)
+            self.columns.append(col)
+        return self._column_ids[col]
+
+    def record(self, col, rows: np.ndarray, rule: int):
+        """_Record that `rule` changed the cells of `col` at the given row positions._"""
+        if len(rows) == 0:
+            return
+        rows = np.asarray(rows, dtype=np.int64)
+        self._rows.append(rows + self.row_offset if self.row_offset else rows)
+        self._cols.append(np.full(len(rows), self._column_id(col), dtype=np.int32))
+        self._rules.append(np.full(len(rows), rule, dtype=np.uint8))
+
+    def record_rule_bits(self, col, bits: np.ndarray):
+        """_Record one column from its per-cell rule bitmask (bit `1 << rule id`, see `clean_data_body_arrays`)._"""
+        changed = np.flatnonzero(bits)
+        if len(changed) == 0:
+            return
+        changed_bits = bits[changed]
+        for rule in range(len(RULE_LABELS)):
+            self.record(col, changed[(changed_bits & (1 << rule)) != 0], rule)
+
+    def __len__(self) -> int:
+        return sum(len(rows) for rows in self._rows)
+
+    def arrays(self) -> tuple:
+        """_(rows int64, column ids int32, rule ids uint8) of every record, in the order recorded._"""
+        if not self._rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32), np.empty(0, dtype=np.uint8)
+        return np.concatenate(self._rows), np.concatenate(self._cols), np.concatenate(self._rules)
+
+    def counts(self) -> dict:
+        """_Changed cells per rule, e.g. {'remove_string_na': 12, ...}; rules that changed nothing are left out._"""
+        counts = np.zeros(len(RULE_LABELS), dtype=np.int64)
+        for rules in self._rules:
+            counts[rules[0]] += len(rules)
+        return {label: int(count) for label, count in zip(RULE_LABELS, counts) if count}
+
+    def to_frame(self) -> pd.DataFrame:
+        """_One row per record: 'row', 'column' and 'rule', the last two as categoricals over the ids._"""
+        rows, cols, rules = self.arrays()
+        return pd.DataFrame({
+            "row": rows,
+            "column": pd.Categorical.from_codes(cols, categories=[str(col) for col in self.columns]),
+            "rule": pd.Categorical.from_codes(rules, categories=RULE_LABELS),
+        })
+
+    def export_parquet(self, file_path: str, compression: str = "zstd"):
+        """_Write the records as Parquet (dictionary-encoded column and rule names); needs `pyarrow`._"""
+        self.to_frame().to_parquet(file_path, index=False, compression=compression)
+        logger.info(f"Saved {len(self)} provenance records to {file_path}.")
+
+
+def import_provenance(file_path: str) -> pd.DataFrame:
+    """_Load provenance written by `ProvenanceLog.export_parquet` as a 'row', 'column', 'rule' frame._"""
+    return pd.read_parquet(file_path, columns=PROVENANCE_COLUMNS)
@@ -0,0 +1,256 @@
+from src.utils.logging import configure_worker_logging, get_logger, queue_logging
+from src.utils.batch import cleaned_output_path, find_input_files
+from src.utils.cache import file_content_hash, files_identical, rules_version
+from src.utils.csv_configs import DEFAULT_CSV_CONFIG, get_csv_config
+from src.utils.dataframe_match_comparison import compare_cleaned_dataframes
+from src.utils.file_io import export_dataframe_to_csv, import_dataframe_from_csv
+from src.utils.pipeline import clean_dataframe
+from src.utils.provenance import ProvenanceLog
+from src.utils.sanitization import RULE_LABELS
+from src.utils.stages import default_pipeline
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+logger = get_logger(__name__)
+
+REPORT_NAME = "regression_report.json"
+STATE_NAME = "regression_state.json"
+
+# Changed cells that no cleaning rule touched: the raw value was kept as is or only parsed as a number.
+NO_RULE = "no_rule"
+
+# Verdicts per file; only 'unchanged' files are skipped on the next run.
+UNCHANGED = "unchanged"
+CHANGED = "changed"
+MISSING_GOLDEN = "missing_golden"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+def _hash_record(file_path: str, previous: dict = None) -> dict:
+    """_(size, mtime) and SHA-256 of a file; the hash is reused from `previous` when (size, mtime) are unchanged._"""
+    stat = os.stat(file_path)
+    fingerprint = [stat.st_size, stat.st_mtime_ns]
+    if previous and previous.get("fingerprint") == fingerprint:
+        return previous
+    return {"fingerprint": fingerprint, "sha256": file_content_hash(file_path)}
+
+def _load_state(state_path: str) -> dict:
+    try:
+        with open(state_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_state(state_path: str, state: dict):
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=4)
+    os.replace(tmp_path, state_path)
+
+def verify_file_task(input_path: str, golden_path: str, work_dir: str, config_name: str = DEFAULT_CSV_CONFIG) -> dict:
+    """_Re-clean one raw file and compare it with its golden output; failures are recorded, not raised._
+
+    Runs in a worker process, so it must stay a module level function. The file is
+    cleaned with a `ProvenanceLog`, and every changed cell is charged to each rule
+    that changed that very cell (a cell changed by two rules counts for both), or to
+    `NO_RULE` when no rule touched it.
+    """
+    start = time.perf_counter()
+    entry = {
+        "input_path": input_path,
+        "golden_path": golden_path,
+        "verdict": None,
+        "rows": None,
+        "cells_changed": 0,
+        "columns": {},
+        "rules": {},
+        "seconds": None,
+        "error": None,
+    }
+    try:
+        provenance = ProvenanceLog()
+        cleaned = clean_dataframe(import_dataframe_from_csv(input_path, config_name), default_pipeline(provenance=provenance))
+        output_path = os.path.join(work_dir, os.path.basename(golden_path))
+        export_dataframe_to_csv(cleaned, output_path, index=False)
+        entry["rows"] = len(cleaned)
+
+        if files_identical(output_path, golden_path):
+            entry["verdict"] = UNCHANGED
+        else:
+            analysis = compare_cleaned_dataframes(golden_path, output_path, display=False, report_path=None, tolerance=0.0)
+            rows, cols, rules = provenance.arrays()
+            for col, comp in analysis["series_comparison"].items():
+                if not comp["num_mismatches"]:
+                    continue
+                entry["columns"][col] = comp["num_mismatches"]
+                mismatched = np.asarray(comp["mismatched_indices"], dtype=np.int64)
+                changed = np.zeros(len(rows), dtype=bool)
+                if col in provenance.columns:
+                    changed = (cols == provenance.columns.index(col)) & np.isin(rows, mismatched)
+                for label, count in zip(RULE_LABELS, np.bincount(rules[changed], minlength=len(RULE_LABELS))):
+                    if count:
+                        entry["rules"][label] = entry["rules"].get(label, 0) + int(count)
+                unattributed = len(np.setdiff1d(mismatched, rows[changed]))
+                if unattributed:
+                    entry["rules"][NO_RULE] = entry["rules"].get(NO_RULE, 0) + unattributed
+            entry["cells_changed"] = sum(entry["columns"].values())
+            entry["column_match"] = analysis["column_match"]
+            entry["dataframe_match"] = analysis["dataframe_match"]
+            # A file can also differ without a changed cell, e.g. in its columns, row count or number format.
+            entry["verdict"] = CHANGED
+        os.remove(output_path)
+    except Exception as e:
+        entry["verdict"] = FAILED
+        entry["error"] = f"{type(e).__name__}: {e}"
+    entry["seconds"] = round(time.perf_counter() - start, 6)
+    return entry
+
+def run_regression(raw_source: str, golden_dir: str, max_workers: int = None, report_path: str = None,
+                   state_path: str = None, config_name: str = DEFAULT_CSV_CONFIG, recheck: bool = False) -> dict:
+    """_Re-clean a corpus of raw files with the current rules and compare each with its golden output._
+
+    Golden outputs are named as the batch runner names them (`cleaned_<name>.csv` in
+    `golden_dir`). A file whose raw input, golden output, CSV config and cleaning
+    code (`rules_version`, which hashes every module in `CLEANING_MODULES`) are all
+    unchanged since the last run where it was unchanged is skipped without being
+    read again, so a run after a rule change re-cleans everything and the runs after
+    it only new or edited files. Re-cleaned files that are byte-identical to their
+    golden output are not parsed; the rest are compared with
+    `compare_cleaned_dataframes` (no tolerance).
+
+    Args:
+        raw_source (str): _Directory or glob pattern of stored raw CSV files._
+        golden_dir (str): _Directory of the golden cleaned outputs._
+        max_workers (int): _Worker processes, defaults to the number of CPUs. 1 runs in-process._
+        report_path (str): _JSON report, defaults to `golden_dir/regression_report.json`._
+        state_path (str): _Hashes of the last verified files, defaults to `golden_dir/regression_state.json`._
+        config_name (str): _CSV profile used to parse the raw files._
+        recheck (bool): _Verify every file, ignoring the saved state._
+
+    Returns:
+        dict: _The report: counts per verdict, changed cells per column and per rule, and one entry per file._
+    """
+    if report_path is None:
+        report_path = os.path.join(golden_dir, REPORT_NAME)
+    if state_path is None:
+        state_path = os.path.join(golden_dir, STATE_NAME)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    start = time.perf_counter()
+
+    config = {"name": config_name, **get_csv_config(config_name)}
+    version = rules_version()
+    state = {} if recheck else _load_state(state_path)
+    if state.get("rules_version") != version or state.get("csv_config") != config:
+        state = {}
+    previous_files = state.get("files", {})
+
+    entries = []
+    hashes = {}
+    to_verify = []
+    for input_path in find_input_files(raw_source):
+        golden_path = cleaned_output_path(input_path, golden_dir)
+        if not os.path.isfile(golden_path):
+            entries.append({"input_path": input_path, "golden_path": golden_path, "verdict": MISSING_GOLDEN, "error": None})
+            continue
+        previous = previous_files.get(input_path, {})
+        hashes[input_path] = {
+            "raw": _hash_record(input_path, previous.get("raw")),
+            "golden": _hash_record(golden_path, previous.get("golden")),
+        }
+        if previous.get("verdict") == UNCHANGED and all(
+            hashes[input_path][side]["sha256"] == previous.get(side, {}).get("sha256") for side in ("raw", "golden")
+        ):
+            entries.append({"input_path": input_path, "golden_path": golden_path, "verdict": SKIPPED, "error": None})
+        else:
+            to_verify.append((input_path, golden_path))
+    logger.info(f"Regression check of {len(entries) + len(to_verify)} files: {len(to_verify)} to re-clean, "
+                f"{sum(1 for entry in entries if entry['verdict'] == SKIPPED)} unchanged since the last run.")
+
+    with tempfile.TemporaryDirectory(prefix="regression_") as work_dir:
+        if max_workers == 1 or len(to_verify) <= 1:
+            entries.extend(verify_file_task(input_path, golden_path, work_dir, config_name)
+                           for input_path, golden_path in to_verify)
+        else:
+            with queue_logging(json_lines=False) as log_queue, ProcessPoolExecutor(
+                max_workers=max_workers, initializer=configure_worker_logging, initargs=(log_queue,)
+            ) as executor:
+                futures = [
+                    executor.submit(verify_file_task, input_path, golden_path, work_dir, config_name)
+                    for input_path, golden_path in to_verify
+                ]
+                for future in as_completed(futures):
+                    entries.append(future.result())
+    entries.sort(key=lambda entry: entry["input_path"])
+
+    columns = {}
+    rules = {}
+    for entry in entries:
+        for col, count in entry.get("columns", {}).items():
+            columns[col] = columns.get(col, 0) + count
+        for rule, count in entry.get("rules", {}).items():
+            rules[rule] = rules.get(rule, 0) + count
+        if entry["error"]:
+            logger.error(f"Could not verify {entry['input_path']}: {entry['error']}")
+
+    verdicts = [entry["verdict"] for entry in entries]
+    report = {
+        "raw_source": raw_source,
+        "golden_dir": golden_dir,
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "rules_version": version,
+        "workers": max_workers,
+        "files": len(entries),
+        **{verdict: verdicts.count(verdict) for verdict in (SKIPPED, UNCHANGED, CHANGED, MISSING_GOLDEN, FAILED)},
+        "cells_changed": sum(columns.values()),
+        "columns": dict(sorted(columns.items(), key=lambda item: -item[1])),
+        "rules": dict(sorted(rules.items(), key=lambda item: -item[1])),
+        "seconds": round(time.perf_counter() - start, 6),
+        "entries": entries,
+    }
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+
+    files = {}
+    for entry in entries:
+        input_path = entry["input_path"]
+        if entry["verdict"] == SKIPPED:
+            files[input_path] = {**previous_files[input_path], **hashes[input_path]}
+        elif input_path in hashes:
+            files[input_path] = {"verdict": entry["verdict"], **hashes[input_path]}
+    _save_state(state_path, {"rules_version": version, "csv_config": config, "files": files})
+    logger.info(f"Regression check finished: {report[CHANGED]} changed, {report[FAILED]} failed, report at {report_path}.")
+
+    return report
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Re-clean stored raw files and compare them with golden cleaned outputs.")
+    parser.add_argument("raw_source", help="Directory of raw CSV files or a glob pattern.")
+    parser.add_argument("golden_dir", help="Directory of golden 'cleaned_<name>.csv' outputs.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count).")
+    parser.add_argument("--report", default=None, help="Path of the JSON report.")
+    parser.add_argument("--state", default=None, help="Path of the hash state used to skip unchanged files.")
+    parser.add_argument("--config", default=DEFAULT_CSV_CONFIG, help="CSV profile from config/csv_configs.json.")
+    parser.add_argument("--recheck", action="store_true", help="Verify every file, ignoring the saved state.")
+    args = parser.parse_args(argv)
+
+    report = run_regression(args.raw_source, args.golden_dir, args.workers, args.report, args.state, args.config,
+                            args.recheck)
+    print(f"{report['files']} files: {report[SKIPPED]} skipped, {report[UNCHANGED]} unchanged, "
+          f"{report[CHANGED]} changed, {report[MISSING_GOLDEN]} without golden output, {report[FAILED]} failed.")
+    if report["cells_changed"]:
+        print(f"{report['cells_changed']} cells changed")
+        for rule, count in report["rules"].items():
+            print(f"  {rule}: {count}")
+    return 1 if report[CHANGED] or report[FAILED] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,25 @@
 from src.utils.logging import get_logger
+from src.utils.patterns import PATTERNS
 import pandas as pd
 import numpy as np
-import re
 logger = get_logger(__name__)
 
+INVALID_VALUE = 'Invalid'
+# Typed layout: every analyte is a float64 value column plus a uint8 `<analyte>__status`
+# column holding one of these codes (the index into STATUS_LABELS).
+STATUS_SUFFIX = '__status'
+STATUS_VALID, STATUS_NA_ZERO, STATUS_BELOW_LOQ, STATUS_INVALID, STATUS_MISSING = range(5)
+STATUS_LABELS = ['valid', 'na_zero', 'below_loq', 'invalid', 'missing']
+# `df.attrs` flag set on every frame built in the typed layout; a `__status` column name alone is not enough.
+TYPED_ATTR = 'typed'
+# Provenance: ids of the rules that changed a cell (the index into RULE_LABELS, named after
+# the `detailed_pipeline` stages). Turning text into a float is not recorded as a change.
+RULE_SAMPLE_NAMES, RULE_EXTRA_SPACE, RULE_STRING_NA, RULE_SPECIAL_CHARACTERS, RULE_EMPTY_STRING, RULE_NO_ROOT = range(6)
+RULE_LABELS = ['sample_names', 'remove_extra_space', 'remove_string_na', 'remove_special_characters',
+               'remove_empty_strings', 'replace_no_root']
+# Bump with the 'Version' line of `reformat_data_body` whenever a cleaning rule changes.
+SANITIZATION_VERSION = '001'
+
 def check_data_contents(data: pd.DataFrame) -> bool:
     """Check if the DataFrame is empty.
 
@@ -19,11 +35,14 @@ def check_data_contents(data: pd.DataFrame) -> bool:
     logger.warning("DataFrame is empty, cannot proceed.")
     return False
 
-def reformat_sample_names(data: pd.DataFrame) -> pd.DataFrame:
+def reformat_sample_names(data: pd.DataFrame, copy: bool = False, provenance=None) -> pd.DataFrame:
     """ _Take the sample name column and remove extra spaces, specical characters, and lower case all._
 
     Args:
         data (pd.DataFrame): _DataFrame containing 'sample_name' column._
+        copy (bool): _Leave `data` untouched and return a new frame; by default
+            the 'sample_name' column of `data` itself is replaced._
+        provenance (ProvenanceLog): _Optional log that receives the rows whose name changed._
     Reformating Steps:
         `clean white space`
         `remove special characters`
@@ -33,11 +52,21 @@ def reformat_sample_names(data: pd.DataFrame) -> pd.DataFrame:
         pd.DataFrame: _cleaned 'sample_name' column, data body not touched._
 
     """
-    data['sample_name'] = data['sample_name'].str.strip()  # Remove leading/trailing whitespace
-    data['sample_name'] = data['sample_name'].str.replace(r'[^\w\s]', '', regex=True)  # Remove special characters
-    data['sample_name'] = data['sample_name'].apply(lambda x: re.sub(r'\s+', ' ', x))  # Collapse multiple spaces
-    data['sample_name'] = data['sample_name'].str.lower()
-    
+    if copy:
+        # Columns are always replaced, never written into, so a shallow copy keeps the caller's frame intact.
+        data = data.copy(deep=False)
+    before = data['sample_name']
+    data['sample_name'] = (
+        data['sample_name'].str.strip()  # Remove leading/trailing whitespace
+        .str.replace(PATTERNS['sample_name_special_characters'], '', regex=True)  # Remove special characters
+        .str.replace(PATTERNS['multiple_spaces'], ' ', regex=True)  # Collapse multiple spaces
+        .str.lower()
+    )
+    if provenance is not None:
+        after = data['sample_name']
+        unchanged = before.eq(after) | (before.isna() & after.isna())
+        provenance.record('sample_name', np.flatnonzero(~unchanged.to_numpy(dtype=bool)), RULE_SAMPLE_NAMES)
+
     return data
 
 def remove_extra_space_data_body(df: pd.DataFrame, cols: list) -> pd.DataFrame:
@@ -88,8 +117,9 @@ def remove_string_na_data_body(df: pd.DataFrame, cols: list) -> pd.DataFrame:
     _data frame will have NA values replaced with 0.0 type float._
     """
     # Replace N/A, NA, na, Na (case-insensitive, with or without spaces) with numeric 0.0
+    na_pattern = PATTERNS['na']
     for col in cols:
-        df[col] = df[col].map(lambda x: 0.0 if (pd.notnull(x) and isinstance(x, str) and re.match(r'(?i)^\s*(N/A|NA|na|Na|nA)\s*$', x)) else x)
+        df[col] = df[col].map(lambda x: 0.0 if (pd.notnull(x) and isinstance(x, str) and na_pattern.match(x)) else x)
     # Remove special characters
     return df
 
@@ -120,8 +150,9 @@ def remove_special_characters_data_body(df: pd.DataFrame, cols: list) -> pd.Data
     | patient3     | 20        |
     +--------------+-----------+
     """
+    special_characters = PATTERNS['special_characters']
     for col in cols:
-        df[col] = df[col].map(lambda x: re.sub(r'[^\da-zA-Z\s.-]', '', str(x)) if pd.notnull(x) else x)
+        df[col] = df[col].map(lambda x: special_characters.sub('', str(x)) if pd.notnull(x) else x)
     
     return df
 
@@ -136,8 +167,9 @@ def remove_empty_strings_data_body(df: pd.DataFrame, cols: list) -> pd.DataFrame
 def replace_no_root_data_body(df: pd.DataFrame, cols: list) -> pd.DataFrame:
     """_Replace all 'no root' values with 'Invalid'
     """
-    # Replace no root with 'Invalid'
-    df[cols] = df[cols].replace(r'(?i)^noroot$', 'Invalid', regex=True)
+    # Replace no root with 'Invalid', one column at a time so the block is never copied whole
+    for col in cols:
+        df[col] = df[col].replace(PATTERNS['no_root'], INVALID_VALUE, regex=True)
     
     return df
 
@@ -147,11 +179,169 @@ def convert_to_numeric_data_body(df: pd.DataFrame, cols: list) -> pd.DataFrame:
     """
     # Convert numeric columns to float, leave 'Invalid' as string
     for col in cols:
-        df[col] = df[col].map(lambda x: float(x) if (pd.notnull(x) and x != 'Invalid') else x)
+        df[col] = df[col].map(lambda x: float(x) if (pd.notnull(x) and x != INVALID_VALUE) else x)
+
+    return df
+
+def clean_data_body(df: pd.DataFrame, cols: list, copy: bool = False, provenance=None) -> pd.DataFrame:
+    """_Run every data body cleaning step in one vectorized pass over the analyte block._
+
+    The analyte columns are stacked into a single 1-D array and factorized, so
+    each rule (space trim, NA, special characters, empty, no root, float) is
+    applied once per distinct value with a pandas `.str` operation; the results
+    are broadcast back to the cells through the codes.
+    Exports repeat the same few hundred values, so the cost follows the
+    number of distinct values rather than the number of cells.
+    Produces the same values and dtypes as chaining the `*_data_body` helpers:
+    columns holding 'Invalid' stay object dtype, all others become float64.
+
+    Memory: besides the input, only the stacked cell references and their codes
+    are held for the whole block; float values are built one column at a time.
+
+    Args:
+        df (pd.DataFrame): _DataFrame to clean._
+        cols (list): _Analyte columns to clean._
+        copy (bool): _Leave `df` untouched and return a new frame; by default the
+            analyte columns of `df` itself are replaced._
+        provenance (ProvenanceLog): _Optional log that receives (row, column, rule) for every changed cell._
+
+    Returns:
+        pd.DataFrame: _The DataFrame with cleaned analyte columns._
+    """
+    if copy:
+        # Columns are always replaced, never written into, so a shallow copy keeps the caller's frame intact.
+        df = df.copy(deep=False)
+    cols = list(cols)
+    if not cols or len(df) == 0:
+        return df
+
+    arrays = [df[col].to_numpy(dtype=object, copy=False) for col in cols]
+    results = clean_data_body_arrays(arrays, rule_bits=provenance is not None)
+    for col, (column_values, column_status, *rule_bits) in zip(cols, results):
+        df[col] = pd.Series(mark_invalid(column_values, column_status == STATUS_INVALID), index=df.index)
+        if rule_bits:
+            provenance.record_rule_bits(col, rule_bits[0])
 
     return df
 
-def reformat_data_body(data: pd.DataFrame) -> pd.DataFrame:
+def mark_invalid(values: np.ndarray, invalid: np.ndarray) -> np.ndarray:
+    """_Cleaned column layout: float64 values, or object dtype with 'Invalid' where `invalid` is set._"""
+    if not invalid.any():
+        return values
+    values = values.astype(object)
+    values[invalid] = INVALID_VALUE
+    return values
+
+def clean_data_body_arrays(arrays: list, rule_bits: bool = False):
+    """_Clean equal-length raw analyte arrays; yields (float64 values, uint8 status codes) per array, in order._
+
+    The engine behind `clean_data_body`, usable without a DataFrame (e.g. in worker
+    processes writing into shared memory). Invalid and missing cells are NaN in
+    the values; the status tells them apart and marks NA variants cleaned to 0.0
+    (`STATUS_NA_ZERO`) and values reported as below a limit such as '< 0' (`STATUS_BELOW_LOQ`).
+    With `rule_bits` each item also carries a uint8 array with bit `1 << rule id` set
+    for every rule (see `RULE_LABELS`) that changed the cell; it is worked out once per
+    distinct value, like the cleaning itself.
+    """
+    if not arrays:
+        return
+    n_rows = len(arrays[0])
+
+    # One array of cell references, column after column (the strings themselves are not copied).
+    flat = np.concatenate(arrays)
+    codes, uniques = pd.factorize(flat)
+    if not all(isinstance(value, str) for value in uniques):
+        # Factorizing merges equal non-text values such as 1 and True; clean their text forms instead,
+        # so e.g. 1 and '1.0' stay distinct as in the per-cell helpers.
+        present = codes >= 0
+        codes = codes.copy()
+        codes[present], uniques = pd.factorize(
+            pd.Series(flat[present], dtype=object).astype(str).to_numpy(dtype=object)
+        )
+    del flat
+
+    raw = pd.Series(uniques, dtype=object)
+    text = raw.str.replace(' ', '', regex=False)
+    is_na = text.str.match(PATTERNS['na']).to_numpy(dtype=bool)
+    is_below = text.str.startswith('<').to_numpy(dtype=bool)
+    trimmed = text
+    text = text.str.replace(PATTERNS['special_characters'], '', regex=True)
+    if rule_bits:
+        unique_bits = np.zeros(len(raw) + 1, dtype=np.uint8)
+        unique_bits[:-1][(raw != trimmed).to_numpy(dtype=bool)] |= 1 << RULE_EXTRA_SPACE
+        unique_bits[:-1][is_na] |= 1 << RULE_STRING_NA
+        unique_bits[:-1][(trimmed != text).to_numpy(dtype=bool) & ~is_na] |= 1 << RULE_SPECIAL_CHARACTERS
+        unique_bits[:-1][(text == '').to_numpy(dtype=bool) & ~is_na] |= 1 << RULE_EMPTY_STRING
+    del raw, trimmed
+    text[is_na] = '0.0'
+    text = text.str.replace(PATTERNS['no_root'], INVALID_VALUE, regex=True)
+    text = text.to_numpy(dtype=object)
+
+    is_invalid = text == INVALID_VALUE
+    is_numeric = (text != '') & ~is_invalid
+    # One extra slot at the end for missing cells: their code -1 picks it.
+    unique_values = np.full(len(text) + 1, np.nan)
+    unique_values[:-1][is_numeric] = text[is_numeric].astype(np.float64)
+    unique_status = np.full(len(text) + 1, STATUS_MISSING, dtype=np.uint8)
+    unique_status[:-1][is_numeric] = STATUS_VALID
+    unique_status[:-1][is_numeric & is_below] = STATUS_BELOW_LOQ
+    unique_status[:-1][is_na] = STATUS_NA_ZERO
+    unique_status[:-1][is_invalid] = STATUS_INVALID
+    if rule_bits:
+        unique_bits[:-1][is_invalid] |= 1 << RULE_NO_ROOT
+
+    for position in range(len(arrays)):
+        column_codes = codes[position * n_rows:(position + 1) * n_rows]
+        if rule_bits:
+            yield unique_values[column_codes], unique_status[column_codes], unique_bits[column_codes]
+        else:
+            yield unique_values[column_codes], unique_status[column_codes]
+
+def reformat_data_body_typed(data: pd.DataFrame, cols: list = None, provenance=None) -> pd.DataFrame:
+    """_Clean the table body into the compact typed layout instead of mixed object columns._
+
+    Same rules as `reformat_data_body`, but each analyte becomes a float64 value
+    column plus a uint8 `<analyte>__status` column (see `STATUS_LABELS`), about
+    9 bytes per cell instead of a Python object. `file_io.from_typed_dataframe`
+    (used by `export_dataframe_to_csv`) turns it back into exactly today's cleaned CSV.
+
+    Args:
+        data (pd.DataFrame): _DataFrame with 'sample_name' as the first column; not modified._
+        cols (list): _Analyte columns, defaults to every column after the first; other
+            columns are kept as they are._
+        provenance (ProvenanceLog): _Optional log that receives (row, column, rule) for every changed cell._
+
+    Returns:
+        pd.DataFrame: _Other columns as is, then `<analyte>`, `<analyte>__status` pairs._
+    """
+    cols = list(data.columns[1:] if cols is None else cols)
+    arrays = [data[col].to_numpy(dtype=object, copy=False) for col in cols] if len(data) else []
+    results = clean_data_body_arrays(arrays, rule_bits=provenance is not None) if arrays else (
+        (np.empty(0), np.empty(0, dtype=np.uint8)) for _ in cols
+    )
+    return assemble_typed_dataframe(data, cols, results, provenance)
+
+def assemble_typed_dataframe(data: pd.DataFrame, cols: list, results, provenance=None) -> pd.DataFrame:
+    """_Build the typed layout from per-column (values, status[, rule bits]) results, e.g. of `clean_data_body_arrays`._
+
+    Shared by `reformat_data_body_typed` and the column workers of `sharding`.
+    Columns of `data` not in `cols` are kept as they are, ahead of the analytes.
+    Raises ValueError before `results` is consumed if a status column name is already taken.
+    """
+    clashes = [col + STATUS_SUFFIX for col in cols if col + STATUS_SUFFIX in set(data.columns)]
+    if clashes:
+        raise ValueError(f"Cannot build the typed layout, columns {clashes} would be overwritten by status columns.")
+    columns = {col: data[col] for col in data.columns if col not in set(cols)}
+    for col, (column_values, column_status, *rule_bits) in zip(cols, results):
+        columns[col] = column_values
+        columns[col + STATUS_SUFFIX] = column_status
+        if rule_bits:
+            provenance.record_rule_bits(col, rule_bits[0])
+    typed = pd.DataFrame(columns, index=data.index)
+    typed.attrs[TYPED_ATTR] = True
+    return typed
+
+def reformat_data_body(data: pd.DataFrame, copy: bool = False) -> pd.DataFrame:
     """_Clean the table body._
     
    `Version 001:`
@@ -164,17 +354,88 @@ def reformat_data_body(data: pd.DataFrame) -> pd.DataFrame:
     4. Replace all empty values with empty strings.
     5. Replace all 'no root' values with 'Invalid'.
     6. Convert all remaining values to numeric, force all errors to NaN.
+
+    All steps run together in `clean_data_body`; the individual `*_data_body`
+    helpers document each step and give the same result when chained.
+    The analyte columns of `data` are replaced unless `copy` is True.
     """
     cols = data.columns[1:]
-    data = remove_extra_space_data_body(data, cols)
-    data = remove_string_na_data_body(data, cols)
-    data = remove_special_characters_data_body(data, cols)
-    data = remove_empty_strings_data_body(data, cols)
-    data = replace_no_root_data_body(data, cols)
-    data = convert_to_numeric_data_body(data, cols)
+    data = clean_data_body(data, cols, copy=copy)
     
     return data
 
+def status_columns(df: pd.DataFrame) -> dict:
+    """_{status column: analyte column} for every uint8 or categorical `<analyte>__status` column whose analyte is in `df`._
+
+    Raw columns that merely end in '__status' (e.g. 'lot__status' without a 'lot' column) are not status columns.
+    """
+    names = set(df.columns)
+    status = {}
+    for col in df.columns:
+        if not isinstance(col, str) or not col.endswith(STATUS_SUFFIX) or col[:-len(STATUS_SUFFIX)] not in names:
+            continue
+        dtype = df[col].dtype
+        if dtype == np.uint8 or isinstance(dtype, pd.CategoricalDtype):
+            status[col] = col[:-len(STATUS_SUFFIX)]
+    return status
+
+def status_counts(typed: pd.DataFrame) -> dict:
+    """_Cells per status over every `<analyte>__status` column of a typed frame, e.g. {'na_zero': 12, ...}._"""
+    counts = np.zeros(len(STATUS_LABELS), dtype=np.int64)
+    for col in status_columns(typed):
+        codes = typed[col].to_numpy()
+        if typed[col].dtype != np.uint8:
+            # Label categories of older typed files; unknown labels are not counted.
+            codes = pd.Categorical(typed[col].astype(str), categories=STATUS_LABELS).codes.astype(np.uint8)
+        counts += np.bincount(codes, minlength=len(STATUS_LABELS))[:len(STATUS_LABELS)]
+    return dict(zip(STATUS_LABELS, counts.tolist()))
+
+STANDARD_LABEL = 'STANDARD'
+SPECIMEN_LABEL = 'SPECIMEN'
+
+def _match_control_levels(data: pd.DataFrame) -> pd.Series:
+    """_Matched control level text for every row, NaN where the row is not a control._"""
+    return data['sample_name'].astype(str).str.extract(PATTERNS['control_level'], expand=False)
+
+def classify_samples(data: pd.DataFrame) -> dict:
+    """_Label every row as a control level, a standard or a specimen in one pass._
+
+    Control levels come from the merged 'control_level' pattern (C1-C3, NC1-3,
+    PG1-3, CUTOFF G1-3, LOW/MEDIUM/HIGH CONTROL, NEGATIVE CONTROL, BLANK,
+    DILUTION, VISCON, UTAK); rows that are not controls but start like
+    'Standard 1' are STANDARD, and everything else is SPECIMEN.
+
+    Args:
+        data (pd.DataFrame): _DataFrame containing 'sample_name' column._
+
+    Returns:
+        dict: _'labels' (categorical Series aligned to `data`), 'counts'
+        ({label: rows} for every label, including zeros) and 'indices'
+        ({label: [row positions]} for labels present)._
+    """
+    logger.info("Classifying control levels, standards and specimens.")
+    names = data['sample_name'].astype(str)
+    labels = _match_control_levels(data).str.lower().map(PATTERNS.control_level_labels)
+    unlabelled = labels.isna().to_numpy()
+    is_standard = np.zeros(len(names), dtype=bool)
+    is_standard[unlabelled] = names[unlabelled].str.contains(PATTERNS['standard']).to_numpy(dtype=bool)
+    labels[is_standard] = STANDARD_LABEL
+    labels = labels.fillna(SPECIMEN_LABEL)
+
+    categories = PATTERNS.control_level_categories() + [STANDARD_LABEL, SPECIMEN_LABEL]
+    labels = pd.Series(pd.Categorical(labels, categories=categories), index=data.index, name='sample_type')
+
+    codes = labels.cat.codes.to_numpy()
+    counts = np.bincount(codes, minlength=len(categories))
+    # Stable sort groups the row positions of each label while keeping file order.
+    positions = np.split(np.argsort(codes, kind='stable'), np.cumsum(counts)[:-1])
+
+    return {
+        "labels": labels,
+        "counts": dict(zip(categories, counts.tolist())),
+        "indices": {label: rows.tolist() for label, rows in zip(categories, positions) if len(rows)},
+    }
+
 def check_levels_present(data: pd.DataFrame) -> list:
     """_Look for anything that may resemble a control within the sequence._  
 
@@ -187,31 +448,17 @@ def check_levels_present(data: pd.DataFrame) -> list:
     
     """
     logger.info("Checking if quality control levels are present in the data.")
-    # regular expression to check all of those levels, case insensitive.
-    pattern = r"(?i)(C[1-3]|Low Control|Medium Control|High Control|Med Control|VISCON|Dil con|DIL CON|Dilution control|NC[1-3]|PG[1-3]|CUTOFF G[1-3]|Negative Control|Blank control|UTAK|UTAK control)"
-    matches = [re.search(pattern, str(item)) for item in data['sample_name']]
-    return [match.group() for match in matches if match]
+    # merged control level pattern from the registry, case insensitive.
+    return _match_control_levels(data).dropna().tolist()
 
 def check_number_of_specimen(data: pd.DataFrame) -> list:
-    """_Return the list of non-control like rows._
-    
-    """
-    logger.info("Checking number of specimens in the data.")
-    mismatches=[]
-    # regular expression to check all of those levels, case insensitive.
-    pattern = r"(?i)(C[1-3]|Low Control|Medium Control|High Control|Med Control|VISCON|Dil con|DIL CON|Dilution control|NC[1-3]|PG[1-3]|CUTOFF G[1-3]|Negative Control|Blank control|UTAK|UTAK control)"
-    # find all that do not match the pattern.
-    mismatches = [item for item in data['sample_name'] if not re.search(pattern, str(item))]
+    """_Return the list of specimen rows (neither a control level nor a standard)._
     
-    return mismatches
-
-def check_number_of_specimen(data: pd.DataFrame) -> list:
-    """_Return the list of non-control like rows._
-
     """
     logger.info("Checking number of specimens in the data.")
+    labels = classify_samples(data)["labels"]
 
-    return []
+    return data['sample_name'][(labels == SPECIMEN_LABEL).to_numpy()].tolist()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+from src.utils.logging import configure_worker_logging, get_logger, queue_logging
+from src.utils.sanitization import (
+    STATUS_INVALID, assemble_typed_dataframe, clean_data_body, clean_data_body_arrays, mark_invalid,
+    reformat_data_body_typed,
+)
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from multiprocessing import shared_memory
+import os
+import numpy as np
+import pandas as pd
+logger = get_logger(__name__)
+
+
+def column_shards(n_columns: int, shards: int) -> list:
+    """_Split `n_columns` into at most `shards` contiguous (start, stop) groups of near equal size._"""
+    shards = max(1, min(shards, n_columns))
+    bounds = np.linspace(0, n_columns, shards + 1).round().astype(int)
+    return [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+@contextmanager
+def column_pool(max_workers: int):
+    """_Process pool for `clean_data_body_sharded`, shared by every frame cleaned in the block; None for 1 worker._"""
+    if max_workers is None or max_workers <= 1:
+        yield None
+        return
+    with queue_logging(json_lines=False) as log_queue, ProcessPoolExecutor(
+        max_workers=max_workers, initializer=configure_worker_logging, initargs=(log_queue,)
+    ) as executor:
+        yield executor
+
+def _share_columns(df: pd.DataFrame, cols: list) -> shared_memory.SharedMemory:
+    """_Write raw text columns as an Arrow IPC stream into a new shared memory block._"""
+    import pyarrow as pa
+
+    table = pa.Table.from_arrays(
+        [pa.array(df[col].to_numpy(dtype=object, copy=False), type=pa.string(), from_pandas=True) for col in cols],
+        names=[str(position) for position in range(len(cols))],
+    )
+    sink = pa.MockOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    block = shared_memory.SharedMemory(create=True, size=max(sink.size(), 1))
+    buffer = pa.py_buffer(block.buf)
+    with pa.ipc.new_stream(pa.FixedSizeBufferWriter(buffer), table.schema) as writer:
+        writer.write_table(table)
+    # The block cannot be closed while Arrow still holds a view of it.
+    del buffer
+    return block
+
+def _result_views(block: shared_memory.SharedMemory, n_columns: int, n_rows: int) -> tuple:
+    """_(float64 values, uint8 status codes) arrays of shape (columns, rows) laid over the output block._"""
+    values = np.ndarray((n_columns, n_rows), dtype=np.float64, buffer=block.buf)
+    status = np.ndarray((n_columns, n_rows), dtype=np.uint8, buffer=block.buf, offset=values.nbytes)
+    return values, status
+
+def clean_shard_task(input_name: str, output_name: str, n_columns: int, n_rows: int, first_column: int) -> int:
+    """_Clean one shard read from shared memory and write its values and status codes into the output block._
+
+    Runs in a worker process, so it must stay a module level function. Returns the number of cells cleaned.
+    """
+    import pyarrow as pa
+
+    input_block = shared_memory.SharedMemory(name=input_name)
+    try:
+        reader = pa.ipc.open_stream(pa.py_buffer(input_block.buf))
+        table = reader.read_all()
+        arrays = [column.to_numpy(zero_copy_only=False) for column in table.columns]
+        del reader, table
+    finally:
+        input_block.close()
+
+    output_block = shared_memory.SharedMemory(name=output_name)
+    try:
+        values, status = _result_views(output_block, n_columns, n_rows)
+        for offset, (column_values, column_status) in enumerate(clean_data_body_arrays(arrays)):
+            values[first_column + offset] = column_values
+            status[first_column + offset] = column_status
+        del values, status
+    finally:
+        output_block.close()
+    return len(arrays) * n_rows
+
+def clean_data_body_sharded(df: pd.DataFrame, cols: list, max_workers: int = None, shards: int = None,
+                            executor=None, copy: bool = False, typed: bool = False) -> pd.DataFrame:
+    """_Clean the analyte columns in groups on a process pool; same result as `clean_data_body`
+    (or `reformat_data_body_typed` with `typed`)._
+
+    Each group of columns is handed to its worker as an Arrow IPC stream in shared
+    memory, and the workers write float64 values and status codes straight into one
+    shared output block, so no column is pickled in either direction. The frame is
+    then rebuilt in the original column order. It works on any frame, including a
+    row chunk, so it combines with chunked and byte-range reading. Needs `pyarrow`;
+    without it, or for non-text cells, the columns are cleaned in-process.
+
+    Args:
+        df (pd.DataFrame): _DataFrame to clean._
+        cols (list): _Analyte columns to clean._
+        max_workers (int): _Worker processes when no `executor` is given, defaults to the number of CPUs._
+        shards (int): _Column groups, defaults to one per worker._
+        executor (ProcessPoolExecutor): _Pool to reuse across frames, e.g. from `column_pool`._
+        copy (bool): _Leave `df` untouched; by default its analyte columns are replaced._
+        typed (bool): _Build the typed layout straight from the workers' values and status codes;
+            `df` is then never modified._
+
+    Returns:
+        pd.DataFrame: _The DataFrame with cleaned analyte columns._
+    """
+    in_process = reformat_data_body_typed if typed else clean_data_body
+    if copy and not typed:
+        df = df.copy(deep=False)
+    cols = list(cols)
+    if max_workers is None:
+        max_workers = getattr(executor, "_max_workers", None) or os.cpu_count() or 1
+    if shards is None:
+        shards = max_workers
+    n_rows = len(df)
+    groups = column_shards(len(cols), shards)
+    if len(groups) <= 1 or n_rows == 0 or (executor is None and max_workers <= 1):
+        return in_process(df, cols)
+
+    input_blocks = []
+    output_block = None
+    try:
+        try:
+            for start, stop in groups:
+                input_blocks.append(_share_columns(df, cols[start:stop]))
+        except (ImportError, TypeError, ValueError) as e:
+            # pyarrow missing, or cells that are not text (ArrowTypeError / ArrowInvalid).
+            logger.info(f"Cleaning columns in-process, cannot share them: {e}")
+            return in_process(df, cols)
+
+        output_block = shared_memory.SharedMemory(create=True, size=len(cols) * n_rows * 9)
+        with column_pool(max_workers) if executor is None else nullcontext(executor) as pool:
+            futures = [
+                pool.submit(clean_shard_task, block.name, output_block.name, len(cols), n_rows, start)
+                for block, (start, _) in zip(input_blocks, groups)
+            ]
+            for future in futures:
+                future.result()
+
+        values, status = _result_views(output_block, len(cols), n_rows)
+        if typed:
+            # Copy out of the shared block before it is released.
+            results = [(values[position].copy(), status[position].copy()) for position in range(len(cols))]
+            del values, status
+            return assemble_typed_dataframe(df, cols, results)
+        for position, col in enumerate(cols):
+            # Copy out of the shared block before it is released.
+            column_invalid = status[position] == STATUS_INVALID
+            df[col] = pd.Series(mark_invalid(values[position].copy(), column_invalid), index=df.index)
+        del values, status
+    finally:
+        for block in input_blocks + ([output_block] if output_block is not None else []):
+            block.close()
+            block.unlink()
+
+    return df
@@ -0,0 +1,88 @@
+from src.utils.patterns import CONTROL_LEVELS
+import numpy as np
+import pandas as pd
+
+# Raw spellings seeded into the analyte cells, as instruments export them.
+NA_VARIANTS = ["NA", "N/A", "na", "Na", "nA", " N/A ", "N A"]
+BELOW_ZERO_VARIANTS = ["< 0", "<0", " <0 "]
+NO_ROOT_VARIANTS = ["no root", "No Root", "NOROOT"]
+SPECIAL_CHARACTERS = list("!@$%^&*()_+={}[]:;\"'<,>?/|~`#")
+
+DEFAULT_RATES = {
+    "na": 0.05,
+    "below_zero": 0.03,
+    "no_root": 0.01,
+    "blank": 0.05,
+    "special_characters": 0.02,
+    "control": 0.10,
+    "standard": 0.05,
+}
+
+
+def generate_plate(rows: int, analytes: int, seed: int = 0, distinct_values: int = 500, **rates) -> pd.DataFrame:
+    """_Build a seeded synthetic instrument export, parsed the way `import_dataframe_from_csv` reads it._
+
+    Every cell is text. Analyte cells are numbers drawn from `distinct_values`
+    one-decimal values, replaced at the given rates by NA variants, '< 0',
+    'no root', blanks, or numbers with a stray special character. Sample names
+    are control levels, 'Standard N' rows or specimen ids with messy spacing,
+    casing and punctuation.
+
+    Args:
+        rows (int): _Number of samples._
+        analytes (int): _Number of analyte columns._
+        seed (int): _Random seed; the same arguments always give the same plate._
+        distinct_values (int): _Number of distinct numeric readings._
+        **rates: _Overrides for `DEFAULT_RATES` (fraction of cells or rows)._
+
+    Returns:
+        pd.DataFrame: _'sample_name' plus 'analyte_1'..'analyte_<analytes>' as strings._
+    """
+    unknown = set(rates) - set(DEFAULT_RATES)
+    if unknown:
+        raise ValueError(f"Unknown rates {sorted(unknown)}, expected some of {list(DEFAULT_RATES)}.")
+    rates = {**DEFAULT_RATES, **rates}
+    rng = np.random.default_rng(seed)
+
+    # Sample names: controls and standards at their rates, specimens otherwise.
+    kind = rng.random(rows)
+    specimen_ids = rng.integers(0, 10 * max(rows, 1), rows)
+    controls = rng.choice(CONTROL_LEVELS, rows)
+    standards = rng.integers(1, 7, rows)
+    punctuation = rng.choice(["", "", "", "!", "#", "."], rows)
+    names = np.empty(rows, dtype=object)
+    for i in range(rows):
+        if kind[i] < rates["control"]:
+            names[i] = str(controls[i]) if i % 2 else f" {str(controls[i]).upper()} "
+        elif kind[i] < rates["control"] + rates["standard"]:
+            names[i] = f"Standard {standards[i]}"
+        else:
+            names[i] = f"Patient  {specimen_ids[i]}{punctuation[i]}"
+
+    # Analyte block: a pool of readings, then each special value at its own rate.
+    pool = np.round(rng.uniform(0, 1000, distinct_values), 1).astype(str).astype(object)
+    cells = pool[rng.integers(0, distinct_values, (rows, analytes))]
+    draw = rng.random((rows, analytes))
+    bounds = np.cumsum([rates["na"], rates["below_zero"], rates["no_root"], rates["blank"], rates["special_characters"]])
+    if bounds[-1] > 1:
+        raise ValueError("Analyte cell rates must add up to at most 1.")
+    na = draw < bounds[0]
+    below_zero = (draw >= bounds[0]) & (draw < bounds[1])
+    no_root = (draw >= bounds[1]) & (draw < bounds[2])
+    blank = (draw >= bounds[2]) & (draw < bounds[3])
+    special = (draw >= bounds[3]) & (draw < bounds[4])
+    cells[na] = rng.choice(NA_VARIANTS, na.sum())
+    cells[below_zero] = rng.choice(BELOW_ZERO_VARIANTS, below_zero.sum())
+    cells[no_root] = rng.choice(NO_ROOT_VARIANTS, no_root.sum())
+    cells[blank] = ""
+    cells[special] = cells[special] + rng.choice(SPECIAL_CHARACTERS, special.sum())
+
+    data = {"sample_name": names}
+    for column in range(analytes):
+        data[f"analyte_{column + 1}"] = cells[:, column]
+    return pd.DataFrame(data)
+
+def write_plate_csv(file_path: str, rows: int, analytes: int, seed: int = 0, **rates) -> str:
+    """_Write `generate_plate(...)` as a raw CSV export and return its path._"""
+    generate_plate(rows, analytes, seed, **rates).to_csv(file_path, index=False)
+    return file_path
@@ -0,0 +1,299 @@
+"""Long-running service that cleans instrument exports as they land:
+`python -m src.utils.watcher drop_a drop_b --output-dir cleaned --workers 4`.
+
+Drop directories are polled (no extra dependency), each CSV is cleaned once its
+size and modification time have stopped changing for `settle_seconds`, and the
+cleaned file appears in the output directory with an atomic rename.
+"""
+from src.utils.logging import configure_worker_logging, get_logger, queue_logging
+from src.utils.batch import CLEANED_PREFIX, clean_file_task
+from src.utils.csv_configs import DEFAULT_CSV_CONFIG
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import signal
+import sys
+import time
+logger = get_logger(__name__)
+
+DEFAULT_POLL_INTERVAL = 0.5
+DEFAULT_SETTLE_SECONDS = 1.0
+DEFAULT_MAX_QUEUE = 100
+STATE_NAME = "watch_state.json"
+METRICS_NAME = "watch_metrics.json"
+# Latencies kept for the metrics percentiles.
+LATENCY_WINDOW = 1000
+TMP_PREFIX = ".tmp_"
+
+
+def _load_state(state_path: str) -> dict:
+    try:
+        with open(state_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"files": {}}
+
+def _save_json(file_path: str, data: dict):
+    # Readers (and a restarted service) only ever see a complete file.
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, file_path)
+
+
+class WatchService:
+    """_Watch drop directories and clean every completed CSV on a bounded process pool._
+
+    - Debounce: a file is picked up once its (size, mtime) is unchanged for
+      `settle_seconds`; empty files, dot files, non-CSV files and `cleaned_`
+      outputs are ignored. Drop directories inside the output directory are rejected.
+    - Backpressure: ready files go through an `asyncio.Queue` of `max_queue`
+      entries; when it is full, scanning waits until the workers catch up.
+    - Atomic outputs: each file is cleaned into a `.tmp_` file in the output
+      directory and renamed to `cleaned_<name>.csv` once complete.
+    - Restarts: every finished file is kept in the state file with its
+      (size, mtime), so it is only cleaned again if it changes. Failed files are
+      recorded too and retried only after they change. The state is written at
+      most once per poll, and inputs that have left the drop directories are dropped from it.
+    - Metrics: queue depth, files in flight and settling, counts and per-file
+      latency (last write of the input to cleaned output) are written to the
+      metrics file on every poll and logged per file as `watch_metrics`.
+    """
+
+    def __init__(self, watch_dirs: list, output_dir: str, max_workers: int = None,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, settle_seconds: float = DEFAULT_SETTLE_SECONDS,
+                 max_queue: int = DEFAULT_MAX_QUEUE, state_path: str = None, metrics_path: str = None,
+                 cache_dir: str = None, config_name: str = DEFAULT_CSV_CONFIG):
+        self.watch_dirs = [os.path.abspath(directory) for directory in watch_dirs]
+        self.output_dir = os.path.abspath(output_dir)
+        for directory in self.watch_dirs:
+            # Outputs, state and metrics land there, so they would be picked up and cleaned again without end.
+            if os.path.commonpath([directory, self.output_dir]) == self.output_dir:
+                raise ValueError(f"Drop directory {directory} must not be the output directory or inside it.")
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+        self.max_queue = max_queue
+        self.state_path = state_path or os.path.join(output_dir, STATE_NAME)
+        self.metrics_path = metrics_path or os.path.join(output_dir, METRICS_NAME)
+        self.cache_dir = cache_dir
+        self.config_name = config_name
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        self.state = _load_state(self.state_path)
+        self._state_dirty = False
+        # With several drop directories, outputs go to a subdirectory named after the directory and a
+        # hash of its full path, so two drop directories with the same name never share one.
+        self._output_dirs = {
+            directory: os.path.join(self.output_dir, os.path.basename(directory) + "_"
+                                    + hashlib.sha1(directory.encode("utf-8")).hexdigest()[:8])
+            if len(self.watch_dirs) > 1 else self.output_dir
+            for directory in self.watch_dirs
+        }
+        self.counters = {"processed": 0, "failed": 0}
+        self._settling = {}
+        self._pending = set()
+        self._in_flight = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._queue = None
+        self._stop = None
+
+    def output_path(self, input_path: str) -> str:
+        """_Cleaned file for an input; with several drop directories each gets its own subdirectory._"""
+        output_dir = self._output_dirs[os.path.dirname(os.path.abspath(input_path))]
+        return os.path.join(output_dir, CLEANED_PREFIX + os.path.basename(input_path))
+
+    def scan(self) -> list:
+        """_(path, fingerprint, mtime) of the files that have settled since the last scan and are not done yet._"""
+        now = time.monotonic()
+        ready = []
+        settling = {}
+        present = set()
+        scanned = set()
+        for directory in self.watch_dirs:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError as e:
+                # A drop directory that is briefly missing or unreadable keeps its files in the state.
+                logger.warning(f"Cannot scan {directory}: {e}")
+                continue
+            scanned.add(directory)
+            for entry in entries:
+                try:
+                    if (entry.name.startswith((".", CLEANED_PREFIX)) or not entry.name.lower().endswith(".csv")
+                            or not entry.is_file()):
+                        continue
+                    path = entry.path
+                    present.add(path)
+                    if path in self._pending:
+                        continue
+                    stat = entry.stat()
+                except OSError as e:
+                    # Removed between the listing and the stat, or not readable.
+                    logger.warning(f"Cannot check {entry.path}: {e}")
+                    continue
+                fingerprint = [stat.st_size, stat.st_mtime_ns]
+                done = self.state["files"].get(path)
+                if stat.st_size == 0 or (done is not None and done["fingerprint"] == fingerprint):
+                    continue
+                seen = self._settling.get(path)
+                if seen is None or seen[0] != fingerprint:
+                    settling[path] = (fingerprint, now)
+                elif now - seen[1] >= self.settle_seconds:
+                    ready.append((path, fingerprint, stat.st_mtime))
+                else:
+                    settling[path] = seen
+        self._settling = settling
+        gone = [path for path in self.state["files"] if os.path.dirname(path) in scanned and path not in present]
+        for path in gone:
+            del self.state["files"][path]
+        if gone:
+            self._state_dirty = True
+        return ready
+
+    def save_state(self):
+        """_Write the state file if a file finished or was pruned since the last write._"""
+        if self._state_dirty:
+            _save_json(self.state_path, self.state)
+            self._state_dirty = False
+
+    def metrics(self) -> dict:
+        latencies = sorted(self._latencies)
+        return {
+            "updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "in_flight": self._in_flight,
+            "settling": len(self._settling),
+            **self.counters,
+            "latency_seconds": {
+                "last": self._latencies[-1] if latencies else None,
+                "mean": round(sum(latencies) / len(latencies), 6) if latencies else None,
+                "p95": latencies[int(0.95 * (len(latencies) - 1))] if latencies else None,
+            },
+        }
+
+    def stop(self):
+        """_Stop after the files already queued are cleaned; safe to call from a signal handler._"""
+        if self._stop is not None:
+            self._stop.set()
+
+    async def _process(self, executor, path: str, fingerprint: list, mtime: float):
+        loop = asyncio.get_running_loop()
+        output_path = self.output_path(path)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        tmp_path = os.path.join(os.path.dirname(output_path), TMP_PREFIX + os.path.basename(output_path))
+
+        self._in_flight += 1
+        try:
+            entry = await loop.run_in_executor(executor, clean_file_task, path, tmp_path, self.cache_dir, self.config_name)
+        finally:
+            self._in_flight -= 1
+        if entry["error"]:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self.counters["failed"] += 1
+            logger.error(f"Could not clean {path}: {entry['error']}")
+        else:
+            os.replace(tmp_path, output_path)
+            self.counters["processed"] += 1
+        latency = round(time.time() - mtime, 6)
+        self._latencies.append(latency)
+
+        self.state["files"][path] = {
+            "fingerprint": fingerprint,
+            "output_path": None if entry["error"] else output_path,
+            "rows": entry["rows"],
+            "error": entry["error"],
+            "completed": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        self._state_dirty = True
+        file_metrics = {"input_path": path, "latency_seconds": latency, "clean_seconds": entry["seconds"],
+                        "queue_depth": self._queue.qsize()}
+        logger.info(f"Cleaned {path} -> {output_path} in {latency}s.", extra={"watch_metrics": file_metrics})
+
+    async def _worker(self, executor):
+        while True:
+            path, fingerprint, mtime = await self._queue.get()
+            try:
+                await self._process(executor, path, fingerprint, mtime)
+            except Exception as e:
+                # Keep the worker alive; the file is tried again on the next scan.
+                logger.error(f"Watcher failed on {path}: {type(e).__name__}: {e}")
+            finally:
+                self._pending.discard(path)
+                self._queue.task_done()
+
+    async def run(self, until_idle: bool = False):
+        """_Watch until `stop()` is called, or with `until_idle` until nothing is left to clean._"""
+        self._stop = asyncio.Event()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        logger.info(f"Watching {self.watch_dirs} with {self.max_workers} workers, cleaned files in {self.output_dir}.")
+        with queue_logging(json_lines=False) as log_queue, ProcessPoolExecutor(
+            max_workers=self.max_workers, initializer=configure_worker_logging, initargs=(log_queue,)
+        ) as executor:
+            workers = [asyncio.create_task(self._worker(executor)) for _ in range(self.max_workers)]
+            try:
+                while not self._stop.is_set():
+                    for path, fingerprint, mtime in self.scan():
+                        if self._queue.full():
+                            logger.warning(f"Cleaning queue is full ({self.max_queue} files), waiting for workers.")
+                        self._pending.add(path)
+                        # Blocks while the queue is full, so scanning never runs ahead of the workers.
+                        await self._queue.put((path, fingerprint, mtime))
+                    self.save_state()
+                    _save_json(self.metrics_path, self.metrics())
+                    if until_idle and not self._pending and not self._settling:
+                        break
+                    try:
+                        await asyncio.wait_for(self._stop.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                await self._queue.join()
+            finally:
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                self.save_state()
+                _save_json(self.metrics_path, self.metrics())
+        logger.info(f"Watcher stopped: {self.counters['processed']} cleaned, {self.counters['failed']} failed.")
+
+
+async def _serve(service: WatchService, until_idle: bool):
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, service.stop)
+        except (NotImplementedError, RuntimeError):
+            # Windows event loops have no signal handlers; Ctrl+C still ends the run.
+            pass
+    await service.run(until_idle=until_idle)
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Clean instrument CSV exports as they land in drop directories.")
+    parser.add_argument("watch_dirs", nargs="+", help="Drop directories to watch.")
+    parser.add_argument("--output-dir", required=True, help="Directory for the cleaned files, state and metrics.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL, help="Seconds between scans.")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help="Seconds a file must stay unchanged before it is cleaned.")
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE, help="Files queued before scanning waits.")
+    parser.add_argument("--state", default=None, help="Path of the state file of completed files.")
+    parser.add_argument("--metrics", default=None, help="Path of the JSON metrics file.")
+    parser.add_argument("--cache-dir", default=None, help="Reuse cleaned outputs of unchanged inputs from this cache.")
+    parser.add_argument("--config", default=DEFAULT_CSV_CONFIG, help="CSV profile from config/csv_configs.json.")
+    parser.add_argument("--once", action="store_true", help="Clean what is in the drop directories, then exit.")
+    args = parser.parse_args(argv)
+
+    service = WatchService(args.watch_dirs, args.output_dir, args.workers, args.poll_interval, args.settle,
+                           args.max_queue, args.state, args.metrics, args.cache_dir, args.config)
+    asyncio.run(_serve(service, args.once))
+    return 1 if service.counters["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import json
+import pytest
+import pandas as pd
+from src.utils.batch import *
+
+
+def _write_inputs(directory):
+    directory.mkdir()
+    (directory / "run_a.csv").write_text("sample_name,analyte_1\nC1,N/A\nPatient 1,< 0\n")
+    (directory / "run_b.csv").write_text("sample_name,analyte_1\nPatient 2,no root\n")
+    (directory / "run_bad.csv").write_text("not_a_sample,analyte_1\nx,1\n")
+    (directory / "notes.txt").write_text("ignored")
+
+def test_find_input_files_directory_and_glob(tmp_path):
+    source = tmp_path / "raw"
+    _write_inputs(source)
+
+    assert [os.path.basename(p) for p in find_input_files(str(source))] == ["run_a.csv", "run_b.csv", "run_bad.csv"]
+    assert [os.path.basename(p) for p in find_input_files(str(source / "run_?.csv"))] == ["run_a.csv", "run_b.csv"]
+
+def test_clean_csv_batch_into_its_source_directory_does_not_reclean_outputs(tmp_path):
+    source = tmp_path / "raw"
+    _write_inputs(source)
+
+    first = clean_csv_batch(str(source), str(source), max_workers=1)
+    second = clean_csv_batch(str(source), str(source), max_workers=1)
+
+    assert first["files"] == second["files"] == 3
+    assert not list(source.glob("cleaned_cleaned_*"))
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_clean_csv_batch_skips_failures(tmp_path, workers):
+    source = tmp_path / "raw"
+    _write_inputs(source)
+    output_dir = tmp_path / "cleaned"
+
+    manifest = clean_csv_batch(str(source), str(output_dir), max_workers=workers)
+
+    assert manifest["files"] == 3
+    assert manifest["failed"] == 1
+    assert manifest["rows"] == 3
+    entries = {os.path.basename(e["input_path"]): e for e in manifest["entries"]}
+    assert entries["run_bad.csv"]["error"].startswith("KeyError")
+    assert entries["run_a.csv"]["rows"] == 2 and entries["run_a.csv"]["error"] is None
+    assert pd.read_csv(output_dir / "cleaned_run_b.csv")["analyte_1"].tolist() == ["Invalid"]
+    with open(output_dir / MANIFEST_NAME, encoding="utf-8") as f:
+        assert json.load(f)["failed"] == 1
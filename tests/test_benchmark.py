@@ -0,0 +1,66 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import json
+import pytest
+import pandas as pd
+from src.utils.benchmark import *
+from src.utils.synthetic import generate_plate, write_plate_csv
+from src.utils.file_io import import_dataframe_from_csv
+from src.utils.sanitization import classify_samples, reformat_data_body, reformat_sample_names
+
+
+def test_generate_plate_is_seeded_and_realistic():
+    plate = generate_plate(2000, 6, seed=3)
+
+    pd.testing.assert_frame_equal(plate, generate_plate(2000, 6, seed=3))
+    assert not plate.equals(generate_plate(2000, 6, seed=4))
+    assert list(plate.columns) == ["sample_name"] + [f"analyte_{i}" for i in range(1, 7)]
+
+    cells = pd.Series(plate.iloc[:, 1:].to_numpy().ravel())
+    assert 0.03 < (cells == "").mean() < 0.07
+    assert 0.005 < cells.str.lower().str.replace(" ", "").eq("noroot").mean() < 0.02
+    cleaned = reformat_data_body(reformat_sample_names(plate.copy()))
+    counts = classify_samples(cleaned)["counts"]
+    assert 0.07 < (sum(counts.values()) - counts["SPECIMEN"] - counts["STANDARD"]) / 2000 < 0.13
+    assert 0.03 < counts["STANDARD"] / 2000 < 0.07
+
+def test_write_plate_csv_reads_back_as_generated(tmp_path):
+    path = write_plate_csv(str(tmp_path / "plate.csv"), 50, 3, seed=1, blank=0.2)
+
+    pd.testing.assert_frame_equal(import_dataframe_from_csv(path), generate_plate(50, 3, seed=1, blank=0.2))
+    with pytest.raises(ValueError):
+        generate_plate(5, 2, nan_rate=0.1)
+
+def test_compare_to_baseline_flags_slowdowns_only():
+    baseline = {"results": [
+        {"name": "reformat_data_body", "rows": 10, "analytes": 2, "seconds": 1.0},
+        {"name": "compare_values", "rows": 10, "analytes": 2, "seconds": 1.0},
+    ]}
+    report = {"results": [
+        {"name": "reformat_data_body", "rows": 10, "analytes": 2, "seconds": 1.5},
+        {"name": "compare_values", "rows": 10, "analytes": 2, "seconds": 1.1},
+        {"name": "compare_values", "rows": 99, "analytes": 2, "seconds": 9.0},
+    ]}
+
+    regressions = compare_to_baseline(report, baseline, threshold=0.25)
+
+    assert [(r["name"], r["rows"]) for r in regressions] == [("reformat_data_body", 10)]
+    assert regressions[0]["slowdown"] == 0.5
+
+def test_main_writes_results_and_fails_on_regression(tmp_path, capsys):
+    output = tmp_path / "results.json"
+    assert main(["--sizes", "40x3", "--repeat", "1", "--output", str(output)]) == 0
+
+    results = json.loads(output.read_text())
+    names = [result["name"] for result in results["results"]]
+    assert names[0] == "reformat_sample_names" and names[-1] == "compare_cleaned_dataframes"
+    assert len(names) == 10
+    assert all(result["peak_memory_bytes"] > 0 for result in results["results"])
+
+    for result in results["results"]:
+        result["seconds"] = 1e-9
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(results))
+    assert main(["--sizes", "40x3", "--repeat", "1", "--output", str(output), "--baseline", str(baseline)]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
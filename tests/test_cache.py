@@ -0,0 +1,90 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import time
+from src.utils.cache import *
+from src.utils.pipeline import clean_csv_file
+
+
+def test_clean_csv_file_cache_hit_and_invalidation(tmp_path):
+    cache = CleanedFileCache(str(tmp_path / "cache"))
+    input_path = tmp_path / "run.csv"
+    input_path.write_text("sample_name,analyte_1\nC1,N/A\nPatient 1,no root\n")
+
+    first = clean_csv_file(str(input_path), str(tmp_path / "first.csv"), cache=cache)
+    second = clean_csv_file(str(input_path), str(tmp_path / "second.csv"), cache=cache)
+
+    assert first["cached"] == False and second["cached"] == True
+    assert (tmp_path / "second.csv").read_bytes() == (tmp_path / "first.csv").read_bytes()
+    assert second["rows"] == 2 and second["levels_present"] == first["levels_present"]
+
+    input_path.write_text("sample_name,analyte_1\nC1,5\n")
+    third = clean_csv_file(str(input_path), str(tmp_path / "third.csv"), cache=cache)
+
+    assert third["cached"] == False and third["rows"] == 1
+
+def test_cache_key_depends_on_csv_config(tmp_path):
+    cache = CleanedFileCache(str(tmp_path / "cache"))
+    input_path = tmp_path / "run.csv"
+    input_path.write_text("sample_name,analyte_1\nC1,1\n")
+
+    assert cache.key(str(input_path)) == cache.key(str(input_path))
+    assert cache.key(str(input_path)) != cache.key(str(input_path), {"delimiter": ";"})
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cleaned_path = tmp_path / "cleaned.csv"
+    cleaned_path.write_bytes(b"x" * 100)
+    cache = CleanedFileCache(str(tmp_path / "cache"), max_bytes=250)
+
+    cache.put("a", str(cleaned_path), {"rows": 1})
+    cache.put("b", str(cleaned_path), {"rows": 1})
+    past = time.time() - 60
+    os.utime(os.path.join(cache.cache_dir, "a.csv"), (past, past))
+    os.utime(os.path.join(cache.cache_dir, "b.csv"), (past + 1, past + 1))
+    assert cache.get("a", str(tmp_path / "out.csv")) == {"rows": 1}  # refreshes "a"
+    cache.put("c", str(cleaned_path), {"rows": 1})
+
+    assert cache.get("b", str(tmp_path / "out.csv")) is None
+    assert cache.get("a", str(tmp_path / "out.csv")) == {"rows": 1}
+    assert cache.get("c", str(tmp_path / "out.csv")) == {"rows": 1}
+
+def test_block_hashes_catch_any_edit_and_extend_with_new_bytes(tmp_path):
+    file_path = tmp_path / "run.csv"
+    data = bytearray(b"a" * 95)
+    file_path.write_bytes(bytes(data))
+    hashes = file_block_hashes(str(file_path), 95, block_size=10)
+    assert len(hashes) == 10 and verify_block_hashes(str(file_path), hashes, 95, block_size=10)
+
+    data[50] = ord("x")  # same size, middle of the file
+    file_path.write_bytes(bytes(data))
+    assert not verify_block_hashes(str(file_path), hashes, 95, block_size=10)
+
+    file_path.write_bytes(b"a" * 120)
+    extended = file_block_hashes(str(file_path), 120, block_size=10, previous=hashes, start_block=95 // 10)
+    assert extended == file_block_hashes(str(file_path), 120, block_size=10)
+    assert not verify_block_hashes(str(file_path), hashes, 100, block_size=10)
+
+def test_cache_eviction_counts_summaries_and_hash_memos(tmp_path):
+    cleaned_path = tmp_path / "cleaned.csv"
+    cleaned_path.write_bytes(b"x" * 100)
+    cache = CleanedFileCache(str(tmp_path / "cache"), max_bytes=10 ** 6)
+    for i in range(3):
+        input_path = tmp_path / f"run_{i}.csv"
+        input_path.write_text("sample_name,analyte_1\nC1,1\n")
+        cache.key(str(input_path))  # writes a content hash memo
+    cache.put("a", str(cleaned_path), {"rows": 1})
+    past = time.time() - 60
+    for name in os.listdir(cache._stats_dir):
+        os.utime(os.path.join(cache._stats_dir, name), (past, past))
+
+    # The .csv alone fits, but not with its summary and the memos next to it.
+    cache.max_bytes = 110
+    cache.evict()
+
+    assert os.listdir(cache._stats_dir) == []
+    assert cache.get("a", str(tmp_path / "out.csv")) is None
+
+def test_rules_version_covers_the_cleaning_code(monkeypatch):
+    before = rules_version()
+    monkeypatch.setattr("src.utils.cache.cleaning_source_hash", lambda: "edited")
+    assert rules_version() != before
@@ -0,0 +1,71 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import json
+import subprocess
+import pytest
+from src.utils.pipeline import clean_csv_file
+from src.utils.compare_cli import *
+
+SAMPLE_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_patients.csv")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _loaded_modules(statement: str) -> str:
+    code = f"import sys; {statement}; print([m for m in ('tkinter', 'openpyxl', 'pandas') if m in sys.modules])"
+    return subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+
+def test_startup_does_not_import_gui_or_report_modules():
+    assert _loaded_modules("import src.utils.compare_cli") == "[]"
+    # main still needs pandas for cleaning, but no longer tkinter or openpyxl.
+    assert _loaded_modules("import main") == "['pandas']"
+
+def test_pair_inputs_pairs_directories_by_name(tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    for name in ("plate_1.csv", "plate_2.parquet", "notes.txt", "old.csv"):
+        (tmp_path / "a" / name).write_text("x")
+    for name in ("plate_1.csv", "plate_2.parquet", "new.csv"):
+        (tmp_path / "b" / name).write_text("x")
+
+    paired = pair_inputs(str(tmp_path / "a"), str(tmp_path / "b"))
+
+    assert [os.path.basename(file_1) for file_1, _ in paired["pairs"]] == ["plate_1.csv", "plate_2.parquet"]
+    assert paired["only_in_1"] == ["old.csv"] and paired["only_in_2"] == ["new.csv"]
+    with pytest.raises(ValueError):
+        pair_inputs(str(tmp_path / "a"), str(tmp_path / "b" / "plate_1.csv"))
+
+def test_main_compares_directories_and_exits_on_differences(tmp_path, capsys):
+    for side in ("a", "b"):
+        (tmp_path / side).mkdir()
+        clean_csv_file(SAMPLE_CSV, str(tmp_path / side / "plate.csv"))
+    lines = (tmp_path / "a" / "plate.csv").read_text().splitlines()
+    (tmp_path / "a" / "changed.csv").write_text("\n".join(lines) + "\n")
+    (tmp_path / "b" / "changed.csv").write_text("\n".join(lines[:-1] + [lines[-1].rsplit(",", 1)[0] + ",999"]) + "\n")
+    output = tmp_path / "summary.json"
+
+    assert main([str(tmp_path / "a" / "plate.csv"), str(tmp_path / "b" / "plate.csv")]) == 0
+    assert main([str(tmp_path / "a"), str(tmp_path / "b"), "--workers", "2", "--output", str(output)]) == 1
+
+    summary = json.loads(output.read_text())
+    assert (summary["pairs"], summary["matched"], summary["failed"]) == (2, 1, 0)
+    changed = summary["entries"][0]
+    assert changed["file_1"].endswith("changed.csv") and changed["match"] is False
+    assert sum(changed["mismatches"].values()) == 1
+    assert "DIFF" in capsys.readouterr().out
+    assert not (tmp_path / "comparison_reports").exists()
+
+def test_compare_pair_task_records_errors(tmp_path):
+    entry = compare_pair_task(str(tmp_path / "missing_1.csv"), str(tmp_path / "missing_2.csv"))
+
+    assert entry["match"] is None
+    assert entry["error"].startswith("FileNotFoundError")
+
+def test_compare_pair_task_matches_identical_files_without_parsing(tmp_path, monkeypatch):
+    (tmp_path / "a.csv").write_text("sample_name,analyte_1\na,1\n")
+    (tmp_path / "b.csv").write_text("sample_name,analyte_1\na,1\n")
+    monkeypatch.setattr("src.utils.dataframe_match_comparison.read_cleaned_file", None)
+
+    entry = compare_pair_task(str(tmp_path / "a.csv"), str(tmp_path / "b.csv"))
+
+    assert entry["identical"] and entry["match"] and entry["error"] is None
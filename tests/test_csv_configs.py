@@ -0,0 +1,64 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import json
+import pytest
+import pandas as pd
+from src.utils.csv_configs import *
+from src.utils.file_io import import_dataframe_from_csv
+
+
+def test_load_csv_configs_merges_json_over_defaults():
+    configs = load_csv_configs()
+
+    assert configs["config1"]["delimiter"] == ","
+    assert configs["config2"]["delimiter"] == ";"
+    assert configs["config2"]["skip_rows"] == 1
+    assert configs["config1"]["dtype"] == "str"
+
+def test_get_read_csv_options_engine_selection(tmp_path):
+    config_path = tmp_path / "csv_configs.json"
+    config_path.write_text(json.dumps({"plain": {}, "preamble": {"skip_rows": 2}, "forced": {"engine": "python"}}))
+
+    plain = get_read_csv_options("plain", str(config_path))
+    assert plain["engine"] == ("pyarrow" if pyarrow_available() else "c")
+    assert plain["dtype"] is str and plain["keep_default_na"] == False
+    assert get_read_csv_options("preamble", str(config_path))["engine"] == "c"
+    assert get_read_csv_options("forced", str(config_path))["engine"] == "python"
+
+    plain["engine"] = "changed"
+    assert get_read_csv_options("plain", str(config_path))["engine"] != "changed"
+
+def test_edited_config_updates_profile_and_read_options_together(tmp_path):
+    config_path = tmp_path / "csv_configs.json"
+    config_path.write_text(json.dumps({"lab": {"delimiter": ","}}))
+    assert get_read_csv_options("lab", str(config_path))["sep"] == ","
+
+    config_path.write_text(json.dumps({"lab": {"delimiter": ";"}}))
+    os.utime(config_path, ns=(0, os.stat(config_path).st_mtime_ns + 10 ** 9))
+
+    assert get_csv_config("lab", str(config_path))["delimiter"] == ";"
+    assert get_read_csv_options("lab", str(config_path))["sep"] == ";"
+
+def test_get_read_csv_options_unknown_profile():
+    with pytest.raises(KeyError):
+        get_read_csv_options("no_such_profile")
+
+def test_read_csv_options_with_profile(tmp_path):
+    input_path = tmp_path / "export.csv"
+    input_path.write_text("instrument export\nsample_name;analyte_1\n007;N/A\nC1;\n")
+    config_path = tmp_path / "csv_configs.json"
+    config_path.write_text(json.dumps({"semicolon": {"delimiter": ";", "skip_rows": 1}}))
+
+    df = pd.read_csv(str(input_path), **get_read_csv_options("semicolon", str(config_path)))
+
+    assert df["sample_name"].tolist() == ["007", "C1"]
+    assert df["analyte_1"].tolist() == ["N/A", ""]
+
+def test_import_dataframe_from_csv_reads_text():
+    sample_csv = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_patients.csv")
+
+    df = import_dataframe_from_csv(sample_csv)
+
+    assert (df.dtypes == object).all()
+    assert df.loc[0, "analyte_1"] == "10"
@@ -0,0 +1,171 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import pytest
+import pandas as pd
+import numpy as np
+from src.utils.dataframe_match_comparison import *
+
+
+def test_compare_values_nan_and_tolerance():
+    s1 = pd.Series([1.0, np.nan, 100.0, 10.0, np.nan])
+    s2 = pd.Series([1.1, np.nan, 119.0, 20.0, 5.0])
+
+    assert compare_values(s1, s2) == {"num_mismatches": 4, "mismatched_indices": [0, 2, 3, 4]}
+    assert compare_values(s1, s2, tolerance=0.20) == {"num_mismatches": 2, "mismatched_indices": [3, 4]}
+
+def test_compare_values_object_exact_match():
+    s1 = pd.Series([10.0, "Invalid", np.nan, "Invalid"], dtype=object)
+    s2 = pd.Series([10.0, "Invalid", np.nan, 10.0], dtype=object)
+
+    assert compare_values(s1, s2, tolerance=0.20) == {"num_mismatches": 1, "mismatched_indices": [3]}
+
+def test_compare_values_uses_position_and_shorter_length():
+    s1 = pd.Series([1, 2, 3], index=[10, 11, 12])
+    s2 = pd.Series([1, 5])
+
+    assert compare_values(s1, s2) == {"num_mismatches": 1, "mismatched_indices": [1]}
+
+def test_compare_dataframe_values_all_columns_at_once():
+    df1 = pd.DataFrame({"sample_name": ["a", "b"], "analyte_1": [1.0, 2.0], "analyte_2": pd.Series([1.0, "Invalid"], dtype=object)})
+    df2 = pd.DataFrame({"sample_name": ["a", "c"], "analyte_1": [1.05, 2.0], "analyte_2": pd.Series(["Invalid", "Invalid"], dtype=object)})
+
+    result = compare_dataframe_values(df1, df2, tolerance=0.20)
+
+    assert result["sample_name"]["mismatched_indices"] == [1]
+    assert result["analyte_1"]["num_mismatches"] == 0
+    assert result["analyte_2"]["mismatched_indices"] == [0]
+
+def test_compare_typed_values_matches_cleaned_comparison():
+    from src.utils.file_io import to_typed_dataframe
+    from src.utils.sanitization import reformat_data_body, reformat_data_body_typed
+
+    raw1 = pd.DataFrame({
+        'sample_name': ['a', 'b', 'c', 'd', 'e'],
+        'analyte_1': ['N/A', '1.5', 'no root', '', '7'],
+        'analyte_2': ['0', '2', '3', '4', 'no root'],
+    })
+    raw2 = raw1.copy()
+    raw2.loc[1, 'analyte_1'] = '1.6'
+    raw2.loc[2, 'analyte_1'] = '9'
+    raw2.loc[0, 'analyte_2'] = 'NA'
+    raw2.loc[3, 'sample_name'] = 'z'
+    cleaned1 = reformat_data_body(raw1.copy())
+    cleaned2 = reformat_data_body(raw2.copy())
+
+    expected = compare_dataframe_values(cleaned1, cleaned2)
+    typed = compare_dataframe_values(reformat_data_body_typed(raw1), reformat_data_body_typed(raw2))
+
+    assert typed == expected
+    assert typed['analyte_1']['mismatched_indices'] == [1, 2]
+    assert compare_dataframe_values(to_typed_dataframe(cleaned1), to_typed_dataframe(cleaned2)) == expected
+    strict = compare_typed_values(reformat_data_body_typed(raw1), reformat_data_body_typed(raw2), strict_status=True)
+    assert strict['analyte_2']['mismatched_indices'] == [0]  # measured 0 vs NA cleaned to 0.0
+    assert compare_typed_values(reformat_data_body_typed(raw1), reformat_data_body_typed(raw2),
+                                tolerance=0.1)['analyte_1']['mismatched_indices'] == [2]
+
+def test_compare_aligned_dataframes_reordered_and_duplicate_keys():
+    df1 = pd.DataFrame({
+        "sample_name": ["blank control", "blank control", "patient 1", "patient 2", "patient 3"],
+        "analyte_1": [0.0, np.nan, 10.0, 20.0, 30.0],
+    })
+    df2 = pd.DataFrame({
+        "sample_name": ["patient 2", "blank control", "patient 1", "blank control", "patient 4"],
+        "analyte_1": [20.0, 0.0, 12.0, 5.0, 40.0],
+    })
+
+    result = compare_aligned_dataframes(df1, df2, key="sample_name")
+
+    assert result["matched_rows"] == 4
+    assert result["removed_rows"] == [("patient 3", 0)]
+    assert result["added_rows"] == [("patient 4", 0)]
+    assert sorted(result["changed_rows"]) == [("blank control", 1), ("patient 1", 0)]
+    assert result["series_comparison"] == {"analyte_1": 2}
+    diffs = result["cell_diffs"].sort_values("sample_name").reset_index(drop=True)
+    assert diffs["column"].tolist() == ["analyte_1", "analyte_1"]
+    assert diffs["value_file2"].tolist() == [5.0, 12.0]
+
+def test_compare_aligned_dataframes_identical_reordered():
+    df1 = pd.DataFrame({"sample_name": ["a", "b", "c"], "analyte_1": [1.0, 2.0, 3.0]})
+    df2 = df1.iloc[::-1].reset_index(drop=True)
+
+    result = compare_aligned_dataframes(df1, df2)
+
+    assert result["changed_rows"] == [] and result["added_rows"] == [] and result["removed_rows"] == []
+    assert result["cell_diffs"].empty
+
+def _comparison_analysis():
+    df1 = pd.DataFrame({"sample_name": ["a", "b", "c"], "analyte_1": pd.Series([1.0, "Invalid", np.nan], dtype=object)})
+    df2 = pd.DataFrame({"sample_name": ["a", "b", "c"], "analyte_1": pd.Series([1.0, 2.0, np.nan], dtype=object)})
+    return ComparisonAnalysis({"file_1": "file_1.csv", "file_2": "file_2.csv"}, df1, df2)
+
+def test_comparison_frames_mismatches_only():
+    frames = dict(_comparison_analysis().comparison_frames(mismatches_only=True))
+
+    assert frames["sample_name"].empty
+    assert frames["analyte_1"]["Index"].tolist() == [1]
+    assert frames["analyte_1"]["File_1"].tolist() == ["Invalid"]
+
+def test_export_comparisons_excel(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    output_path = tmp_path / "report.xlsx"
+
+    _comparison_analysis().export_comparisons_excel(str(output_path))
+
+    workbook = openpyxl.load_workbook(output_path)
+    assert workbook.sheetnames == ["sample_name", "analyte_1"]
+    rows = list(workbook["analyte_1"].values)
+    assert rows[0] == ("Index", "File_1", "File_2", "Match")
+    assert rows[2] == (1, "Invalid", 2, False)
+    assert rows[3] == (2, None, None, True)
+
+def test_export_comparisons_excel_sanitizes_and_deduplicates_sheet_names(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    long_name = "serum_concentration_measurement_"
+    df = pd.DataFrame({"a/b [mg:L]": [1.0], "a_b _mg_L_": [1.0], long_name + "run_1": [1.0], long_name + "run_2": [1.0],
+                       "'quoted'": [1.0]})
+    output_path = tmp_path / "report.xlsx"
+
+    ComparisonAnalysis({"file_1": "file_1.csv", "file_2": "file_2.csv"}, df, df).export_comparisons_excel(str(output_path))
+
+    assert openpyxl.load_workbook(output_path).sheetnames == [
+        "a_b _mg_L_", "a_b _mg_L__2", long_name[:31], long_name[:29] + "_2", "quoted",
+    ]
+
+@pytest.mark.parametrize("file_format", ["csv", "parquet"])
+def test_export_comparisons_long_format(tmp_path, file_format):
+    if file_format == "parquet":
+        pytest.importorskip("pyarrow")
+    output_path = tmp_path / f"report.{file_format}"
+
+    _comparison_analysis().export_comparisons(str(output_path), file_format=file_format, mismatches_only=True)
+
+    report = pd.read_csv(output_path) if file_format == "csv" else pd.read_parquet(output_path)
+    assert report["Column"].tolist() == ["analyte_1"]
+    assert report["File_1"].tolist() == ["Invalid"]
+    assert report["Match"].tolist() == [False]
+
+def test_changed_columns_uses_hashes_and_distrusts_mixed_objects():
+    df1 = pd.DataFrame({"sample_name": ["a", "b"], "analyte_1": [1.0, np.nan], "analyte_2": [2.0, 3.0],
+                        "mixed": pd.Series([1.0, "x"], dtype=object)})
+    df2 = pd.DataFrame({"sample_name": ["a", "b"], "analyte_1": [1.0, np.nan], "analyte_2": [2.0, 3.5],
+                        "mixed": pd.Series(["1.0", "x"], dtype=object)})
+
+    assert changed_columns(df1, df2) == ["analyte_2", "mixed"]
+    assert changed_columns(df1, df2.iloc[:1]) == list(df1.columns)
+
+def test_compare_cleaned_dataframes_skips_unchanged_columns(tmp_path):
+    frame = pd.DataFrame({"sample_name": ["a", "b", "c"], "analyte_1": [1.0, "Invalid", ""], "analyte_2": [2.0, 3.0, 4.0]})
+    frame.to_csv(tmp_path / "old.csv", index=False)
+    frame.to_csv(tmp_path / "copy.csv", index=False)
+    frame.assign(analyte_2=[2.0, 9.0, 4.0]).to_csv(tmp_path / "new.csv", index=False)
+
+    same = compare_cleaned_dataframes(str(tmp_path / "old.csv"), str(tmp_path / "copy.csv"), display=False, report_path=None)
+    assert same["files_identical"] and same["dataframe_match"] and same["changed_columns"] == []
+    assert same["series_comparison"]["analyte_1"]["row_counts"] == (3, 3)
+
+    changed = compare_cleaned_dataframes(str(tmp_path / "old.csv"), str(tmp_path / "new.csv"), display=False, report_path=None)
+    assert not changed["files_identical"] and not changed["dataframe_match"]
+    assert changed["changed_columns"] == ["analyte_2"]
+    assert changed["series_comparison"]["analyte_2"]["mismatched_indices"] == [1]
+    assert changed["series_comparison"]["analyte_1"]["num_mismatches"] == 0
@@ -5,3 +5,96 @@ import pytest
 import pandas as pd
 from src.utils.file_io import *
 
+import numpy as np
+from src.utils.sanitization import (
+    STATUS_BELOW_LOQ,
+    STATUS_INVALID,
+    STATUS_MISSING,
+    STATUS_NA_ZERO,
+    STATUS_VALID,
+    reformat_data_body,
+    reformat_data_body_typed,
+)
+
+SAMPLE_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_patients.csv")
+
+
+def _cleaned_sample():
+    return reformat_data_body(import_dataframe_from_csv(SAMPLE_CSV))
+
+def test_iter_dataframe_chunks_from_csv():
+    chunks = list(iter_dataframe_chunks_from_csv(SAMPLE_CSV, chunk_size=10))
+
+    assert [len(chunk) for chunk in chunks] == [10, 10, 10, 2]
+    pd.testing.assert_frame_equal(pd.concat(chunks), import_dataframe_from_csv(SAMPLE_CSV))
+
+def test_export_dataframe_to_csv_append(tmp_path):
+    output_path = str(tmp_path / "out.csv")
+    df = pd.DataFrame({'sample_name': ['a'], 'analyte_1': [1.0]})
+
+    export_dataframe_to_csv(df, output_path)
+    export_dataframe_to_csv(df, output_path, append=True)
+
+    assert pd.read_csv(output_path)['sample_name'].tolist() == ['a', 'a']
+
+def test_to_typed_dataframe_round_trip():
+    cleaned = _cleaned_sample()
+
+    typed = to_typed_dataframe(cleaned)
+
+    assert typed['analyte_1'].dtype == np.float64
+    assert typed['analyte_1__status'].dtype == np.uint8
+    assert (typed['analyte_1__status'] == STATUS_INVALID).sum() == 1
+    assert (typed['analyte_1__status'] == STATUS_MISSING).sum() == 1
+    pd.testing.assert_frame_equal(from_typed_dataframe(typed), cleaned)
+    assert to_typed_dataframe(typed) is typed
+
+def test_from_typed_dataframe_reads_label_statuses():
+    cleaned = _cleaned_sample()
+    typed = to_typed_dataframe(cleaned)
+    status_cols = [col for col in typed.columns if col.endswith(STATUS_SUFFIX)]
+    typed[status_cols] = typed[status_cols].apply(lambda codes: pd.Categorical.from_codes(codes, STATUS_CATEGORIES))
+
+    pd.testing.assert_frame_equal(from_typed_dataframe(typed), cleaned)
+
+def test_export_dataframe_to_csv_writes_typed_frames_as_cleaned_csv(tmp_path):
+    raw = pd.DataFrame({
+        'sample_name': ['a', 'b', 'c', 'd', 'e'],
+        'analyte_1': ['N/A', '< 0', 'no root', '', '12.5'],
+        'analyte_2': ['1', '2', None, '<5', '7#'],
+    })
+    typed = reformat_data_body_typed(raw)
+
+    export_dataframe_to_csv(typed, str(tmp_path / "typed.csv"))
+    export_dataframe_to_csv(reformat_data_body(raw.copy()), str(tmp_path / "cleaned.csv"))
+
+    assert (tmp_path / "typed.csv").read_bytes() == (tmp_path / "cleaned.csv").read_bytes()
+    assert typed['analyte_1__status'].tolist() == [STATUS_NA_ZERO, STATUS_BELOW_LOQ, STATUS_INVALID, STATUS_MISSING, STATUS_VALID]
+    assert typed['analyte_2__status'].tolist() == [STATUS_VALID, STATUS_VALID, STATUS_MISSING, STATUS_BELOW_LOQ, STATUS_VALID]
+
+@pytest.mark.parametrize("extension", [".parquet", ".arrow"])
+def test_export_dataframe_to_columnar_round_trip(tmp_path, extension):
+    pytest.importorskip("pyarrow")
+    cleaned = _cleaned_sample()
+    output_path = str(tmp_path / ("cleaned" + extension))
+
+    export_dataframe_to_columnar(cleaned, output_path, row_group_size=8)
+
+    restored = import_dataframe_from_columnar(output_path)
+    assert restored.to_csv(index=False) == cleaned.to_csv(index=False)
+    assert import_dataframe_from_columnar(output_path, typed=True)['analyte_2'].dtype == np.float64
+
+def test_export_dataframe_to_columnar_unknown_extension(tmp_path):
+    with pytest.raises(ValueError):
+        export_dataframe_to_columnar(_cleaned_sample(), str(tmp_path / "cleaned.txt"))
+
+def test_csv_byte_ranges_end_on_row_boundaries(tmp_path):
+    input_path = tmp_path / "export.csv"
+    input_path.write_bytes(b"sample_name,analyte_1\nC1,1\npatient 1,N/A\npatient 2,< 0")
+
+    layout = csv_byte_ranges(str(input_path), range_bytes=5)
+
+    assert layout["columns"] == ["sample_name", "analyte_1"]
+    assert layout["ranges"] == [(22, 27), (27, 41), (41, 54)]
+    frames = [read_csv_byte_range(str(input_path), start, end, layout["columns"]) for start, end in layout["ranges"]]
+    assert pd.concat(frames)["analyte_1"].tolist() == ["1", "N/A", "< 0"]
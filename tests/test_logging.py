@@ -0,0 +1,112 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import io
+import json
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+import src.utils.logging as log_utils
+from src.utils.logging import *
+
+
+def _log_from_worker(message):
+    logging.getLogger("test_queue_logging").info(message, extra={"rows": 3})
+    return os.getpid()
+
+def test_current_user_is_looked_up_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(log_utils.getpass, "getuser", lambda: calls.append(1) or "analyst")
+    current_user.cache_clear()
+    try:
+        record = logging.makeLogRecord({"msg": "hello", "levelname": "INFO"})
+        for _ in range(3):
+            CustomFormatter(LOG_FORMAT, DATE_FORMAT).format(record)
+            JsonLinesFormatter().format(record)
+        assert calls == [1]
+        assert record.user == "analyst"
+    finally:
+        current_user.cache_clear()
+
+def test_json_lines_formatter_keeps_extra_fields():
+    logger = logging.getLogger("test_json_lines")
+    record = logger.makeRecord("test_json_lines", logging.INFO, __file__, 1, "Stage %s done", ("trim",), None,
+                               extra={"stage_metrics": {"stage": "trim", "cells": 4}})
+
+    entry = json.loads(JsonLinesFormatter().format(record))
+
+    assert entry["message"] == "Stage trim done"
+    assert entry["level"] == "INFO"
+    assert entry["stage_metrics"] == {"stage": "trim", "cells": 4}
+    assert entry["user"] == current_user() and entry["host"] == current_host()
+
+def test_queue_logging_aggregates_worker_records(tmp_path, monkeypatch):
+    # pytest puts capture handlers on the root logger, which would stop get_logger from adding its own.
+    monkeypatch.setattr(logging.getLogger(), "handlers", [])
+    logger = get_logger("test_queue_logging")
+    log_path = tmp_path / "run.jsonl"
+    try:
+        with queue_logging(str(log_path)) as log_queue:
+            assert isinstance(logger.handlers[0], logging.handlers.QueueHandler)
+            logger.info("parent record")
+            with ProcessPoolExecutor(max_workers=2, initializer=configure_worker_logging, initargs=(log_queue,)) as executor:
+                worker_pids = set(executor.map(_log_from_worker, ["worker record"] * 4))
+        assert isinstance(logger.handlers[0], logging.FileHandler)
+    finally:
+        for handler in logger.handlers:
+            handler.close()
+        logger.handlers = []
+        log_utils._loggers.discard("test_queue_logging")
+
+    entries = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert [entry["message"] for entry in entries].count("worker record") == 4
+    assert entries[0]["message"] == "parent record" and entries[0]["process"] == os.getpid()
+    assert {entry["process"] for entry in entries[1:]} == worker_pids
+    assert all(entry["rows"] == 3 for entry in entries[1:])
+
+def test_batching_handler_flushes_records_followed_by_silence():
+    class Collect(logging.Handler):
+        def __init__(self):
+            super().__init__()
+            self.messages = []
+
+        def emit(self, record):
+            self.messages.append(record.getMessage())
+
+    target = Collect()
+    handler = BatchingHandler(target, capacity=100, flush_interval=0.05)
+    try:
+        for message in ("first", "second"):
+            handler.handle(logging.makeLogRecord({"msg": message, "levelno": logging.INFO}))
+
+        # No further record arrives; the timer alone must write the buffered ones.
+        deadline = time.monotonic() + 2
+        while len(target.messages) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert target.messages == ["first", "second"]
+    finally:
+        handler.close()
+    assert not handler._timer.is_alive()
+
+def test_batching_handler_flushes_the_stream_once_per_batch():
+    class CountingStream(io.StringIO):
+        flushes = 0
+
+        def flush(self):
+            self.flushes += 1
+            super().flush()
+
+    stream = CountingStream()
+    target = logging.StreamHandler(stream)
+    target.setFormatter(logging.Formatter("%(message)s"))
+    handler = BatchingHandler(target, capacity=100, flush_interval=60)
+    try:
+        for i in range(5):
+            handler.handle(logging.makeLogRecord({"msg": f"record {i}", "levelno": logging.INFO}))
+        assert stream.getvalue() == ""
+        handler.flush()
+
+        assert stream.getvalue().splitlines() == [f"record {i}" for i in range(5)]
+        assert stream.flushes == 1
+    finally:
+        handler.close()
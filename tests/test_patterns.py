@@ -0,0 +1,41 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import json
+import re
+import pytest
+from src.utils.patterns import *
+
+ORIGINAL_CONTROL_PATTERN = r"(?i)(C[1-3]|Low Control|Medium Control|High Control|Med Control|VISCON|Dil con|DIL CON|Dilution control|NC[1-3]|PG[1-3]|CUTOFF G[1-3]|Negative Control|Blank control|UTAK|UTAK control)"
+
+
+@pytest.mark.parametrize("sample_name", [
+    "C1", "nc2", "BLANK CONTROL", "UTAK control 2", "Medium Control", "med control", "dilution control",
+    "Dil Con", "cutoff g3", "cutoff g4", "PG1 rerun", "patient 1", "xc3", "high controls", "viscon",
+])
+def test_control_level_matches_original_alternation(sample_name):
+    original = re.search(ORIGINAL_CONTROL_PATTERN, sample_name)
+    merged = PATTERNS["control_level"].search(sample_name)
+
+    assert (original and original.group()) == (merged and merged.group())
+
+def test_build_alternation_prefix_priority():
+    # An earlier prefix wins, so "ab" can never match after "a".
+    assert re.search(build_alternation(["a", "ab"]), "ab").group() == "a"
+    # A longer term listed first is preferred over its prefix.
+    assert re.search(build_alternation(["ab", "a"]), "ab").group() == "ab"
+    assert re.search(build_alternation([]), "anything") is None
+
+def test_registry_load_config(tmp_path):
+    config_path = tmp_path / "patterns.json"
+    config_path.write_text(json.dumps({"patterns": {"no_root": r"(?i)^(noroot|nr)$"}, "control_levels": ["QC Mix"]}))
+    registry = default_registry()
+
+    registry.load_config(str(config_path))
+
+    assert registry["no_root"].match("NR")
+    assert registry["control_level"].search("qc mix 1").group() == "qc mix"
+    assert registry["control_level"].search("C2").group() == "C2"
+    assert "control_level" in registry.describe()
+    # The shared registry is untouched.
+    assert not PATTERNS["no_root"].match("NR")
@@ -0,0 +1,160 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import json
+import pytest
+import pandas as pd
+from src.utils.pipeline import *
+
+SAMPLE_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_patients.csv")
+
+
+def test_clean_csv_file_in_chunks_matches_full_load(tmp_path):
+    full_path = tmp_path / "full.csv"
+    chunked_path = tmp_path / "chunked.csv"
+
+    full = clean_csv_file(SAMPLE_CSV, str(full_path))
+    chunked = clean_csv_file_in_chunks(SAMPLE_CSV, str(chunked_path), chunk_size=7)
+
+    assert chunked_path.read_bytes() == full_path.read_bytes()
+    assert chunked["rows"] == full["rows"] == 32
+    assert chunked["chunks"] == 5
+    assert chunked["data_present"] == full["data_present"] == True
+    assert chunked["levels_present"] == full["levels_present"]
+    assert chunked["specimens"] == full["specimens"]
+    assert chunked["sample_counts"] == full["sample_counts"]
+    assert full["sample_counts"]["STANDARD"] == 6 and full["sample_counts"]["BLANK"] == 4
+
+def test_clean_csv_file_in_chunks_header_only(tmp_path):
+    input_path = tmp_path / "empty.csv"
+    input_path.write_text("sample_name,analyte_1\n")
+    output_path = tmp_path / "cleaned.csv"
+
+    result = clean_csv_file_in_chunks(str(input_path), str(output_path), chunk_size=10)
+
+    assert result["rows"] == 0
+    assert result["data_present"] == False
+    assert output_path.read_text().strip() == "sample_name,analyte_1"
+
+def test_clean_csv_file_in_chunks_rejects_bad_chunk_size(tmp_path):
+    with pytest.raises(ValueError):
+        clean_csv_file_in_chunks(SAMPLE_CSV, str(tmp_path / "out.csv"), chunk_size=0)
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_clean_csv_file_in_ranges_matches_full_load(tmp_path, workers):
+    full_path = tmp_path / "full.csv"
+    ranged_path = tmp_path / "ranged.csv"
+
+    full = clean_csv_file(SAMPLE_CSV, str(full_path))
+    ranged = clean_csv_file_in_ranges(SAMPLE_CSV, str(ranged_path), range_bytes=120, max_workers=workers)
+
+    assert ranged_path.read_bytes() == full_path.read_bytes()
+    assert ranged["ranges"] > 3
+    for key in ("rows", "data_present", "levels_present", "specimens", "sample_counts"):
+        assert ranged[key] == full[key]
+
+def test_clean_csv_file_in_ranges_header_only(tmp_path):
+    input_path = tmp_path / "empty.csv"
+    input_path.write_text("sample_name,analyte_1\n")
+    output_path = tmp_path / "cleaned.csv"
+
+    result = clean_csv_file_in_ranges(str(input_path), str(output_path))
+
+    assert result["ranges"] == 0 and result["rows"] == 0
+    assert output_path.read_text().strip() == "sample_name,analyte_1"
+
+def test_clean_csv_file_incremental_appends_new_rows(tmp_path):
+    lines = open(SAMPLE_CSV, encoding="utf-8").read().splitlines(keepends=True)
+    input_path = tmp_path / "run.csv"
+    output_path = tmp_path / "cleaned.csv"
+    input_path.write_text("".join(lines[:10]) + lines[10].rstrip("\n"))  # last row still being written
+
+    first = clean_csv_file_incremental(str(input_path), str(output_path))
+    assert first["mode"] == "rebuild"
+    assert first["rows"] == first["new_rows"] == 9
+
+    input_path.write_text("".join(lines))
+    second = clean_csv_file_incremental(str(input_path), str(output_path), full_summary=True)
+    full = clean_csv_file(SAMPLE_CSV, str(tmp_path / "full.csv"))
+
+    assert second["mode"] == "incremental"
+    assert second["new_rows"] == 32 - 9
+    assert output_path.read_bytes() == (tmp_path / "full.csv").read_bytes()
+    for key in ("rows", "levels_present", "specimens", "sample_counts"):
+        assert second[key] == full[key]
+    # The state keeps counts only, so it does not grow with every row.
+    state = json.loads((tmp_path / "cleaned.csv.state.json").read_text())
+    assert state["summary"]["sample_counts"] == full["sample_counts"]
+    assert not set(SUMMARY_LISTS) & set(state["summary"])
+
+    third = clean_csv_file_incremental(str(input_path), str(output_path))
+    assert third["mode"] == "incremental" and third["new_rows"] == 0
+    assert output_path.read_bytes() == (tmp_path / "full.csv").read_bytes()
+
+def test_clean_csv_file_incremental_rebuilds_when_prefix_changes(tmp_path):
+    input_path = tmp_path / "run.csv"
+    output_path = tmp_path / "cleaned.csv"
+    input_path.write_text("sample_name,analyte_1\nalpha,1\nbeta,2\n")
+    clean_csv_file_incremental(str(input_path), str(output_path))
+
+    input_path.write_text("sample_name,analyte_1\nalpha,5\nbeta,2\ngamma,NA\n")
+    result = clean_csv_file_incremental(str(input_path), str(output_path))
+
+    assert result["mode"] == "rebuild"
+    assert result["rows"] == 3
+    assert output_path.read_text().splitlines() == ["sample_name,analyte_1", "alpha,5.0", "beta,2.0", "gamma,0.0"]
+
+def test_clean_csv_file_incremental_rebuilds_after_a_same_size_edit_mid_file(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.utils.pipeline.HASH_BLOCK_SIZE", 64)  # several blocks before the offset
+    lines = open(SAMPLE_CSV, encoding="utf-8").read().splitlines(keepends=True)
+    input_path = tmp_path / "run.csv"
+    output_path = tmp_path / "cleaned.csv"
+    input_path.write_text("".join(lines[:20]))
+    clean_csv_file_incremental(str(input_path), str(output_path))
+
+    assert lines[10] == "BLANK CONTROL,0,0,0,0\n"
+    edited = "BLANK CONTROL,0,7,0,0\n"  # same size, far from both ends of the cleaned part
+    input_path.write_text("".join(lines[:10] + [edited] + lines[11:]))
+    result = clean_csv_file_incremental(str(input_path), str(output_path))
+    clean_csv_file(str(input_path), str(tmp_path / "full.csv"))
+
+    assert result["mode"] == "rebuild"
+    assert output_path.read_bytes() == (tmp_path / "full.csv").read_bytes()
+
+def test_clean_csv_file_typed_writes_same_csv_with_status_counts(tmp_path):
+    full = clean_csv_file(SAMPLE_CSV, str(tmp_path / "full.csv"))
+    typed = clean_csv_file(SAMPLE_CSV, str(tmp_path / "typed.csv"), typed=True)
+
+    assert (tmp_path / "typed.csv").read_bytes() == (tmp_path / "full.csv").read_bytes()
+    for key in ("rows", "levels_present", "specimens", "sample_counts"):
+        assert typed[key] == full[key]
+    assert "status_counts" not in full
+    assert sum(typed["status_counts"].values()) == 32 * 4
+    assert typed["status_counts"]["na_zero"] > 0 and typed["status_counts"]["invalid"] > 0
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_typed_chunks_and_ranges_write_same_csv_with_status_counts(tmp_path, workers):
+    full = clean_csv_file(SAMPLE_CSV, str(tmp_path / "full.csv"), typed=True)
+    chunked = clean_csv_file_in_chunks(SAMPLE_CSV, str(tmp_path / "chunked.csv"), chunk_size=7, typed=True)
+    ranged = clean_csv_file_in_ranges(SAMPLE_CSV, str(tmp_path / "ranged.csv"), range_bytes=256, max_workers=workers,
+                                      typed=True)
+
+    for name, result in (("chunked.csv", chunked), ("ranged.csv", ranged)):
+        assert (tmp_path / name).read_bytes() == (tmp_path / "full.csv").read_bytes()
+        assert result["status_counts"] == full["status_counts"]
+
+def test_raw_status_named_column_is_not_taken_for_the_typed_layout(tmp_path):
+    input_path = tmp_path / "raw.csv"
+    input_path.write_text("sample_name,analyte_1,lot__status\nPatient 1,N/A,3\nPatient 2,5,no root\n")
+    expected = "sample_name,analyte_1,lot__status\npatient 1,0.0,3.0\npatient 2,5.0,Invalid\n"
+
+    plain = clean_csv_file(str(input_path), str(tmp_path / "plain.csv"))
+    typed = clean_csv_file(str(input_path), str(tmp_path / "typed.csv"), typed=True)
+
+    assert (tmp_path / "plain.csv").read_text() == expected
+    assert (tmp_path / "typed.csv").read_text() == expected
+    assert "status_counts" not in plain
+    assert typed["status_counts"] == {"valid": 2, "na_zero": 1, "below_loq": 0, "invalid": 1, "missing": 0}
+    frame = pd.DataFrame({"sample_name": ["a"], "analyte_1": [1.0], "lot__status": [3]})
+    export_dataframe_to_csv(frame, str(tmp_path / "frame.csv"))
+    assert (tmp_path / "frame.csv").read_text() == "sample_name,analyte_1,lot__status\na,1.0,3\n"
@@ -0,0 +1,67 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import pytest
+import numpy as np
+import pandas as pd
+from src.utils.pipeline import clean_csv_file, clean_csv_file_in_chunks
+from src.utils.sanitization import *
+from src.utils.provenance import *
+
+SAMPLE_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_patients.csv")
+
+
+def test_record_rule_bits_splits_cells_by_rule():
+    log = ProvenanceLog()
+    log.record_rule_bits("analyte_1", np.array([0, 1 << RULE_STRING_NA, (1 << RULE_EXTRA_SPACE) | (1 << RULE_NO_ROOT)], dtype=np.uint8))
+    log.record("sample_name", np.array([2]), RULE_SAMPLE_NAMES)
+
+    rows, cols, rules = log.arrays()
+    assert (rows.dtype, cols.dtype, rules.dtype) == (np.int64, np.int32, np.uint8)
+    assert list(zip(rows.tolist(), cols.tolist(), rules.tolist())) == [
+        (2, 0, RULE_EXTRA_SPACE), (1, 0, RULE_STRING_NA), (2, 0, RULE_NO_ROOT), (2, 1, RULE_SAMPLE_NAMES)
+    ]
+    assert log.counts() == {"sample_names": 1, "remove_extra_space": 1, "remove_string_na": 1, "replace_no_root": 1}
+    assert len(ProvenanceLog().to_frame()) == 0
+
+def test_clean_data_body_records_changed_cells_without_changing_the_result():
+    df = pd.DataFrame({
+        "sample_name": ["Patient 1", "C1", "x"],
+        "analyte_1": ["N/A", " no root ", "5"],
+        "analyte_2": ["< 0", "7#", ""],
+    })
+    expected = clean_data_body(df.copy(), df.columns[1:])
+    log = ProvenanceLog()
+
+    cleaned = clean_data_body(df.copy(), df.columns[1:], provenance=log)
+    typed_log = ProvenanceLog()
+    reformat_data_body_typed(df, provenance=typed_log)
+
+    pd.testing.assert_frame_equal(cleaned, expected)
+    records = set(log.to_frame().astype(str).itertuples(index=False, name=None))
+    assert records == {
+        ("0", "analyte_1", "remove_string_na"),
+        ("1", "analyte_1", "remove_extra_space"),
+        ("1", "analyte_1", "replace_no_root"),
+        ("0", "analyte_2", "remove_extra_space"),
+        ("0", "analyte_2", "remove_special_characters"),
+        ("1", "analyte_2", "remove_special_characters"),
+        ("2", "analyte_2", "remove_empty_strings"),
+    }
+    pd.testing.assert_frame_equal(typed_log.to_frame(), log.to_frame())
+
+def test_clean_csv_file_exports_provenance_numbered_over_the_file(tmp_path):
+    pytest.importorskip("pyarrow")
+    full = clean_csv_file(SAMPLE_CSV, str(tmp_path / "full.csv"), provenance_path=str(tmp_path / "full.parquet"))
+    chunked = clean_csv_file_in_chunks(SAMPLE_CSV, str(tmp_path / "chunked.csv"), chunk_size=10,
+                                       provenance_path=str(tmp_path / "chunked.parquet"))
+
+    provenance = import_provenance(str(tmp_path / "full.parquet"))
+    assert list(provenance.columns) == PROVENANCE_COLUMNS
+    assert full["provenance_counts"]["sample_names"] > 0
+    assert full["provenance_counts"] == chunked["provenance_counts"]
+    pd.testing.assert_frame_equal(
+        provenance.astype(str).sort_values(PROVENANCE_COLUMNS, ignore_index=True),
+        import_provenance(str(tmp_path / "chunked.parquet")).astype(str).sort_values(PROVENANCE_COLUMNS, ignore_index=True),
+    )
+    assert (tmp_path / "chunked.csv").read_bytes() == (tmp_path / "full.csv").read_bytes()
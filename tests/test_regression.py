@@ -0,0 +1,65 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import json
+import pytest
+from src.utils.batch import clean_csv_batch
+from src.utils.regression import *
+
+SAMPLE_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_patients.csv")
+
+
+def _corpus(tmp_path):
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    (raw / "run_a.csv").write_text("sample_name,analyte_1,analyte_2\nC1,N/A,5\nPatient 1,no root,< 7\nPatient 2,3,\n")
+    (raw / "run_b.csv").write_text(open(SAMPLE_CSV).read())
+    golden = tmp_path / "golden"
+    clean_csv_batch(str(raw), str(golden), max_workers=1)
+    return raw, golden
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_regression_unchanged_then_skipped(tmp_path, workers):
+    raw, golden = _corpus(tmp_path)
+
+    first = run_regression(str(raw), str(golden), max_workers=workers)
+    second = run_regression(str(raw), str(golden), max_workers=workers)
+
+    assert (first["files"], first[UNCHANGED], first[SKIPPED], first["cells_changed"]) == (2, 2, 0, 0)
+    assert (second[UNCHANGED], second[SKIPPED]) == (0, 2)
+    assert json.loads((golden / REPORT_NAME).read_text())["skipped"] == 2
+
+def test_run_regression_reports_changed_cells_by_column_and_rule(tmp_path, capsys):
+    raw, golden = _corpus(tmp_path)
+    run_regression(str(raw), str(golden))
+    (golden / "cleaned_run_a.csv").write_text("sample_name,analyte_1,analyte_2\nc1,Invalid,5.0\npatient 1,Invalid,-7.0\npatient 2,3.5,\n")
+    (raw / "run_c.csv").write_text("sample_name,analyte_1\nPatient 3,1\n")
+
+    assert main([str(raw), str(golden)]) == 1
+
+    report = json.loads((golden / REPORT_NAME).read_text())
+    assert (report[CHANGED], report[SKIPPED], report[MISSING_GOLDEN]) == (1, 1, 1)
+    assert report["columns"] == {"analyte_1": 2, "analyte_2": 1}
+    # '< 7' was changed by two rules and counts for both; '3' was only parsed as a number.
+    assert report["rules"] == {"remove_string_na": 1, "remove_extra_space": 1, "remove_special_characters": 1, NO_RULE: 1}
+    assert "3 cells changed" in capsys.readouterr().out
+    # Files that changed are verified again on the next run.
+    assert run_regression(str(raw), str(golden))[CHANGED] == 1
+
+def test_run_regression_rechecks_after_a_code_change(tmp_path, monkeypatch):
+    raw, golden = _corpus(tmp_path)
+    run_regression(str(raw), str(golden))
+
+    monkeypatch.setattr("src.utils.regression.rules_version", lambda: "edited")
+
+    assert run_regression(str(raw), str(golden))[UNCHANGED] == 2
+
+def test_regression_state_is_versioned_by_every_cleaning_module(tmp_path, monkeypatch):
+    from src.utils.cache import CLEANING_MODULES
+    assert {"sanitization", "patterns", "stages", "sharding", "file_io", "csv_configs", "pipeline"} <= set(CLEANING_MODULES)
+    raw, golden = _corpus(tmp_path)
+    run_regression(str(raw), str(golden))
+
+    monkeypatch.setattr("src.utils.cache.cleaning_source_hash", lambda: "edited stages.py")
+
+    assert run_regression(str(raw), str(golden))[SKIPPED] == 0
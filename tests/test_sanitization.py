@@ -389,4 +389,90 @@ def test_unicode_and_special_encoding():
         'sample_name': ['patïent 1', 'patieñt 2'],
         'analyte_1': ['tëst', 'tést']
     })
-    pd.testing.assert_frame_equal(result, expected)
\ No newline at end of file
+    pd.testing.assert_frame_equal(result, expected)
+
+def _chain_data_body_helpers(df):
+    cols = df.columns[1:]
+    df = remove_extra_space_data_body(df, cols)
+    df = remove_string_na_data_body(df, cols)
+    df = remove_special_characters_data_body(df, cols)
+    df = remove_empty_strings_data_body(df, cols)
+    df = replace_no_root_data_body(df, cols)
+    df = convert_to_numeric_data_body(df, cols)
+    return df
+
+def test_clean_data_body_matches_helper_chain():
+    """The single-pass engine must give the same values and dtypes as the step helpers"""
+    df = pd.DataFrame({
+        'sample_name': ['patient 1', 'patient 2', 'patient 3', 'patient 4', 'patient 5', 'patient 6'],
+        'analyte_1': ["< 0", "", " N/A", "no root", "#100", None],
+        'analyte_2': [1, 2, 3, 4, 5, 6],
+        'analyte_3': ["", "", "", "", "", ""],
+        'analyte_4': [" 23.4 ", "nA", "Invalid", "45.6!", "1e3", np.nan],
+    })
+
+    expected_df = _chain_data_body_helpers(df.copy())
+    result_df = clean_data_body(df.copy(), df.columns[1:])
+
+    pd.testing.assert_frame_equal(result_df, expected_df, check_exact=True)
+    assert result_df.to_csv(index=False) == expected_df.to_csv(index=False)
+
+def test_clean_data_body_repeated_values_match_helper_chain():
+    """Cells sharing a value (or its text form) are cleaned once and broadcast back"""
+    values = ["0", "NA", "N/A", "< 0", "no root", "12.5", 1, 1.0, "1", None, ""]
+    df = pd.DataFrame({
+        'sample_name': [f'patient {i}' for i in range(60)],
+        'analyte_1': [values[i % len(values)] for i in range(60)],
+        'analyte_2': [values[(i * 7) % len(values)] for i in range(60)],
+        'analyte_3': ["0"] * 60,
+    })
+
+    expected_df = _chain_data_body_helpers(df.copy())
+    result_df = clean_data_body(df.copy(), df.columns[1:])
+
+    pd.testing.assert_frame_equal(result_df, expected_df, check_exact=True)
+
+def test_copy_contract_of_cleaning_functions():
+    """copy=True leaves the caller's frame as it was; the default replaces its columns in place"""
+    raw = pd.DataFrame({
+        'sample_name': ['  Patient #1', 'C1'],
+        'analyte_1': ['N/A', 'no root'],
+        'analyte_2': ['< 5', None],
+    })
+    original = raw.copy()
+
+    names = reformat_sample_names(raw, copy=True)
+    cleaned = reformat_data_body(names, copy=True)
+
+    pd.testing.assert_frame_equal(raw, original)
+    assert names['sample_name'].tolist() == ['patient 1', 'c1']
+    assert names['analyte_1'].tolist() == ['N/A', 'no root']
+    in_place = reformat_data_body(reformat_sample_names(raw))
+    assert in_place is raw
+    pd.testing.assert_frame_equal(in_place, cleaned)
+
+def test_clean_data_body_empty_rows():
+    df = pd.DataFrame({'sample_name': pd.Series([], dtype=object), 'analyte_1': pd.Series([], dtype=object)})
+
+    pd.testing.assert_frame_equal(clean_data_body(df.copy(), ['analyte_1']), df)
+
+def test_classify_samples():
+    df = pd.DataFrame({
+        'sample_name': ['standard 1', 'blank control', 'c1', 'patient 1', 'nc2', 'dil con', 'utak control', 'med control', 'patient 2']
+    })
+
+    result = classify_samples(df)
+
+    assert result['labels'].tolist() == [
+        'STANDARD', 'BLANK', 'C1', 'SPECIMEN', 'NC2', 'DILUTION', 'UTAK', 'MEDIUM CONTROL', 'SPECIMEN'
+    ]
+    assert result['labels'].dtype == 'category'
+    assert result['counts']['SPECIMEN'] == 2
+    assert result['counts']['PG1'] == 0
+    assert result['indices']['SPECIMEN'] == [3, 8]
+    assert 'PG1' not in result['indices']
+
+def test_check_number_of_specimen():
+    df = pd.DataFrame({'sample_name': ['standard 1', 'C1', 'patient 1', 'BLANK CONTROL', 'patient 2']})
+
+    assert check_number_of_specimen(df) == ['patient 1', 'patient 2']
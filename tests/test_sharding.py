@@ -0,0 +1,66 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import pandas as pd
+from src.utils.pipeline import clean_csv_file, clean_csv_file_in_chunks
+from src.utils.sanitization import clean_data_body, reformat_data_body_typed
+from src.utils.synthetic import generate_plate
+from src.utils.sharding import *
+
+SAMPLE_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_patients.csv")
+
+
+def _shared_blocks():
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+def test_column_shards_are_contiguous_and_balanced():
+    assert column_shards(10, 3) == [(0, 3), (3, 7), (7, 10)]
+    assert column_shards(2, 8) == [(0, 1), (1, 2)]
+    assert column_shards(0, 4) == []
+
+def test_clean_data_body_sharded_matches_single_process():
+    raw = generate_plate(500, 9, seed=5)
+    raw.iloc[::11, 2] = None
+    expected = clean_data_body(raw.copy(), raw.columns[1:])
+    blocks_before = _shared_blocks()
+
+    result = clean_data_body_sharded(raw, raw.columns[1:], max_workers=2, shards=3, copy=True)
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert list(result.columns) == list(raw.columns)
+    assert raw["analyte_1"].dtype == object  # copy=True left the raw frame alone
+    assert _shared_blocks() == blocks_before
+
+def test_clean_data_body_sharded_falls_back_for_non_text_cells():
+    df = pd.DataFrame({"sample_name": ["a", "b"], "analyte_1": [1, 2], "analyte_2": ["no root", "3"]})
+    expected = clean_data_body(df.copy(), df.columns[1:])
+
+    result = clean_data_body_sharded(df, df.columns[1:], max_workers=2)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+def test_clean_data_body_sharded_typed_matches_single_process():
+    raw = generate_plate(500, 9, seed=5)
+    raw.iloc[::11, 2] = None
+    expected = reformat_data_body_typed(raw, raw.columns[1:])
+
+    result = clean_data_body_sharded(raw, raw.columns[1:], max_workers=2, shards=3, typed=True)
+
+    pd.testing.assert_frame_equal(result, expected)
+    assert result.attrs == expected.attrs
+    assert raw["analyte_1"].dtype == object
+
+def test_chunked_cleaning_with_column_workers_matches_full_load(tmp_path):
+    full = clean_csv_file(SAMPLE_CSV, str(tmp_path / "full.csv"))
+    sharded = clean_csv_file_in_chunks(SAMPLE_CSV, str(tmp_path / "sharded.csv"), chunk_size=10, column_workers=2)
+
+    assert (tmp_path / "sharded.csv").read_bytes() == (tmp_path / "full.csv").read_bytes()
+    assert sharded["sample_counts"] == full["sample_counts"]
+
+def test_typed_chunked_cleaning_with_column_workers_matches_full_load(tmp_path):
+    full = clean_csv_file(SAMPLE_CSV, str(tmp_path / "full.csv"), typed=True)
+    sharded = clean_csv_file_in_chunks(SAMPLE_CSV, str(tmp_path / "sharded.csv"), chunk_size=10, column_workers=2,
+                                       typed=True)
+
+    assert (tmp_path / "sharded.csv").read_bytes() == (tmp_path / "full.csv").read_bytes()
+    assert sharded["status_counts"] == full["status_counts"]
@@ -0,0 +1,66 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import json
+import logging
+import pytest
+import pandas as pd
+from src.utils.file_io import import_dataframe_from_csv
+from src.utils.pipeline import clean_csv_file
+from src.utils.sanitization import reformat_data_body, reformat_sample_names
+from src.utils.stages import *
+
+SAMPLE_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_patients.csv")
+
+
+def test_default_and_detailed_pipelines_match_reformat_functions():
+    expected = reformat_data_body(reformat_sample_names(import_dataframe_from_csv(SAMPLE_CSV)))
+
+    default = default_pipeline().run(import_dataframe_from_csv(SAMPLE_CSV))
+    detailed = detailed_pipeline().run(import_dataframe_from_csv(SAMPLE_CSV))
+
+    pd.testing.assert_frame_equal(default, expected)
+    assert detailed.to_csv(index=False) == expected.to_csv(index=False)
+
+def test_profiled_run_reports_every_stage(caplog):
+    df = pd.DataFrame({
+        'sample_name': ['  Patient 1', 'Patient 2'],
+        'analyte_1': ['N/A', '5'],
+        'analyte_2': ['no root', None],
+    })
+    stages = detailed_pipeline(profile=True)
+
+    with caplog.at_level(logging.INFO, logger="src.utils.stages"):
+        stages.run(df)
+
+    report = stages.last_report
+    assert [metrics["stage"] for metrics in report["stages"]] == stages.names()
+    changed = {metrics["stage"]: metrics["cells_changed"] for metrics in report["stages"]}
+    assert changed["sample_names"] == 2
+    assert changed["remove_string_na"] == 1
+    assert changed["replace_no_root"] == 1
+    assert changed["convert_to_numeric"] == 2
+    assert all(metrics["cells"] == 4 for metrics in report["stages"][1:])
+    assert all(metrics["peak_memory_bytes"] >= 0 for metrics in report["stages"])
+    records = [record.stage_metrics for record in caplog.records if hasattr(record, "stage_metrics")]
+    assert records == report["stages"]
+
+def test_register_rejects_duplicate_stage_names():
+    stages = StagePipeline().register("trim", remove_extra_space_data_body)
+
+    with pytest.raises(ValueError):
+        stages.register("trim", remove_extra_space_data_body)
+    with pytest.raises(ValueError):
+        stages.register("other", remove_extra_space_data_body, scope="everything")
+
+def test_clean_csv_file_writes_run_report(tmp_path):
+    report_path = tmp_path / "report.json"
+
+    clean_csv_file(SAMPLE_CSV, str(tmp_path / "cleaned.csv"), report_path=str(report_path))
+
+    report = json.loads(report_path.read_text())
+    assert report["input_path"] == SAMPLE_CSV
+    assert report["rows"] == 32
+    assert [metrics["stage"] for metrics in report["stages"]] == ["sample_names", "data_body"]
+    assert report["stages"][1]["cells"] == 32 * 4
+    assert "cells_changed" not in report["stages"][1]
@@ -0,0 +1,132 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
+import asyncio
+import json
+import pytest
+from src.utils.pipeline import clean_csv_file
+from src.utils.watcher import *
+
+SAMPLE_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample_patients.csv")
+
+
+def _service(drop, output, **options):
+    return WatchService([str(drop)], str(output), max_workers=1, poll_interval=0.01, settle_seconds=0.05, **options)
+
+def test_scan_waits_for_files_to_settle(tmp_path):
+    drop = tmp_path / "drop"
+    drop.mkdir()
+    service = WatchService([str(drop)], str(tmp_path / "out"), settle_seconds=0)
+    path = drop / "run_1.csv"
+    path.write_text("sample_name,analyte_1\n")
+    (drop / ".partial.csv").write_text("x")
+    (drop / "notes.txt").write_text("x")
+    (drop / "empty.csv").write_text("")
+    (drop / "cleaned_run_0.csv").write_text("sample_name,analyte_1\npatient 1,5.0\n")
+
+    assert service.scan() == []
+    with open(path, "a") as f:
+        f.write("Patient 1,5\n")
+    assert service.scan() == []  # still being written
+    assert [ready[0] for ready in service.scan()] == [str(path)]
+
+def test_drop_directory_inside_output_directory_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        WatchService([str(tmp_path)], str(tmp_path))
+    with pytest.raises(ValueError):
+        WatchService([str(tmp_path / "out" / "drop")], str(tmp_path / "out"))
+
+    service = WatchService([str(tmp_path)], str(tmp_path / "out"), max_workers=1, poll_interval=0.01, settle_seconds=0)
+    (tmp_path / "run.csv").write_text("sample_name,analyte_1\nC1,5\n")
+    asyncio.run(service.run(until_idle=True))
+    (tmp_path / "cleaned_copy.csv").write_bytes((tmp_path / "out" / "cleaned_run.csv").read_bytes())
+    asyncio.run(service.run(until_idle=True))
+
+    assert service.counters["processed"] == 1
+    assert sorted(os.listdir(tmp_path / "out")) == sorted(["cleaned_run.csv", STATE_NAME, METRICS_NAME])
+
+def test_run_cleans_atomically_and_survives_restart(tmp_path):
+    drop, output = tmp_path / "drop", tmp_path / "out"
+    drop.mkdir()
+    (drop / "run_1.csv").write_text(open(SAMPLE_CSV).read())
+    (drop / "run_2.csv").write_text("sample_name,analyte_1\nPatient 1,N/A\n")
+    (drop / "run_bad.csv").write_text("not_a_sample,analyte_1\nx,1\n")
+    clean_csv_file(SAMPLE_CSV, str(tmp_path / "expected.csv"))
+
+    service = _service(drop, output)
+    asyncio.run(service.run(until_idle=True))
+
+    assert (output / "cleaned_run_1.csv").read_bytes() == (tmp_path / "expected.csv").read_bytes()
+    assert (output / "cleaned_run_2.csv").read_text() == "sample_name,analyte_1\npatient 1,0.0\n"
+    assert not (output / "cleaned_run_bad.csv").exists()
+    assert not [name for name in os.listdir(output) if name.startswith(TMP_PREFIX)]
+    metrics = json.loads((output / METRICS_NAME).read_text())
+    assert (metrics["processed"], metrics["failed"], metrics["queue_depth"]) == (2, 1, 0)
+    assert metrics["latency_seconds"]["p95"] > 0
+
+    restarted = _service(drop, output)
+    asyncio.run(restarted.run(until_idle=True))
+    assert restarted.counters == {"processed": 0, "failed": 0}
+
+    (drop / "run_2.csv").write_text("sample_name,analyte_1\nPatient 1,7\n")
+    asyncio.run(restarted.run(until_idle=True))
+    assert restarted.counters["processed"] == 1
+    assert (output / "cleaned_run_2.csv").read_text() == "sample_name,analyte_1\npatient 1,7.0\n"
+
+def test_main_once_with_several_drop_directories(tmp_path):
+    drops = [tmp_path / "lab_a" / "drop", tmp_path / "lab_b" / "drop"]
+    for drop in drops:
+        drop.mkdir(parents=True)
+        (drop / "run.csv").write_text(f"sample_name,analyte_1\nC1,{len(str(drop))}\n")
+
+    assert main([str(drops[0]), str(drops[1]), "--output-dir", str(tmp_path / "out"),
+                 "--workers", "2", "--settle", "0", "--poll-interval", "0.01", "--max-queue", "1", "--once"]) == 0
+
+    subdirs = [name for name in os.listdir(tmp_path / "out") if name.startswith("drop_")]
+    assert len(subdirs) == 2  # same directory name, distinct outputs
+    assert all((tmp_path / "out" / name / "cleaned_run.csv").exists() for name in subdirs)
+    state = json.loads((tmp_path / "out" / STATE_NAME).read_text())
+    assert len(state["files"]) == 2
+
+def test_state_is_pruned_when_inputs_are_removed(tmp_path):
+    drop, output = tmp_path / "drop", tmp_path / "out"
+    drop.mkdir()
+    for name in ("run_1.csv", "run_2.csv"):
+        (drop / name).write_text("sample_name,analyte_1\nC1,5\n")
+    service = _service(drop, output)
+    asyncio.run(service.run(until_idle=True))
+    assert len(json.loads((output / STATE_NAME).read_text())["files"]) == 2
+
+    (drop / "run_1.csv").unlink()
+    asyncio.run(service.run(until_idle=True))
+
+    assert list(json.loads((output / STATE_NAME).read_text())["files"]) == [str(drop / "run_2.csv")]
+
+def test_scan_survives_vanishing_files_and_a_missing_directory(tmp_path, monkeypatch):
+    drop, output = tmp_path / "drop", tmp_path / "out"
+    drop.mkdir()
+    (drop / "run_1.csv").write_text("sample_name,analyte_1\nC1,5\n")
+    service = _service(drop, output)
+    asyncio.run(service.run(until_idle=True))
+
+    # The drop directory is gone for a moment: its completed files stay in the state.
+    drop.rename(tmp_path / "away")
+    assert service.scan() == []
+    (tmp_path / "away").rename(drop)
+    asyncio.run(service.run(until_idle=True))
+    assert service.counters["processed"] == 1
+
+    class VanishedEntry:
+        name = "run_2.csv"
+        path = str(drop / "run_2.csv")
+
+        def is_file(self):
+            return True
+
+        def stat(self):
+            raise FileNotFoundError(self.path)
+
+    real_scandir = os.scandir
+    monkeypatch.setattr("src.utils.watcher.os.scandir", lambda directory: list(real_scandir(directory)) + [VanishedEntry()])
+    assert service.scan() == []
+    assert list(service.state["files"]) == [str(drop / "run_1.csv")]